@@ -2,18 +2,20 @@
 """
 Single-file PySide6 app that MERGES code1 (PDF→Text→Fields→QR/Code128→Embed) into code2 GUI.
 - Removes QProcess / mainqr.py indirection
-- Runs pipeline directly on a Worker(QThread) to keep UI responsive
+- Runs pipeline on warm worker processes (code/warmpool.py); a Worker(QThread) per job keeps UI responsive
+- Multi-select / drag-drop PDFs or folders into a queue; one tableWidget row per job, docs/min for the batch
+- Typed progress events (stage wall/CPU time, engine, OCR page n/m) batched to the UI thread; jobs can be cancelled
 - Keeps original UI assumptions: widgets.lineEdit_2 (input PDF), widgets.lineEdit_3 (output dir)
 
-Dependencies: PySide6, PyMuPDF (fitz), pdfminer.six, pdf2image, pytesseract, qrcode[pil],
-python-barcode[images], Pillow
+Dependencies: PySide6, PyMuPDF (fitz), pdfminer.six, pytesseract (+ tesseract), qrcode[pil],
+python-barcode[images], Pillow; pdf2image only for the optional poppler OCR raster backend
 """
 
 from __future__ import annotations
 
-import sys, os, re, unicodedata
+import sys, os, re, unicodedata, time
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 import sys
 import os
 import platform
@@ -24,9 +26,11 @@ from pathlib import Path
 from modules import *
 from widgets import *
 # ====== GUI Imports (assumes your project modules/widgets stay the same) ======
-from PySide6.QtCore import Qt, QThread, Signal
+from PySide6.QtCore import Qt, QThread, Signal, QObject, QTimer
 from PySide6.QtWidgets import (
-    QApplication, QMainWindow, QFileDialog, QMessageBox, QHeaderView
+    QApplication, QMainWindow, QFileDialog, QMessageBox, QHeaderView,
+    QTableWidget, QTableWidgetItem, QLabel, QSpinBox, QWidget, QHBoxLayout, QGridLayout, QPushButton,
+    QAbstractItemView, QCheckBox, QComboBox, QDialog, QDialogButtonBox, QFormLayout, QLineEdit
 )
 from PySide6.QtGui import QIcon
 from PySide6.QtCore import Qt, QThread, Signal, QSettings, QStandardPaths
@@ -71,321 +75,45 @@ except Exception:
             self.tableWidget = QTableWidget(0, 3); lay.addWidget(self.tableWidget)
             self.stackedWidget = QWidget(); lay.addWidget(self.stackedWidget)
 
-# ====== Third-party libs for pipeline ======
-import fitz  # PyMuPDF
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LAParams, LTTextContainer, LTTextLine
-from pdf2image import convert_from_path
-import pytesseract
-import qrcode
-from qrcode.constants import ERROR_CORRECT_Q
-import qrcode.image.svg as qrcode_svg
-from barcode import Code128
-from barcode.writer import ImageWriter
-from PIL import Image
-
-# =========================
-# 1) TEXT EXTRACTION (from code1)
-# =========================
-
-def extract_pdfminer_topdown_ltr(pdf_path: str, page_index: Optional[int] = None) -> str:
-    """pdfminer → sort lines top→down (−y1) then left→right (x0)."""
-    laparams = LAParams(char_margin=2.0, line_margin=0.5, word_margin=0.1, boxes_flow=0.5)
-    page_numbers = [page_index] if page_index is not None else None
-    pages_text: List[str] = []
-    for page_layout in extract_pages(pdf_path, page_numbers=page_numbers, laparams=laparams):
-        lines = []
-        for element in page_layout:
-            if isinstance(element, LTTextContainer):
-                for text_line in element:
-                    if isinstance(text_line, LTTextLine):
-                        x0, y0, x1, y1 = text_line.bbox
-                        s = text_line.get_text().strip()
-                        if s:
-                            lines.append((-y1, x0, s))
-        lines.sort(key=lambda t: (t[0], t[1]))
-        page_text = "\n".join(t[2] for t in lines)
-        pages_text.append(page_text)
-    return "\n\f\n".join(pages_text)
-
-
-def extract_pymupdf_sorted(pdf_path: str, page_index: Optional[int] = None) -> str:
-    try:
-        txt_parts: List[str] = []
-        with fitz.open(pdf_path) as doc:
-            if doc.is_encrypted:
-                try:
-                    doc.authenticate("")
-                except Exception:
-                    return ""
-            if page_index is None:
-                for page in doc:
-                    txt_parts.append(page.get_text("text", sort=True))
-            else:
-                page = doc[page_index]
-                txt_parts.append(page.get_text("text", sort=True))
-        return "\n".join(txt_parts)
-    except Exception:
-        return ""
-
-
-def extract_ocr(pdf_path: str, lang: str = "vie+eng", dpi: int = 300, page_index: Optional[int] = None) -> str:
-    kwargs = {"dpi": dpi}
-    if page_index is not None:
-        kwargs.update({"first_page": page_index + 1, "last_page": page_index + 1})
-    images = convert_from_path(pdf_path, **kwargs)
-    texts = []
-    for img in images:
-        t = pytesseract.image_to_string(img, lang=lang, config="--oem 1 --psm 6")
-        texts.append(t.strip())
-    return "\n".join(texts)
-
-
-def pdf_to_txt(pdf_path: str, out_txt: Optional[str] = None, page_index: Optional[int] = None) -> str:
-    pdf = Path(pdf_path)
-    if not pdf.exists():
-        raise FileNotFoundError(pdf)
-    txt = extract_pdfminer_topdown_ltr(str(pdf), page_index=page_index)
-    if len(txt.strip()) < 10:
-        txt = extract_pymupdf_sorted(str(pdf), page_index=page_index)
-    if len(txt.strip()) < 10:
-        txt = extract_ocr(str(pdf), page_index=page_index)
-    if out_txt:
-        Path(out_txt).parent.mkdir(parents=True, exist_ok=True)
-        Path(out_txt).write_text(txt, encoding="utf-8")
-    return txt
-
-# ======================
-# 2) FIELD EXTRACTION (from code1)
-# ======================
-
-def read_lines(path: Path) -> List[str]:
-    text = path.read_text(encoding="utf-8", errors="replace")
-    return [ln.rstrip("\r\n") for ln in text.splitlines()]
-
-
-def next_non_empty(lines: List[str], start_idx: int) -> Optional[str]:
-    for i in range(start_idx + 1, len(lines)):
-        s = lines[i].strip()
-        if s:
-            return s
-    return None
-
-
-def find_value_after_label(lines: List[str], label: str) -> Optional[str]:
-    for i, line in enumerate(lines):
-        if line.strip() == label.strip():
-            return next_non_empty(lines, i)
-    return None
-
-
-def find_nps_line(lines: List[str]) -> Optional[str]:
-    for line in lines:
-        if "NPS" in line:
-            m = re.search(r"(NPS.*)", line)
-            if not m:
-                continue
-            chunk = m.group(1).strip()
-            close_idx = chunk.rfind(")")
-            if close_idx != -1:
-                return chunk[: close_idx + 1]
-            return chunk
-    return None
-
-
-def strip_accents(s: str) -> str:
-    if not s:
-        return ""
-    s_norm = unicodedata.normalize("NFKD", s)
-    return s_norm.encode("ascii", "ignore").decode("ascii")
-
-
-def extract_fields_to_qr_text(input_txt: Path, output_qr_txt: Path) -> None:
-    if not input_txt.exists():
-        raise FileNotFoundError(f"Không thấy file: {input_txt}")
-
-    lines = read_lines(input_txt)
-
-    ms_don        = find_value_after_label(lines, "MS đơn công lệnh:")
-    so_luong      = find_value_after_label(lines, "Số lượng sản xuất:")
-    ngay_hoan_tat = find_value_after_label(lines, "Ngày Hoàn tất:")
-    nps_fallback  = find_nps_line(lines)
-
-    def _norm_cmp(s: str) -> str:
-        s = strip_accents(s or "")
-        s = re.sub(r"\s+", " ", s).strip().lower()
-        return s
-
-    STOP_LABELS = [
-        "Số lượng sản xuất:", "Số lượng:", "Ngày phát thực tế:", "Mã đơn đặt hàng:",
-        "Đơn đặt hàng", "Ghi chú:", "Hạng mục", "Ngày bắt đầu theo dự tính:",
-        "Ngày Hoàn tất:", "Ngày có hiệu lực BOM:", "NVL sản xuất:"
-    ]
-
-    def find_fnw_nps_block_after_nvl(lines):
-        idx = None
-        for i, l in enumerate(lines):
-            if _norm_cmp(l).startswith(_norm_cmp("NVL sản xuất:")):
-                idx = i
-                break
-        if idx is None:
-            return None
-        j = idx + 1
-        if j < len(lines) and re.search(r"\bM\b", lines[j]):
-            j += 1
-        got_fnw = False; got_nps = False; pieces = []
-        nps_re = re.compile(r"\bNPS\s*\d", re.IGNORECASE)
-        while j < len(lines):
-            raw = lines[j]; s = raw.strip()
-            if not s:
-                break
-            if any(_norm_cmp(s).startswith(_norm_cmp(lbl)) for lbl in STOP_LABELS):
-                break
-            if (not got_fnw) and ("FNW" in s):
-                pieces.append(s); got_fnw = True
-            elif (not got_nps) and nps_re.search(s):
-                pieces.append(s); got_nps = True
-            if got_fnw and got_nps:
-                break
-            j += 1
-        if not pieces:
-            return None
-        merged = " ".join(pieces)
-        last_paren = merged.rfind(")")
-        if last_paren != -1:
-            merged = merged[: last_paren + 1]
-        return merged
-
-    raw_desc = find_fnw_nps_block_after_nvl(lines) or nps_fallback
-
-    def norm(s: Optional[str]) -> str:
-        s = strip_accents(s or "")
-        s = re.sub(r"\s+", " ", s).strip()
-        return s
-
-    ms   = norm(ms_don)
-    desc = norm(raw_desc)
-    sl   = norm(so_luong)
-    ngay = norm(ngay_hoan_tat)
-
-    ddh_line = next((l for l in lines if l.strip().startswith("SV")), None)
-    ddh = norm(ddh_line)
-
-    parts = []
-    if ms:   parts.append(f"MS:{ms}")
-    if desc: parts.append(f"con hang:{desc}")
-    if sl:   parts.append(f"sl:{sl}")
-    if ngay: parts.append(f"Ngay Hoan tat:{ngay}")
-    if ddh:  parts.append(f"Don dat hang:{ddh}")
-
-    payload = ";".join(parts)
-    output_qr_txt.parent.mkdir(parents=True, exist_ok=True)
-    output_qr_txt.write_text(payload + "\n", encoding="utf-8")
-
-# ============================
-# 3) QR + CODE128 (from code1)
-# ============================
-
-def read_text(path: Path) -> str:
-    return path.read_text(encoding="utf-8", errors="replace").strip()
-
-
-def make_qr(data: str, out_png: Path, out_svg: Path) -> None:
-    qr = qrcode.QRCode(version=None, error_correction=ERROR_CORRECT_Q, box_size=10, border=4)
-    qr.add_data(data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    out_png.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_png)
-    img_svg = qrcode.make(data, image_factory=qrcode_svg.SvgImage)
-    img_svg.save(out_svg)
-
-
-def to_ascii_one_line(s: str, sep: str = " | ") -> str:
-    s = unicodedata.normalize("NFKD", s)
-    s = s.encode("ascii", "ignore").decode("ascii")
-    lines = [ln.strip() for ln in s.splitlines() if ln.strip()]
-    lines = [re.sub(r"\s+", " ", ln) for ln in lines]
-    return sep.join(lines)
-
-
-def split_for_1d(payload: str, maxlen: int = 80, sep: str = " | ") -> List[str]:
-    if len(payload) <= maxlen:
-        return [payload]
-    parts: List[str] = []
-    current = ""
-    tokens = payload.split(sep)
-    for tk in tokens:
-        candidate = (current + sep + tk) if current else tk
-        if len(candidate) <= maxlen:
-            current = candidate
-        else:
-            if current:
-                parts.append(current); current = tk
-            else:
-                parts.append(tk[:maxlen]); current = tk[maxlen:]
-    if current:
-        parts.append(current)
-    return parts
-
-
-def make_code128(payload: str, out_base: Path, maxlen: int = 80) -> None:
-    chunks = split_for_1d(payload, maxlen=maxlen)
-    out_base.parent.mkdir(parents=True, exist_ok=True)
-    if len(chunks) == 1:
-        code = Code128(chunks[0], writer=ImageWriter())
-        code.save(str(out_base), options={
-            "module_width": 0.3,
-            "module_height": 30.0,
-            "quiet_zone": 6.5,
-            "font_size": 10,
-            "text_distance": 2.0,
-            "write_text": False,
-        })
-    else:
-        for idx, chunk in enumerate(chunks, 1):
-            code = Code128(chunk, writer=ImageWriter())
-            code.save(str(out_base.with_name(out_base.stem + f"_part{idx}")), options={
-                "module_width": 0.3,
-                "module_height": 30.0,
-                "quiet_zone": 6.5,
-                "font_size": 10,
-                "text_distance": 2.0,
-                "write_text": False,
-            })
-
-# ======================
-# 4) EMBED QR INTO PDF (from code1)
-# ======================
-
-def embed_qr_into_pdf(pdf_path: Path, qr_png: Path, output_pdf: Path, page_index: int = 0, width_fraction: float = 4.0) -> None:
-    doc = fitz.open(str(pdf_path))
-    try:
-        page = doc[page_index]
-        page_rect = page.rect
-        page_width, page_height = page_rect.width, page_rect.height
-        img = Image.open(qr_png)
-        qr_w_px, qr_h_px = img.size
-        scale = page_width / (width_fraction * qr_w_px)
-        qr_w = qr_w_px * scale
-        qr_h = qr_h_px * scale
-        x0 = (page_width - qr_w) / 2
-        y0 = (page_height - qr_h) / 2
-        rect = fitz.Rect(x0, y0, x0 + qr_w, y0 + qr_h)
-        page.insert_image(rect, filename=str(qr_png))
-        output_pdf.parent.mkdir(parents=True, exist_ok=True)
-        doc.save(str(output_pdf))
-    finally:
-        doc.close()
+# ====== Shared pipeline modules (code/) ======
+_CODE_DIR = os.path.join(getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__))), "code")
+if _CODE_DIR not in sys.path:
+    sys.path.append(_CODE_DIR)
+from ocr import DEFAULT_LADDER, RASTER_BACKENDS, DpiLadder
+from preflight import DEFAULT_ENGINE, TEXT_ENGINES
+from roiocr import OCR_MODES
+from template import TemplateStore
+from extractcache import ExtractionCache
+# 1) TEXT → 2) FIELDS → 3) QR + CODE128 → 4) EMBED, trong bộ nhớ (shared with code/mainqr.py)
+from pipeline import QR_PAYLOADS, QR_STAMPS, Artifacts
+from batch import JobResult, collect_inputs, job_stems
+# Process worker spawn sẵn (thư viện đã import), job gửi qua Pipe, log + sự kiện tiến độ stream về
+from warmpool import PipelineJob, WarmPool, run_job
+from progress import ENGINE, OCR_PAGE, STAGE_END, STAGE_START, CancelToken, ProgressEvent
+
+# Số process worker giữ sẵn cho GUI (mặc định; chỉnh được trên cửa sổ, lưu QSettings "parallel")
+GUI_WORKERS = 2
+# OCR/ghi file còn chờ I/O → cho phép vượt số core một chút
+MAX_PARALLEL = max(4, os.cpu_count() or 1)
+# Nhịp tối đa đẩy log/sự kiện lên UI thread (giây): log dày (OCR nhiều trang…) không làm ngập event loop
+UI_FLUSH_INTERVAL = 0.1
 
 # ======================
 # Worker thread to run pipeline without freezing UI
 # ======================
 class PipelineWorker(QThread):
-    log = Signal(str)
+    log = Signal(str)         # các dòng log dồn lô (tối đa 1 lần / UI_FLUSH_INTERVAL)
+    progress = Signal(list)   # [ProgressEvent] dồn lô: vào/ra bước (wall + CPU), engine, trang OCR n/m
     done = Signal(bool, str)  # success, result_pdf_path
-
-    def __init__(self, base_path: Path, pdf_path: Path, outpdf_dir: Path, page:int=0, qr_fraction:float=4.0, max1d:int=80):
+    result = Signal(object)   # JobResult (lỗi / đã huỷ / thời gian từng bước)
+
+    def __init__(self, base_path: Path, pdf_path: Path, outpdf_dir: Path, page:Optional[int]=0, qr_fraction:float=4.0, max1d:int=80,
+                 ocr_raster: str = "fitz", text_engine: str = DEFAULT_ENGINE, ocr_mode: str = "page",
+                 ocr_backfill: bool = False, ocr_dpi: DpiLadder = DEFAULT_LADDER, ocr_workers: int = 0,
+                 qr_stamp: str = "image", qr_dpi: int = 0, qr_payload: str = "full", qr_max_version: int = 0,
+                 template: bool = False, cache: Optional[ExtractionCache] = None,
+                 templates: Optional[TemplateStore] = None, debug_artifacts: bool = False,
+                 pool: Optional[WarmPool] = None, out_pdf: Optional[Path] = None, artifact_stem: str = "a"):
         super().__init__()
         self.base_path = base_path
         self.pdf_path = pdf_path
@@ -393,21 +121,56 @@ class PipelineWorker(QThread):
         self.page = page
         self.qr_fraction = qr_fraction
         self.max1d = max1d
+        self.ocr_raster = ocr_raster
+        self.text_engine = text_engine
+        self.ocr_mode = ocr_mode  # "roi": trang scan chỉ OCR vùng giá trị asfr102
+        self.ocr_backfill = ocr_backfill
+        self.ocr_dpi = ocr_dpi  # thang DPI OCR (ocr.DpiLadder)
+        self.ocr_workers = ocr_workers  # >0: dùng pool OCR chung của process (giữ qua các lần chạy)
+        self.qr_stamp = qr_stamp  # "vector" / "xobject": QR vẽ vector thay vì ảnh PNG
+        self.qr_dpi = qr_dpi  # > 0: PNG QR render đúng DPI máy in tem
+        self.qr_payload = qr_payload  # "compact": payload gọn, QR version nhỏ hơn
+        self.qr_max_version = qr_max_version  # > 0: chọn EC mạnh nhất còn vừa version này
+        self.cache = cache
+        self.template = template  # True: thử đọc trường theo toạ độ template trước (tắt mặc định)
+        self.templates = templates  # kho template khi chạy trong thread (không có pool)
+        self.debug_artifacts = debug_artifacts  # True: ghi <stem>.txt / <stem>_qr.txt / PNG / Code128 vào scan/
+        self.artifact_stem = artifact_stem  # tên file trung gian (hàng đợi: riêng mỗi job, không ghi đè nhau)
+        self.pool = pool  # có: chạy trên worker process ấm (thread này chỉ chờ + chuyển log)
+        self.out_pdf = out_pdf  # có: ghi đúng file này (hàng đợi đã chọn tên không trùng)
+        self.cancel_token = CancelToken()
+        self._lines: List[str] = []
+        self._events: List[ProgressEvent] = []
+        self._last_flush = 0.0
+
+    def cancel(self):
+        """Huỷ hợp tác: job dừng ở điểm kiểm tra kế tiếp (đầu bước / giữa các trang OCR)."""
+        self.cancel_token.cancel()
 
     def _print(self, s: str):
-        self.log.emit(s + "\n")
+        self._lines.append(s + "\n")
+        self._flush()
+
+    def _on_event(self, event: ProgressEvent):
+        self._events.append(event)
+        self._flush()
+
+    def _flush(self, force: bool = False):
+        # Gọi từ thread này (mỗi log/sự kiện + mỗi nhịp chờ của pool) → emit dồn lô, không quá 1/UI_FLUSH_INTERVAL
+        now = time.monotonic()
+        if not force and now - self._last_flush < UI_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        if self._lines:
+            lines, self._lines = self._lines, []
+            self.log.emit("".join(lines))
+        if self._events:
+            events, self._events = self._events, []
+            self.progress.emit(events)
 
     def run(self):
         try:
-            outdir = self.base_path / "scan" / "output"
-            outdir.mkdir(parents=True, exist_ok=True)
             self.outpdf_dir.mkdir(parents=True, exist_ok=True)
-
-            txt_out = outdir / "a.txt"
-            qr_txt  = self.base_path / "scan" / "input" / "a_qr.txt"
-            qr_png  = outdir / "a_qr.png"
-            qr_svg  = outdir / "a_qr.svg"
-            code128_base = outdir / "a_code128"
             in_path = Path(self.pdf_path)
             in_name = in_path.name
             pdf_with_qr = self.outpdf_dir / in_name
@@ -415,39 +178,326 @@ class PipelineWorker(QThread):
             # Nếu output dir trùng với thư mục của file gốc → thêm hậu tố _qr để không ghi đè
             if in_path.parent.resolve() == self.outpdf_dir.resolve():
                 pdf_with_qr = self.outpdf_dir / f"{in_path.stem}_qr{in_path.suffix}"
-
-            self._print("[1] Extracting text from PDF…")
-            text = extract_pdfminer_topdown_ltr(str(self.pdf_path), page_index=self.page)
-            if len(text.strip()) < 10:
-                text = extract_pymupdf_sorted(str(self.pdf_path), page_index=self.page)
-            if len(text.strip()) < 10:
-                self._print("    (Fallback to OCR)")
-                text = extract_ocr(str(self.pdf_path), page_index=self.page)
-            if len(text.strip()) < 1:
-                raise RuntimeError("Không trích xuất được văn bản từ PDF.")
-            txt_out.write_text(text, encoding="utf-8")
-            self._print(f"    Saved text -> {txt_out}")
-
-            self._print("[2] Parsing fields to QR text…")
-            extract_fields_to_qr_text(txt_out, qr_txt)
-            self._print(f"    Saved QR payload -> {qr_txt}")
-
-            self._print("[3] Generating QR & Code128…")
-            qr_payload = read_text(qr_txt)
-            make_qr(qr_payload, qr_png, qr_svg)
-            self._print(f"    QR -> {qr_png}, {qr_svg}")
-            payload_1d = to_ascii_one_line(qr_payload)
-            make_code128(payload_1d, code128_base, maxlen=self.max1d)
-            self._print(f"    Code128 -> {outdir} (a_code128*.png)")
-
-            self._print("[4] Embedding QR into PDF…")
-            embed_qr_into_pdf(self.pdf_path, qr_png, pdf_with_qr, page_index=self.page, width_fraction=self.qr_fraction)
-            self._print(f"    PDF with QR -> {pdf_with_qr}")
-
-            self.done.emit(True, str(pdf_with_qr))
+            if self.out_pdf is not None:
+                pdf_with_qr = self.out_pdf
+
+            artifacts = None
+            if self.debug_artifacts:
+                stem = self.artifact_stem
+                artifacts = Artifacts.in_dir(self.base_path / "scan" / "output", stem=stem,
+                                             qr_txt=self.base_path / "scan" / "input" / f"{stem}_qr.txt")
+
+            job = PipelineJob(pdf=in_path, out_pdf=pdf_with_qr, page_index=self.page, raster=self.ocr_raster,
+                              text_engine=self.text_engine, ocr_mode=self.ocr_mode, ocr_backfill=self.ocr_backfill,
+                              ocr_dpi=self.ocr_dpi,
+                              ocr_workers=self.ocr_workers, qr_fraction=self.qr_fraction, max1d=self.max1d,
+                              qr_stamp=self.qr_stamp, qr_dpi=self.qr_dpi, qr_payload=self.qr_payload,
+                              qr_max_version=self.qr_max_version, template=self.template, artifacts=artifacts)
+            # Có pool: chạy trên worker process ấm; không thì chạy ngay trong thread này
+            if self.pool is not None:
+                result = self.pool.run(job, log=self._print, progress=self._on_event, cancel=self.cancel_token,
+                                       idle=self._flush)
+            else:
+                result = run_job(job, cache=self.cache, templates=self.templates, log=self._print,
+                                 progress=self._on_event, cancel=self.cancel_token)
         except Exception as e:
-            self._print(f"[ERROR] {e}")
-            self.done.emit(False, "")
+            result = JobResult(str(self.pdf_path), False, 0.0, error=str(e))
+        if not result.ok and not result.cancelled:
+            self._print(f"[ERROR] {result.error}")
+        self._flush(force=True)
+        self.result.emit(result)
+        self.done.emit(result.ok, result.out)
+
+# ======================
+# Tuỳ chọn pipeline cho các job GUI: nút "Tuỳ chọn…" dưới bảng, lưu QSettings nhóm "pipeline"
+# (key = tham số PipelineWorker; giá trị thiếu / sai trong cấu hình → mặc định)
+# ======================
+JOB_OPTIONS = (
+    # (key, nhãn, lựa chọn, mặc định)
+    ("text_engine", "Engine lớp text", TEXT_ENGINES, DEFAULT_ENGINE),
+    ("ocr_mode", "OCR trang scan (roi = chỉ vùng giá trị)", OCR_MODES, "page"),
+    ("ocr_backfill", "OCR bù trường thiếu", None, False),
+    ("ocr_dpi", "Thang DPI OCR (vd 200,300,400)", DpiLadder.parse, DEFAULT_LADDER),
+    ("qr_stamp", "Chèn QR (image = PNG, vector / xobject = vẽ module)", QR_STAMPS, "image"),
+    ("qr_dpi", "DPI máy in cho PNG QR (0 = 10 px/module)", range(0, 2401), 0),
+    ("qr_payload", "Nội dung QR (compact = payload gọn)", QR_PAYLOADS, "full"),
+    ("qr_max_version", "Version QR tối đa (0 = luôn EC Q)", range(0, 41), 0),
+    ("template", "Đọc trường theo toạ độ template asfr102", None, False),
+)
+
+
+def _option_text(value) -> str:
+    # DpiLadder → "200,300,400" (đúng dạng DpiLadder.parse đọc lại)
+    return ",".join(map(str, value.steps)) if isinstance(value, DpiLadder) else str(value)
+
+
+def _option_value(raw, choices, default):
+    if raw is None:
+        return default
+    if isinstance(default, bool):  # QSettings (ini) trả "true" / "false"
+        return str(raw).lower() in ("true", "1")
+    if callable(choices):  # chuỗi → giá trị qua hàm parse
+        try:
+            return choices(str(raw))
+        except ValueError:
+            return default
+    if isinstance(choices, range):
+        try:
+            value = int(raw)
+        except (TypeError, ValueError):
+            return default
+        return value if value in choices else default
+    value = str(raw)
+    return value if value in choices else default
+
+
+def job_options(settings: QSettings) -> Dict[str, object]:
+    """kwargs cho PipelineWorker đọc từ QSettings."""
+    return {key: _option_value(settings.value(f"pipeline/{key}"), choices, default)
+            for key, _, choices, default in JOB_OPTIONS}
+
+
+class JobOptionsDialog(QDialog):
+    """Sửa JOB_OPTIONS; OK → ghi QSettings (áp dụng cho file thêm vào hàng đợi sau đó)."""
+
+    def __init__(self, settings: QSettings, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Tuỳ chọn xử lý")
+        self.settings = settings
+        self.editors: Dict[str, QWidget] = {}
+        form = QFormLayout(self)
+        current = job_options(settings)
+        for key, label, choices, default in JOB_OPTIONS:
+            if isinstance(default, bool):
+                editor = QCheckBox()
+                editor.setChecked(current[key])
+            elif isinstance(choices, range):
+                editor = QSpinBox()
+                editor.setRange(choices.start, choices.stop - 1)
+                editor.setValue(current[key])
+            elif callable(choices):
+                editor = QLineEdit(_option_text(current[key]))
+            else:
+                editor = QComboBox()
+                editor.addItems(list(choices))
+                editor.setCurrentText(current[key])
+            form.addRow(label, editor)
+            self.editors[key] = editor
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        form.addRow(buttons)
+
+    def accept(self):
+        values = {}
+        for key, _, choices, _ in JOB_OPTIONS:
+            editor = self.editors[key]
+            if isinstance(editor, QCheckBox):
+                values[key] = editor.isChecked()
+            elif isinstance(editor, QSpinBox):
+                values[key] = editor.value()
+            elif isinstance(editor, QLineEdit):
+                try:
+                    values[key] = _option_text(choices(editor.text()))
+                except ValueError as e:
+                    QMessageBox.warning(self, "Giá trị không hợp lệ", str(e))
+                    return
+            else:
+                values[key] = editor.currentText()
+        for key, value in values.items():
+            self.settings.setValue(f"pipeline/{key}", value)
+        super().accept()
+
+# ======================
+# Hàng đợi nhiều file: mỗi file 1 dòng trong tableWidget (bước, thời gian, kết quả)
+# ======================
+QUEUE_COLUMNS = ("File", "Bước", "Thời gian", "Kết quả")
+COL_FILE, COL_STAGE, COL_TIME, COL_RESULT = range(4)
+# Bước của run_pipeline (ProgressEvent.stage) → tên hiển thị
+STAGE_NAMES = {"extract": "1/4 trích text", "fields": "2/4 đọc trường", "qr": "3/4 tạo QR", "stamp": "4/4 chèn QR"}
+
+
+class BatchQueue(QObject):
+    """
+    Chạy tối đa `parallel` file cùng lúc (mỗi file 1 PipelineWorker chờ trên WarmPool),
+    file thêm vào giữa chừng thì xếp hàng tiếp. Cập nhật bảng + docs/min cho cả đợt.
+    Cột "Thời gian" có tooltip wall/CPU từng bước; cancel() huỷ dòng chờ hoặc dòng đang chạy.
+    """
+    finished = Signal(int, int, int, str)  # số ok, số lỗi, số huỷ, PDF kết quả cuối cùng
+
+    def __init__(self, table: QTableWidget, status: QLabel, pool: WarmPool, base_path: Path, parallel: int,
+                 cache: Optional[ExtractionCache] = None, templates: Optional[TemplateStore] = None,
+                 options: Optional[Dict[str, object]] = None, parent=None):
+        super().__init__(parent)
+        self.table = table
+        self.status = status
+        self.pool = pool
+        self.base_path = base_path
+        self.parallel = max(1, parallel)
+        self.cache = cache
+        self.templates = templates
+        self.options = dict(options or {})  # JOB_OPTIONS → tham số PipelineWorker cho file chạy sau
+        self.pending: List[Tuple[int, Path, Path, str]] = []    # (dòng, pdf, pdf kết quả, stem file trung gian)
+        self.running: Dict[int, Tuple[PipelineWorker, float]] = {}  # dòng → (worker, lúc bắt đầu)
+        self._threads = set()                                   # giữ QThread tới khi thật sự kết thúc
+        self._stage_times: Dict[int, List[str]] = {}              # dòng → "bước wall (CPU …)"
+        self._names: Dict[str, int] = {}                        # file ra đã dùng trong đợt → thêm _2, _3…
+        self._stems: Dict[str, int] = {}                        # stem file trung gian đã dùng (batch.job_stems)
+        self._reset_round()
+        self.timer = QTimer(self)
+        self.timer.setInterval(250)
+        self.timer.timeout.connect(self._tick)
+
+    def _reset_round(self):
+        self.total = self.n_ok = self.n_failed = self.n_cancelled = 0
+        self.last_out = ""
+        self.t0 = self.t_end = None
+        self._names.clear()
+        self._stems.clear()
+
+    def busy(self) -> bool:
+        return bool(self.pending or self.running)
+
+    def set_parallel(self, n: int):
+        self.parallel = max(1, n)
+        self.pool.resize(self.parallel)
+        self._pump()
+
+    def add(self, pdfs: List[Path], outpdf_dir: Path):
+        if not self.busy():
+            self._reset_round()  # đợt mới: tính lại docs/min từ đầu
+            self.t0 = time.perf_counter()
+        outpdf_dir.mkdir(parents=True, exist_ok=True)
+        for pdf, stem in zip(pdfs, job_stems(pdfs, self._stems)):
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            self._set(row, COL_FILE, pdf.name, tip=str(pdf))
+            self._set(row, COL_STAGE, "chờ")
+            self.pending.append((row, pdf, self._out_path(pdf, outpdf_dir), stem))
+        self.total += len(pdfs)
+        self._pump()
+        self._update_status()
+
+    def _out_path(self, pdf: Path, outdir: Path) -> Path:
+        # Trùng thư mục gốc → hậu tố _qr (không ghi đè file gốc); trùng tên trong đợt → _2, _3…
+        stem = f"{pdf.stem}_qr" if pdf.parent.resolve() == outdir.resolve() else pdf.stem
+        key = os.path.normcase(str(outdir.resolve() / stem))
+        n = self._names.get(key, 0) + 1
+        self._names[key] = n
+        return outdir / (f"{stem}{pdf.suffix}" if n == 1 else f"{stem}_{n}{pdf.suffix}")
+
+    def _pump(self):
+        while self.pending and len(self.running) < self.parallel:
+            row, pdf, out, stem = self.pending.pop(0)
+            w = PipelineWorker(base_path=self.base_path, pdf_path=pdf, outpdf_dir=out.parent, out_pdf=out, page=0,
+                               artifact_stem=stem,
+                               cache=self.cache, templates=self.templates, pool=self.pool, **self.options)
+            w.log.connect(lambda s: print(s, end=""))
+            w.progress.connect(lambda events, row=row: self._on_progress(row, events))
+            w.result.connect(lambda result, row=row: self._on_done(row, result))
+            w.finished.connect(lambda w=w: self._threads.discard(w))
+            self._threads.add(w)
+            self.running[row] = (w, time.perf_counter())
+            self._set(row, COL_STAGE, "bắt đầu")
+            w.start()
+        if self.running and not self.timer.isActive():
+            self.timer.start()
+
+    def cancel(self, rows: Optional[List[int]] = None):
+        """Huỷ các dòng `rows` (None = cả hàng đợi): dòng chờ bỏ luôn, dòng đang chạy dừng ở điểm kiểm tra kế tiếp."""
+        wanted = None if rows is None else set(rows)
+        keep = []
+        for item in self.pending:
+            if wanted is None or item[0] in wanted:
+                self.n_cancelled += 1
+                self._set(item[0], COL_STAGE, "đã huỷ")
+            else:
+                keep.append(item)
+        changed = len(keep) != len(self.pending)
+        self.pending = keep
+        for row, (w, _) in self.running.items():
+            if (wanted is None or row in wanted) and not w.cancel_token.cancelled:
+                w.cancel()
+                self._set(row, COL_STAGE, "đang huỷ…")
+        if changed:
+            self._check_finished()
+
+    def _on_progress(self, row: int, events: List[ProgressEvent]):
+        entry = self.running.get(row)
+        cancelling = entry is not None and entry[0].cancel_token.cancelled
+        for ev in events:
+            if ev.kind == OCR_PAGE and ev.dpi:  # DPI + conf đã chốt của trang (tooltip cột thời gian)
+                self._stage_times.setdefault(row, []).append(f"OCR p{ev.page}: {ev.dpi} dpi, conf {ev.conf:.0f}")
+            if ev.kind == STAGE_END:
+                self._stage_times.setdefault(row, []).append(
+                    f"{ev.stage}: {ev.wall * 1000:.0f} ms (CPU {ev.cpu * 1000:.0f} ms)")
+            elif cancelling:
+                continue
+            elif ev.kind == STAGE_START:
+                self._set(row, COL_STAGE, STAGE_NAMES.get(ev.stage, ev.stage))
+            elif ev.kind == ENGINE:
+                self._set(row, COL_STAGE, f"{STAGE_NAMES['extract']} ({ev.engine})")
+            elif ev.kind == OCR_PAGE:
+                self._set(row, COL_STAGE, f"1/4 OCR trang {ev.page}/{ev.pages}")
+
+    def _on_done(self, row: int, result: JobResult):
+        _, started = self.running.pop(row)
+        times = self._stage_times.pop(row, [])
+        self._set(row, COL_TIME, f"{time.perf_counter() - started:.2f} s", tip="\n".join(times))
+        if result.ok:
+            self.n_ok += 1
+            self.last_out = result.out
+            self._set(row, COL_STAGE, "xong")
+            self._set(row, COL_RESULT, result.out, tip=result.out)
+        elif result.cancelled:
+            self.n_cancelled += 1
+            self._set(row, COL_STAGE, "đã huỷ")
+        else:
+            self.n_failed += 1
+            err = result.error or "lỗi"
+            self._set(row, COL_STAGE, "lỗi")
+            self._set(row, COL_RESULT, err, tip=err)
+        self._pump()
+        self._check_finished()
+
+    def _check_finished(self):
+        if self.busy() or self.t0 is None or self.t_end is not None:
+            self._update_status()
+            return
+        self.timer.stop()
+        self.t_end = time.perf_counter()
+        self._update_status()
+        self.finished.emit(self.n_ok, self.n_failed, self.n_cancelled, self.last_out)
+
+    def _tick(self):
+        now = time.perf_counter()
+        for row, (_, started) in self.running.items():
+            self._set(row, COL_TIME, f"{now - started:.1f} s")
+        self._update_status()
+
+    def _update_status(self):
+        if self.t0 is None:
+            return
+        done = self.n_ok + self.n_failed
+        elapsed = (self.t_end or time.perf_counter()) - self.t0
+        rate = done / elapsed * 60 if elapsed > 0 else 0.0
+        text = f"{done + self.n_cancelled}/{self.total} xong, {self.n_failed} lỗi"
+        if self.n_cancelled:
+            text += f", {self.n_cancelled} huỷ"
+        text += f" · {rate:.1f} docs/min"
+        if self.t_end is not None:
+            text += f" · {elapsed:.1f} s"
+        self.status.setText(text)
+
+    def _set(self, row: int, col: int, text: str, tip: str = ""):
+        item = self.table.item(row, col)
+        if item is None:
+            item = QTableWidgetItem()
+            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+            self.table.setItem(row, col, item)
+        item.setText(text)
+        if tip:
+            item.setToolTip(tip)
 
 # ======================
 #  MainWindow (merged behavior from code2)
@@ -465,13 +515,22 @@ class MainWindow(QMainWindow):
 
         self.ui.pushButton_2.clicked.connect(self.choose_input_pdf)
         self.ui.pushButton_3.clicked.connect(self.choose_output_dir)
-        try:
-            widgets.tableWidget.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        except Exception:
-            pass
+        self.setAcceptDrops(True)  # kéo thả file PDF / thư mục vào cửa sổ → thêm vào hàng đợi
 
         self.show()
         self.settings = QSettings("KI-Gpt", "QR-PDF")  # đặt org/app tuỳ ý
+        # Cache text/trường theo nội dung file (giữ qua các lần mở app, không nằm trong _MEIPASS)
+        cache_root = QStandardPaths.writableLocation(QStandardPaths.AppLocalDataLocation) or str(Path.home() / ".qrpdf")
+        self.cache = ExtractionCache(Path(cache_root) / "cache")
+        self.templates = TemplateStore(Path(cache_root) / "templates.json")
+        # Worker khởi động nền ngay khi mở app → lần bấm đầu đã không tốn import pdfminer/fitz/qrcode
+        parallel = min(max(self.settings.value("parallel", GUI_WORKERS, type=int), 1), MAX_PARALLEL)
+        self.pool = WarmPool(parallel, cache_dir=self.cache.root, templates_path=self.templates.path).start()
+        self._setup_queue_ui(parallel)
+        self.queue = BatchQueue(self.ui.tableWidget, self.queue_status, self.pool, Path(self._base_path()), parallel,
+                                cache=self.cache, templates=self.templates, options=job_options(self.settings),
+                                parent=self)
+        self.queue.finished.connect(self._on_queue_done)
         self._restore_settings()
 
         # Lưu lại khi người dùng sửa xong ô nhập
@@ -485,6 +544,92 @@ class MainWindow(QMainWindow):
         # #     UIFunctions.theme(self, themeFile, True)
         # #     # AppFunctions.setThemeHack(self)
 
+    def _setup_queue_ui(self, parallel: int):
+        ui = self.ui
+        if not hasattr(ui, "tableWidget"):
+            # ui_main.py chưa có bảng → đặt vào hàng dưới (2 ô trống) của frame_2
+            ui.tableWidget = QTableWidget(0, len(QUEUE_COLUMNS), ui.frame_2)
+            for w in (ui.widget, ui.widget_4):
+                w.hide()
+            ui.gridLayout_2.addWidget(ui.tableWidget, 1, 0, 1, 2)
+        table = ui.tableWidget
+        table.setColumnCount(len(QUEUE_COLUMNS))
+        table.setHorizontalHeaderLabels(QUEUE_COLUMNS)
+        table.verticalHeader().setVisible(False)
+        table.setWordWrap(False)
+        table.setTextElideMode(Qt.ElideMiddle)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        # Cửa sổ đặt "background: transparent" cho mọi widget → tô bảng giống khung #widget_2
+        table.setStyleSheet("""
+            QTableWidget {
+                background-color: rgba(255, 255, 255, 220);
+                color: #000;
+                border: 2px solid #009688;
+                border-radius: 10px;
+                gridline-color: #b2dfdb;
+                font-size: 8pt;
+            }
+            QHeaderView::section {
+                background-color: #e0f2f1;
+                color: #000;
+                border: none;
+                border-bottom: 1px solid #009688;
+                padding: 4px;
+                font-weight: 600;
+            }
+        """)
+        header = table.horizontalHeader()
+        for col in range(len(QUEUE_COLUMNS)):
+            mode = QHeaderView.Stretch if col in (COL_FILE, COL_RESULT) else QHeaderView.ResizeToContents
+            header.setSectionResizeMode(col, mode)
+
+        # Dưới bảng: số file chạy song song + tiến độ/docs/min của đợt
+        bar = QWidget(table.parentWidget())
+        lay = QHBoxLayout(bar)
+        lay.setContentsMargins(0, 0, 0, 0)
+        lay.addWidget(QLabel("Song song:"))
+        self.parallel_spin = QSpinBox()
+        self.parallel_spin.setRange(1, MAX_PARALLEL)
+        self.parallel_spin.setValue(parallel)
+        self.parallel_spin.valueChanged.connect(self._set_parallel)
+        lay.addWidget(self.parallel_spin)
+        self.cancel_button = QPushButton("Huỷ")
+        self.cancel_button.setToolTip("Huỷ các dòng đang chọn (không chọn dòng nào = huỷ cả hàng đợi)")
+        self.cancel_button.clicked.connect(self._cancel_jobs)
+        lay.addWidget(self.cancel_button)
+        self.options_button = QPushButton("Tuỳ chọn…")
+        self.options_button.setToolTip("Tuỳ chọn xử lý cho các file thêm vào hàng đợi sau đó")
+        self.options_button.clicked.connect(self._edit_job_options)
+        lay.addWidget(self.options_button)
+        lay.addStretch(1)
+        self.queue_status = QLabel("")
+        bar.setStyleSheet("""
+            QLabel { color: #000; font-size: 8pt; font-weight: 600; }
+            QPushButton {
+                background-color: #e0f2f1; color: #000; font-size: 8pt;
+                border: 1px solid #009688; border-radius: 6px; padding: 2px 12px;
+            }
+            QPushButton:hover { background-color: #b2dfdb; }
+        """)
+        lay.addWidget(self.queue_status)
+        layout = table.parentWidget().layout()
+        if isinstance(layout, QGridLayout):
+            layout.addWidget(bar, layout.rowCount(), 0, 1, layout.columnCount())
+        else:
+            layout.addWidget(bar)
+
+    def _set_parallel(self, n: int):
+        self.settings.setValue("parallel", n)
+        self.queue.set_parallel(n)
+
+    def _edit_job_options(self):
+        if JobOptionsDialog(self.settings, self).exec() == QDialog.Accepted:
+            self.queue.options = job_options(self.settings)
+
+    def _cancel_jobs(self):
+        rows = sorted({item.row() for item in self.ui.tableWidget.selectedItems()})
+        self.queue.cancel(rows or None)
+
     def _base_path(self) -> str:
         if getattr(sys, 'frozen', False):
             return sys._MEIPASS
@@ -492,11 +637,13 @@ class MainWindow(QMainWindow):
 
     def choose_input_pdf(self):
         start_dir = self.ui.lineEdit_2.text().strip() or str(Path.home())
-        file_path, _ = QFileDialog.getOpenFileName(
+        start_dir = start_dir.split(";")[0].strip()
+        file_paths, _ = QFileDialog.getOpenFileNames(
             self, "Chọn file PDF", start_dir, "PDF files (*.pdf);;All files (*.*)"
         )
-        if file_path:
-            self.ui.lineEdit_2.setText(file_path)
+        if file_paths:
+            # nhiều file: ngăn bằng ";" (run_pipeline tách lại, thư mục/glob cũng được)
+            self.ui.lineEdit_2.setText("; ".join(file_paths))
 
     def choose_output_dir(self):
         project_root = Path(self._base_path()).resolve()
@@ -519,34 +666,37 @@ class MainWindow(QMainWindow):
         self.settings.setValue("last_pdf", self.ui.lineEdit_2.text().strip())
         self.settings.setValue("last_outdir", self.ui.lineEdit_3.text().strip())
 
+    def _outpdf_dir(self) -> Path:
+        text = self.ui.lineEdit_3.text().strip()
+        if not text:
+            return Path(self._base_path()) / "pdf" / "output"
+        # Sau khi chạy 1 file, ô này hiện đường dẫn PDF kết quả → dùng thư mục chứa nó
+        return Path(text).parent if text.lower().endswith(".pdf") else Path(text)
+
     def run_pipeline(self):
-        pdf_path = self.ui.lineEdit_2.text().strip()
-        outpdf_dir = self.ui.lineEdit_3.text().strip()
-        if not pdf_path:
+        specs = [s.strip() for s in self.ui.lineEdit_2.text().split(";") if s.strip()]
+        if not specs:
             QMessageBox.warning(self, "Thiếu đường dẫn", "Vui lòng chọn file PDF (nút 2).")
             return
         self._save_settings()
+        self.enqueue(collect_inputs(specs))
 
-        base_path = Path(self._base_path())
-        outpdf = Path(outpdf_dir) if outpdf_dir else base_path / "pdf" / "output"
-        outpdf.mkdir(parents=True, exist_ok=True)
-
+    def enqueue(self, pdfs: List[Path]):
+        if not pdfs:
+            QMessageBox.warning(self, "Không có file", "Không tìm thấy file PDF nào.")
+            return
+        # Thêm vào hàng đợi (đang chạy thì xếp sau), không khoá nút
+        self.queue.add(pdfs, self._outpdf_dir())
 
-        # Disable run button while processing
-        self.ui.pushButton_3.setEnabled(False)
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
 
-        # Start worker
-        self.worker = PipelineWorker(
-            base_path=base_path,
-            pdf_path=Path(pdf_path),
-            outpdf_dir=outpdf,
-            page=0,
-            qr_fraction=4.0,
-            max1d=80,
-        )
-        self.worker.log.connect(lambda s: print(s, end=""))
-        self.worker.done.connect(self._on_pipeline_done)
-        self.worker.start()
+    def dropEvent(self, event):
+        paths = [u.toLocalFile() for u in event.mimeData().urls() if u.isLocalFile()]
+        if paths:
+            event.acceptProposedAction()
+            self.enqueue(collect_inputs(paths))
 
     from PySide6.QtWidgets import QMessageBox, QApplication, QStyleFactory
     from PySide6.QtCore import Qt
@@ -603,13 +753,27 @@ class MainWindow(QMainWindow):
         (msg.exec if hasattr(msg, "exec") else msg.exec_)()
 
 
-    def _on_pipeline_done(self, ok: bool, result_pdf: str):
-        self.ui.pushButton_3.setEnabled(True)
+    def _on_queue_done(self, n_ok: int, n_failed: int, n_cancelled: int, result_pdf: str):
+        if n_ok + n_failed == 0:
+            return  # cả đợt bị huỷ
+        if n_ok + n_failed + n_cancelled > 1:
+            text = f"Đã tạo {n_ok} file trong {self._outpdf_dir()}"
+            if n_failed:
+                text += f"\n{n_failed} file lỗi (xem cột Kết quả)."
+            self.show_native_message("Hoàn tất", text, level="error" if n_failed and not n_ok else "info")
+            return
+        ok = n_ok == 1
         if ok and result_pdf:
             self.ui.lineEdit_3.setText(result_pdf)
             self.show_native_message("Hoàn tất", f"Đã tạo: {result_pdf}", level="info")
         else:
             self.show_native_message("Lỗi", "Pipeline thất bại. Xem log console để biết thêm chi tiết.", level="error")
+    def closeEvent(self, event):
+        self.queue.finished.disconnect(self._on_queue_done)
+        self.queue.cancel()
+        self.pool.close(wait=False)
+        return super().closeEvent(event)
+
     # Keep original helpers
     def resizeEvent(self, event):
         UIFunctions.resize_grips(self)
@@ -627,6 +791,9 @@ class MainWindow(QMainWindow):
 # Entrypoint
 # ======================
 if __name__ == "__main__":
+    # Cần cho pool OCR (multiprocessing spawn) khi đóng gói bằng PyInstaller
+    import multiprocessing
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     try:
         base_path = getattr(sys, 'frozen', False) and sys._MEIPASS or os.path.dirname(__file__)
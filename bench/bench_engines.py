@@ -0,0 +1,139 @@
+"""
+So sánh engine đọc lớp text (pdfminer / pdfium / pymupdf) trên file mẫu pdf/input
+và corpus asfr102 giả lập (bench/corpus.py, biến thể text).
+
+Mỗi engine: docs/s, p50/p95 (ms/file, trang 1, lượt đầu làm nóng không tính), và độ khớp
+từng trường QR (ms / desc / sl / ngay / ddh):
+  - "ref":  so với pdfminer (engine mặc định) trên mọi file,
+  - "gt":   so với giá trị đúng trong manifest (chỉ file corpus).
+Cuối bảng gợi ý engine nhanh nhất mà khớp 100% — ứng viên cho --text-engine mặc định.
+
+    python bench/bench_engines.py
+    python bench/bench_engines.py --count 100 --repeat 5
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "code"))
+sys.path.insert(0, str(ROOT / "bench"))
+
+import corpus  # noqa: E402
+from bench_pipeline import percentile  # noqa: E402
+from extract import extract_pdfium_sorted, extract_pdfminer_topdown_ltr, extract_pymupdf_sorted  # noqa: E402
+from fields import _norm, parse_fields  # noqa: E402
+
+ENGINES: Dict[str, Callable[..., str]] = {
+    "pdfminer": extract_pdfminer_topdown_ltr,
+    "pdfium": extract_pdfium_sorted,
+    "pymupdf": extract_pymupdf_sorted,
+}
+FIELDS = ("ms", "desc", "sl", "ngay", "ddh")
+
+
+def _fields(text: str) -> Dict[str, str]:
+    f = parse_fields(text.splitlines())
+    return {k: _norm(f.get(k)) for k in FIELDS}
+
+
+def run(pdfs: List[Path], expected: Dict[Path, Dict[str, str]], engines: List[str], repeat: int,
+        log=print) -> Dict[str, dict]:
+    ref = {p: _fields(extract_pdfminer_topdown_ltr(p, page_index=0)) for p in pdfs}
+    results = {}
+    for name in engines:
+        fn = ENGINES[name]
+        fn(pdfs[0], page_index=0)  # làm nóng: import, font, CMap
+        secs: List[float] = []
+        ref_ok = {k: 0 for k in FIELDS}
+        gt_ok = {k: 0 for k in FIELDS}
+        for p in pdfs:
+            for i in range(repeat):
+                t0 = time.perf_counter()
+                text = fn(p, page_index=0)
+                secs.append(time.perf_counter() - t0)
+            got = _fields(text)
+            for k in FIELDS:
+                ref_ok[k] += got[k] == ref[p][k]
+                exp = expected.get(p)
+                if exp is not None:
+                    gt_ok[k] += bool(got[k]) if k == "desc" else got[k] == exp[k]
+        n_gt = len(expected)
+        res = {
+            "n": len(secs),
+            "docs_per_s": round(len(secs) / sum(secs), 2) if sum(secs) > 0 else 0.0,
+            "p50_ms": round(percentile(secs, 50) * 1000, 2),
+            "p95_ms": round(percentile(secs, 95) * 1000, 2),
+            "ref": {k: ref_ok[k] / len(pdfs) for k in FIELDS},
+            "gt": {k: gt_ok[k] / n_gt for k in FIELDS} if n_gt else None,
+        }
+        results[name] = res
+        log(_row(name, res))
+    return results
+
+
+def _pct(d: Optional[Dict[str, float]]) -> str:
+    if d is None:
+        return "-"
+    return " ".join(f"{k}={v * 100:.0f}%" for k, v in d.items())
+
+
+def _row(name: str, r: dict) -> str:
+    return (f"{name:<9} {r['n']:>5} {r['docs_per_s']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}  "
+            f"ref[{_pct(r['ref'])}]  gt[{_pct(r['gt'])}]")
+
+
+def _correct(r: dict) -> bool:
+    return all(v == 1.0 for v in r["ref"].values()) and (r["gt"] is None or all(v == 1.0 for v in r["gt"].values()))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="So sánh tốc độ + độ khớp trường QR của các engine lớp text")
+    ap.add_argument("--samples", default=str(ROOT / "pdf" / "input"), help="Thư mục PDF mẫu thật ('' = bỏ qua)")
+    ap.add_argument("--corpus", default=None, help="Thư mục corpus có sẵn (manifest.json); không có thì sinh mới")
+    ap.add_argument("--count", type=int, default=30, help="Số file corpus sinh thêm (0 = chỉ file mẫu)")
+    ap.add_argument("--seed", type=int, default=102, help="Seed khi sinh corpus")
+    ap.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES), help="Engine cần đo")
+    ap.add_argument("--repeat", type=int, default=3, help="Số lần chạy mỗi file mỗi engine")
+    args = ap.parse_args()
+
+    pdfs: List[Path] = sorted(Path(args.samples).glob("*.pdf")) if args.samples else []
+    expected: Dict[Path, Dict[str, str]] = {}
+    tmp = None
+    try:
+        docs: List[corpus.CorpusDoc] = []
+        if args.corpus:
+            docs = corpus.load(Path(args.corpus))
+        elif args.count > 0:
+            tmp = Path(tempfile.mkdtemp(prefix="qrpdf-corpus-"))
+            docs = corpus.generate(tmp, args.count, seed=args.seed, variants=("text",))
+        for d in docs:
+            if d.variant == "text":  # scan không có lớp text, engine nào cũng 0%
+                pdfs.append(d.path)
+                expected[d.path] = d.expected
+        if not pdfs:
+            print("[ERROR] Không có PDF nào để đo.")
+            sys.exit(1)
+
+        print(f"{len(pdfs)} file ({len(pdfs) - len(expected)} mẫu thật, {len(expected)} corpus), repeat={args.repeat}")
+        print(f"{'engine':<9} {'n':>5} {'docs/s':>8} {'p50 ms':>8} {'p95 ms':>8}  khớp trường (ref = pdfminer, gt = manifest)")
+        results = run(pdfs, expected, args.engines, args.repeat)
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    ok = [n for n, r in results.items() if _correct(r)]
+    if ok:
+        best = max(ok, key=lambda n: results[n]["docs_per_s"])
+        print(f"nhanh nhất mà khớp 100%: {best} ({results[best]['p50_ms']:.1f} ms/file p50)")
+    else:
+        print("không engine nào khớp 100% trường")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Micro-benchmark bộ parse trường QR (code/fields.py).
+
+Lấy scan/output/a.txt làm mẫu, nhân lên thành input lớn: phía trước là các dòng
+"nhiễu" (dòng mẫu đã bỏ nhãn), khối trường thật nằm cuối → cả 2 cách đều phải
+đọc gần hết input. So sánh lines/sec của parse 1 lượt (_parse) với cách cũ
+quét lại theo từng nhãn (_parse_rescan) và kiểm tra ra cùng payload.
+
+    python bench/bench_fields.py
+    python bench/bench_fields.py --sizes 1000 100000 --repeat 5
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "code"))
+
+from fields import STOP_LABELS, VALUE_LABELS, _norm_cmp, _parse, _parse_rescan, build_qr_payload  # noqa: E402
+
+
+def synthetic_lines(sample: list, n_lines: int) -> list:
+    """~n_lines dòng: nhiễu lấy từ mẫu (không chứa nhãn/FNW/NPS/SV) + mẫu gốc ở cuối."""
+    labels = [_norm_cmp(lbl) for lbl in STOP_LABELS + list(VALUE_LABELS)]
+    noise = [ln for ln in sample
+             if ln.strip()
+             and not any(_norm_cmp(ln).startswith(lbl) for lbl in labels)
+             and "NPS" not in ln and "FNW" not in ln and not ln.strip().startswith("SV")]
+    need = max(n_lines - len(sample), 0)
+    filler = (noise * (need // max(len(noise), 1) + 1))[:need]
+    return filler + sample
+
+
+def bench(fn, lines: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(lines)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark parse trường QR (lines/sec)")
+    ap.add_argument("--sample", default=str(ROOT / "scan" / "output" / "a.txt"), help="File text mẫu")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000], help="Số dòng input")
+    ap.add_argument("--repeat", type=int, default=3, help="Số lần chạy mỗi cỡ (lấy lần nhanh nhất)")
+    args = ap.parse_args()
+
+    sample = Path(args.sample).read_text(encoding="utf-8", errors="replace").splitlines()
+    print(f"sample: {args.sample} ({len(sample)} lines)")
+    print(f"{'lines':>10} {'single-pass l/s':>16} {'rescan l/s':>14} {'speedup':>8}")
+    for n in args.sizes:
+        lines = synthetic_lines(sample, n)
+        new, old = _parse(lines), _parse_rescan(lines)
+        if build_qr_payload(new[0]) != build_qr_payload(old[0]) or new[1] != old[1]:
+            sys.exit(f"[ERROR] payload khác nhau ở {n} dòng:\n  {new}\n  {old}")
+        t_new = bench(_parse, lines, args.repeat)
+        t_old = bench(_parse_rescan, lines, args.repeat)
+        print(f"{len(lines):>10} {len(lines) / t_new:>16,.0f} {len(lines) / t_old:>14,.0f} {t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark extract_pdfminer_many: hàng trăm phiếu asfr102 cùng template (bench/corpus.py,
+biến thể text) đọc bằng pdfminer trong 1 process.
+
+  per-doc: mỗi file 1 PDFResourceManager mới (như extract_pages trước đây) → ToUnicode
+           CMap của font parse lại mỗi file, CMap CJK nạp khi file đầu tiên cần
+  shared:  extract_pdfminer_many → 1 SharedResourceManager cho cả lô + preload_cmaps()
+
+Mỗi chế độ chạy trong 1 process spawn riêng (cache class CMapDB sạch). Báo tổng thời gian,
+docs/s, p50/p95 ms/file, file đầu tiên, thời gian preload, số ToUnicode parse/hit,
+và kiểm tra text 2 chế độ giống hệt nhau.
+
+    python bench/bench_pdfminer_batch.py --count 300
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List
+import argparse
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "code"))
+sys.path.insert(0, str(ROOT / "bench"))
+
+import corpus  # noqa: E402
+from bench_pipeline import percentile  # noqa: E402
+
+MODES = ("per-doc", "shared")
+
+
+def _run(mode: str, pdfs: List[str], page_index: int) -> dict:
+    """Chạy trong process riêng: giây/file, text từng file, thống kê cache."""
+    from extract import extract_pdfminer_many, extract_pdfminer_topdown_ltr
+    import fitz  # noqa: F401  (import sẵn như pipeline, không tính vào file đầu)
+    import pdfminer.high_level  # noqa: F401
+
+    preload = 0.0
+    stats = "-"
+    secs, texts = [], []
+    t_all = time.perf_counter()
+    if mode == "per-doc":
+        from pdfminer.pdfinterp import PDFResourceManager
+        for p in pdfs:
+            t0 = time.perf_counter()
+            texts.append(extract_pdfminer_topdown_ltr(p, page_index=page_index, rsrcmgr=PDFResourceManager()))
+            secs.append(time.perf_counter() - t0)
+    else:
+        from fontcache import preload_cmaps, shared_resource_manager
+        preload = preload_cmaps()
+        t0 = time.perf_counter()
+        for text in extract_pdfminer_many(pdfs, page_index=page_index, preload=False):
+            texts.append(text)
+            secs.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+        stats = shared_resource_manager().stats()
+    return {"secs": secs, "texts": texts, "wall": time.perf_counter() - t_all, "preload": preload, "stats": stats}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="pdfminer: resource manager chung + preload CMap trên lô phiếu cùng template")
+    ap.add_argument("--corpus", default=None, help="Thư mục corpus có sẵn (manifest.json); không có thì sinh mới")
+    ap.add_argument("--count", type=int, default=200, help="Số phiếu khi sinh corpus")
+    ap.add_argument("--seed", type=int, default=102, help="Seed khi sinh corpus")
+    ap.add_argument("--page", type=int, default=0, help="Trang cần đọc (-1 = mọi trang)")
+    args = ap.parse_args()
+
+    tmp = None
+    try:
+        if args.corpus:
+            docs = [d for d in corpus.load(Path(args.corpus)) if d.variant == "text"]
+        else:
+            tmp = Path(tempfile.mkdtemp(prefix="qrpdf-corpus-"))
+            t0 = time.perf_counter()
+            docs = corpus.generate(tmp, args.count, seed=args.seed, variants=("text",))
+            print(f"corpus: {len(docs)} phiếu sinh trong {time.perf_counter() - t0:.1f} s")
+        pdfs = [str(d.path) for d in docs]
+        page_index = args.page if args.page >= 0 else None
+
+        ctx = multiprocessing.get_context("spawn")
+        results = {}
+        print(f"{'mode':<8} {'files':>5} {'total s':>8} {'docs/s':>7} {'p50 ms':>7} {'p95 ms':>7} {'1st ms':>7} "
+              f"{'preload':>8}  cache")
+        for mode in MODES:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+                r = ex.submit(_run, mode, pdfs, page_index).result()
+            results[mode] = r
+            secs = r["secs"]
+            total = sum(secs) + r["preload"]
+            print(f"{mode:<8} {len(secs):>5} {total:>8.2f} {len(secs) / total:>7.1f} "
+                  f"{percentile(secs, 50) * 1000:>7.1f} {percentile(secs, 95) * 1000:>7.1f} {secs[0] * 1000:>7.1f} "
+                  f"{r['preload'] * 1000:>6.0f}ms  {r['stats']}")
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    base, shared = results["per-doc"], results["shared"]
+    t_base = sum(base["secs"])
+    t_shared = sum(shared["secs"]) + shared["preload"]
+    same = sum(a == b for a, b in zip(base["texts"], shared["texts"]))
+    print(f"tiết kiệm: {(t_base - t_shared) / t_base * 100:.1f}% ({(t_base - t_shared) / len(pdfs) * 1000:.1f} ms/file); "
+          f"text giống hệt: {same}/{len(pdfs)}")
+    if same != len(pdfs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Benchmark từng bước pipeline trên bộ PDF asfr102 giả lập (bench/corpus.py).
+
+Mỗi bước chạy trong 1 process spawn riêng (interpreter mới) trên toàn bộ corpus, gọi
+đúng hàm thật: extract_pdfminer_topdown_ltr, extract_pdfium_sorted, extract_pymupdf_sorted, extract_ocr,
+extract_fields_to_qr_text, make_qr, make_code128, embed_qr_into_pdf. Báo docs/s,
+p50/p95 (ms/file), peak RSS của process bước đó; bước trích text còn báo tỉ lệ file
+đọc đúng trường QR (so với manifest). Lượt gọi đầu (import, cache) không tính giờ.
+
+--save ghi JSON làm baseline; --baseline so với file đã lưu, chậm/tốn RAM hơn quá
+--tolerance thì báo REGRESSION và exit 1. Corpus cố định theo --seed để so được.
+
+    python bench/bench_pipeline.py --count 30
+    python bench/bench_pipeline.py --save bench_base.json
+    python bench/bench_pipeline.py --baseline bench_base.json --stages pdfminer fields qr
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import json
+import math
+import multiprocessing
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "code"))
+sys.path.insert(0, str(ROOT / "bench"))
+
+import corpus  # noqa: E402
+
+STAGES = ("pdfminer", "pdfium", "pymupdf", "ocr", "fields", "qr", "code128", "embed")
+EXTRACT_STAGES = ("pdfminer", "pdfium", "pymupdf", "ocr")
+# Chỉ số: hướng "tệ hơn" (+1: càng lớn càng tệ, -1: càng nhỏ càng tệ)
+METRICS = {"p50_ms": 1, "p95_ms": 1, "docs_per_s": -1, "peak_rss_mb": 1}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q trong 0..100)."""
+    s = sorted(values)
+    return s[max(0, min(len(s) - 1, math.ceil(q / 100 * len(s)) - 1))]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak RSS của process hiện tại (+ process con đã kết thúc, vd tesseract), MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2 ** 20
+        except (ImportError, AttributeError):
+            return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024  # macOS: bytes, Linux: KB
+
+
+def _prepare(docs: List[corpus.CorpusDoc], work: Path) -> List[dict]:
+    """Input cho từng bước (không tính giờ): text pdfminer (file scan → text gốc), payload, QR PNG."""
+    from extract import extract_pdfminer_topdown_ltr
+    from fields import parse_fields, build_qr_payload
+    from pipeline import qr_png_bytes, to_ascii_one_line
+
+    jobs = []
+    for d in docs:
+        stem = d.path.stem
+        text = extract_pdfminer_topdown_ltr(d.path, page_index=0)
+        if len(text.strip()) < 10:
+            text = d.text.read_text(encoding="utf-8").split("\f")[0]  # như OCR đọc đúng 100%
+        txt = work / f"{stem}.txt"
+        txt.write_text(text, encoding="utf-8")
+        payload = build_qr_payload(parse_fields(text.splitlines()))
+        png = work / f"{stem}_qr.png"
+        png.write_bytes(qr_png_bytes(payload)[0])
+        jobs.append({"pdf": str(d.path), "variant": d.variant, "expected": d.expected, "txt": str(txt),
+                     "payload": payload, "ascii": to_ascii_one_line(payload), "png": str(png),
+                     "out": str(work / stem)})
+    return jobs
+
+
+def _run_stage(stage: str, jobs: List[dict], repeat: int) -> dict:
+    """Chạy trong process riêng: [giây/file], số file đọc đúng trường, peak RSS."""
+    import mainqr  # code/mainqr.py (sys.path[0] = code/)
+    from extract import extract_ocr, extract_pdfium_sorted, extract_pdfminer_topdown_ltr, extract_pymupdf_sorted
+    from fields import extract_fields_to_qr_text, parse_fields
+
+    calls = {
+        "pdfminer": lambda j: extract_pdfminer_topdown_ltr(j["pdf"], page_index=0),
+        "pdfium": lambda j: extract_pdfium_sorted(j["pdf"], page_index=0),
+        "pymupdf": lambda j: extract_pymupdf_sorted(j["pdf"], page_index=0),
+        "ocr": lambda j: extract_ocr(j["pdf"], page_index=0, log=lambda s: None),
+        "fields": lambda j: extract_fields_to_qr_text(Path(j["txt"]), Path(j["out"] + "_qr.txt")),
+        "qr": lambda j: mainqr.make_qr(j["payload"], Path(j["out"] + "_qr_b.png"), Path(j["out"] + "_qr.svg")),
+        "code128": lambda j: mainqr.make_code128(j["ascii"], Path(j["out"] + "_code128")),
+        "embed": lambda j: mainqr.embed_qr_into_pdf(j["pdf"], Path(j["png"]), Path(j["out"] + "_qr.pdf")),
+    }
+    fn = calls[stage]
+    fn(jobs[0])  # làm nóng: import thư viện, font, cache của bước
+    secs, correct = [], 0
+    for j in jobs:
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            out = fn(j)
+            secs.append(time.perf_counter() - t0)
+            if i == 0 and stage in EXTRACT_STAGES:
+                f = parse_fields((out or "").splitlines())
+                correct += all(f[k] == v for k, v in j["expected"].items()) and bool(f["desc"])
+    return {"secs": secs, "correct": correct, "peak_rss_mb": peak_rss_mb()}
+
+
+def _ocr_available() -> bool:
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def run(docs: List[corpus.CorpusDoc], stages: List[str], repeat: int = 1, log=print) -> Dict[str, dict]:
+    results: Dict[str, dict] = {}
+    work = Path(tempfile.mkdtemp(prefix="qrpdf-bench-"))
+    try:
+        jobs = _prepare(docs, work)
+        ctx = multiprocessing.get_context("spawn")
+        for stage in stages:
+            stage_jobs = jobs
+            if stage == "ocr":
+                if not _ocr_available():
+                    log(f"{stage:<10} (bỏ qua: không tìm thấy tesseract)")
+                    continue
+                stage_jobs = [j for j in jobs if j["variant"] != "text"]  # trang 1 là ảnh scan
+            if stage in ("pdfminer", "pdfium", "pymupdf"):
+                stage_jobs = [j for j in jobs if j["variant"] == "text"]
+            if not stage_jobs:
+                log(f"{stage:<10} (bỏ qua: corpus không có file phù hợp)")
+                continue
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+                r = ex.submit(_run_stage, stage, stage_jobs, repeat).result()
+            secs = r["secs"]
+            res = {
+                "n": len(secs),
+                "docs_per_s": round(len(secs) / sum(secs), 2) if sum(secs) > 0 else 0.0,
+                "p50_ms": round(percentile(secs, 50) * 1000, 2),
+                "p95_ms": round(percentile(secs, 95) * 1000, 2),
+                "peak_rss_mb": round(r["peak_rss_mb"], 1) if r["peak_rss_mb"] is not None else None,
+            }
+            if stage in EXTRACT_STAGES:
+                res["fields_ok"] = round(r["correct"] / len(stage_jobs), 3)
+            results[stage] = res
+            log(_row(stage, res))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+def _row(stage: str, r: dict) -> str:
+    rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "-"
+    ok = f"{r['fields_ok'] * 100:.0f}%" if "fields_ok" in r else "-"
+    return f"{stage:<10} {r['n']:>5} {r['docs_per_s']:>9.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {rss:>8} {ok:>9}"
+
+
+def _ms_per_doc(metric: str, value: float) -> float:
+    return 1000 / value if metric == "docs_per_s" else value
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], tolerance: float, min_ms: float = 2.0) -> List[str]:
+    """
+    Các dòng REGRESSION: chỉ số tệ hơn baseline quá `tolerance` (tỉ lệ); chỉ số thời gian
+    còn phải chậm hơn ít nhất `min_ms` ms/file (bước vài ms thì nhiễu đo đã vượt 25%).
+    """
+    out = []
+    for stage, cur in current.items():
+        base = baseline.get(stage)
+        if base is None:
+            continue
+        for metric, worse in METRICS.items():
+            b, c = base.get(metric), cur.get(metric)
+            if not b or c is None:
+                continue
+            change = (c - b) / b
+            if metric != "peak_rss_mb" and abs(_ms_per_doc(metric, c) - _ms_per_doc(metric, b)) < min_ms:
+                continue
+            if change * worse > tolerance:
+                out.append(f"{stage} {metric}: {b} -> {c} ({change * 100:+.0f}%)")
+        if "fields_ok" in base and cur.get("fields_ok", 0) < base["fields_ok"]:
+            out.append(f"{stage} fields_ok: {base['fields_ok']} -> {cur.get('fields_ok')}")
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark từng bước pipeline trên corpus asfr102 giả lập")
+    ap.add_argument("--corpus", default=None, help="Thư mục corpus có sẵn (manifest.json); không có thì sinh mới")
+    ap.add_argument("--count", type=int, default=30, help="Số file khi sinh corpus")
+    ap.add_argument("--seed", type=int, default=102, help="Seed khi sinh corpus")
+    ap.add_argument("--variants", nargs="+", choices=corpus.VARIANTS, default=list(corpus.VARIANTS),
+                    help="Biến thể khi sinh corpus")
+    ap.add_argument("--pages", type=int, nargs=2, default=[1, 4], metavar=("MIN", "MAX"), help="Số trang mỗi phiếu")
+    ap.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Bước cần đo")
+    ap.add_argument("--repeat", type=int, default=3, help="Số lần chạy mỗi file mỗi bước")
+    ap.add_argument("--save", default=None, help="Ghi kết quả ra JSON (dùng làm baseline)")
+    ap.add_argument("--baseline", default=None, help="JSON baseline để so (báo REGRESSION, exit 1)")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Ngưỡng chậm/tốn RAM hơn baseline (0.25 = 25%%)")
+    ap.add_argument("--min-ms", type=float, default=2.0, help="Bỏ qua chênh lệch thời gian dưới N ms/file")
+    args = ap.parse_args()
+
+    tmp = None
+    if args.corpus:
+        docs = corpus.load(Path(args.corpus))
+        params = json.loads((Path(args.corpus) / "manifest.json").read_text(encoding="utf-8"))
+    else:
+        tmp = Path(tempfile.mkdtemp(prefix="qrpdf-corpus-"))
+        t0 = time.perf_counter()
+        docs = corpus.generate(tmp, args.count, seed=args.seed, variants=args.variants, pages=tuple(args.pages))
+        params = json.loads((tmp / "manifest.json").read_text(encoding="utf-8"))
+        print(f"corpus: {len(docs)} file ({', '.join(args.variants)}) sinh trong {time.perf_counter() - t0:.1f} s")
+    params.pop("docs", None)
+
+    try:
+        print(f"{'stage':<10} {'n':>5} {'docs/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'rss MB':>8} {'fields ok':>9}")
+        results = run(docs, args.stages, repeat=args.repeat)
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {"python": sys.version.split()[0], "platform": platform.platform(), "corpus": params,
+              "repeat": args.repeat, "stages": results}
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=1), encoding="utf-8")
+        print(f"saved -> {args.save}")
+    if args.baseline:
+        base = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if base.get("corpus") != params:
+            print("[WARN] corpus khác baseline (seed/count/variants/pages) → số liệu có thể không so được")
+        regressions = compare(results, base.get("stages", {}), args.tolerance, args.min_ms)
+        for line in regressions:
+            print(f"[REGRESSION] {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"không có regression so với {args.baseline} (ngưỡng {args.tolerance * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
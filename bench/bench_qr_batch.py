@@ -0,0 +1,88 @@
+"""
+Mã hoá QR hàng loạt: qrbatch.encode_qr_many (numpy theo nhóm version/EC) so với qrcode từng payload
+(qrrender.encode_qr), trên corpus payload ngẫu nhiên:
+
+  - "asfr102": payload thật kiểu 'MS:…;con hang:…;sl:…;Ngay Hoan tat:…;Don dat hang:…' (đa số cùng version),
+  - "random":  trộn đoạn số / alnum / byte (có tiếng Việt, chữ Hán), độ dài 0-1200, đủ version 1-40.
+
+Mỗi mức EC: số payload, khoảng version, giây qrcode vs numpy, ms/payload, tăng tốc và số ma trận
+khác nhau (phải = 0: ma trận, version, EC giống hệt từng bit). Lệch → exit 1.
+
+    python bench/bench_qr_batch.py
+    python bench/bench_qr_batch.py --count 2000 --ec L,M,Q,H
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import List
+import argparse
+import random
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "code"))
+
+from qrbatch import encode_qr_many  # noqa: E402
+from qrrender import encode_qr  # noqa: E402
+
+ALPHABETS = ("0123456789", "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 $%*+-./:",
+             "abcxyzĂăâđêôơưệ;:()MS-0123456789 ", "字漢")
+LENGTHS = (0, 1, 5, 20, 60, 140, 250, 400, 800, 1200)
+
+
+def asfr102_payload(rng: random.Random) -> str:
+    return (f"MS:PP{rng.randint(100, 999)}-2507{rng.randint(100000, 999999)};"
+            f"con hang:NPS{rng.randint(1, 12)}/2 CL{rng.choice((150, 300, 600))} CF3M (PCTFE+F316+XM-19);"
+            f"sl:{rng.randint(1, 99)}.000 PCS;Ngay Hoan tat:2025/{rng.randint(1, 12)}/{rng.randint(1, 28)};"
+            f"Don dat hang:SV011-2507{rng.randint(100000, 999999)}")
+
+
+def random_payload(rng: random.Random) -> str:
+    n = rng.choice(LENGTHS)
+    parts: List[str] = []
+    while sum(map(len, parts)) < n:
+        alphabet = rng.choice(ALPHABETS)
+        parts.append("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 40))))
+    return "".join(parts)[:n]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="encode_qr_many (numpy) vs qrcode từng payload, kiểm tra giống hệt")
+    ap.add_argument("--count", type=int, default=300, help="Số payload mỗi loại corpus / mức EC")
+    ap.add_argument("--ec", default="L,M,Q,H", help="Các mức EC cần đo")
+    ap.add_argument("--seed", type=int, default=24)
+    args = ap.parse_args()
+
+    encode_qr_many(["warm"])  # import numpy / qrcode, không tính
+    rng = random.Random(args.seed)
+    failed = 0
+    print(f"{'corpus':<8} {'EC':>2} {'n':>5} {'version':>8} {'qrcode s':>9} {'numpy s':>8} "
+          f"{'ms/qr':>6} {'x':>6}  khác")
+    for kind, gen in (("asfr102", asfr102_payload), ("random", random_payload)):
+        for ec in args.ec.split(","):
+            payloads, ref = [], []
+            t_ref = 0.0
+            for _ in range(args.count):
+                p = gen(rng)
+                t0 = time.perf_counter()
+                try:
+                    m = encode_qr(p, ec=ec)
+                except Exception:  # quá dài cho mức EC này: bỏ
+                    continue
+                t_ref += time.perf_counter() - t0
+                payloads.append(p)
+                ref.append(m)
+            t0 = time.perf_counter()
+            got = encode_qr_many(payloads, ec=ec)
+            t_np = time.perf_counter() - t0
+            diff = sum(a != b for a, b in zip(ref, got))
+            failed += diff
+            versions = f"{min(m.version for m in ref)}-{max(m.version for m in ref)}"
+            print(f"{kind:<8} {ec:>2} {len(payloads):>5} {versions:>8} {t_ref:>9.2f} {t_np:>8.2f} "
+                  f"{t_np / len(payloads) * 1000:>6.2f} {t_ref / t_np:>6.1f}  {diff}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Payload QR đầy đủ vs gọn (qrpayload) trên trường của file mẫu pdf/input + trường asfr102 ngẫu nhiên:
+
+  full:          'MS:…;con hang:…;sl:…;…' mã hoá như trước (qrcode, 1 đoạn byte, EC Q)
+  full+seg:      cùng payload, đoạn numeric/alnum/byte tối ưu (qrrender.encode_qr_optimal)
+  compact:       payload gọn, đoạn tối ưu, EC Q
+  compact@vN:    payload gọn, EC mạnh nhất còn vừa version N (--max-version)
+
+Mỗi cách: độ dài payload, version (min / trung bình / max), số module mỗi cạnh, ms mã hoá p50,
+bytes PNG (10 px/module) và phân bố mức EC. Kiểm tra parse_payload(payload gọn) == trường
+(ngày / số lượng đã chuẩn hoá phải giải ra đúng chuỗi cũ); lệch → exit 1.
+
+    python bench/bench_qr_payload.py
+    python bench/bench_qr_payload.py --count 500 --max-version 5
+"""
+from __future__ import annotations
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List
+import argparse
+import random
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "code"))
+sys.path.insert(0, str(ROOT / "bench"))
+
+from bench_pipeline import percentile  # noqa: E402
+from extract import extract_pdfium_sorted  # noqa: E402
+from fields import QR_FIELDS, build_qr_payload, fields_from_text  # noqa: E402
+from qrpayload import build_compact_payload, parse_payload  # noqa: E402
+from qrrender import QrMatrix, encode_qr, encode_qr_optimal, render_png  # noqa: E402
+
+DESCS = ("NPS{s} CL{c} CF3M (PCTFE+F316+XM-19)",
+         "FNW KV-M1FS RF ASME B16.10 (Nace) NPS{s} CL{c} WCB (TFM1600+20%+316+316)",
+         "FNW KV-L41 RF ASME B16.10 (Nace) NPS{s} CL{c} CF8M (TFM1600+20%+F316+F316)")
+
+
+def random_fields(rng: random.Random) -> Dict[str, str]:
+    return {
+        "ms": f"PP105-25{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}{rng.randint(1, 9999):04d}",
+        "desc": rng.choice(DESCS).format(s=rng.choice(("1/2", "11/2", "2", "3", "6")), c=rng.choice((150, 300, 600))),
+        "sl": f"{rng.choice((1, 10, 25, 120, 300))}.{rng.choice(('000', '000', '500'))} PCS",
+        "ngay": f"2025/{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}",
+        "ddh": f"SV011-25{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}{rng.randint(1, 9999):04d}",
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Payload QR đầy đủ vs gọn: version, thời gian mã hoá, PNG")
+    ap.add_argument("--count", type=int, default=200, help="Số bộ trường ngẫu nhiên (thêm vào file mẫu)")
+    ap.add_argument("--max-version", type=int, default=5, help="Version đích cho chế độ chọn EC")
+    ap.add_argument("--seed", type=int, default=25)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus: List[Dict[str, str]] = [fields_from_text(extract_pdfium_sorted(p, page_index=0))
+                                    for p in sorted((ROOT / "pdf" / "input").glob("*.pdf"))]
+    corpus += [random_fields(rng) for _ in range(args.count)]
+
+    bad = 0
+    for fields in corpus:
+        want = {key: fields.get(key, "") for key, _ in QR_FIELDS}
+        bad += parse_payload(build_compact_payload(fields)) != want
+        bad += parse_payload(build_qr_payload(fields)) != want
+
+    n = args.max_version
+    methods: Dict[str, Callable[[Dict[str, str]], tuple]] = {
+        "full": lambda f: (build_qr_payload(f), lambda p: encode_qr(p)),
+        "full+seg": lambda f: (build_qr_payload(f), lambda p: encode_qr_optimal(p)),
+        "compact": lambda f: (build_compact_payload(f), lambda p: encode_qr_optimal(p)),
+        f"compact@v{n}": lambda f: (build_compact_payload(f), lambda p: encode_qr_optimal(p, ec="L", max_version=n)),
+    }
+    encode_qr("warm")  # import qrcode, không tính
+    print(f"{len(corpus)} bộ trường, parse_payload: " + ("khớp hết" if not bad else f"{bad} lệch"))
+    print(f"{'method':<12} {'len':>5} {'ver min/avg/max':>16} {'modules':>8} {'p50 ms':>7} {'PNG B':>6}  EC")
+    for name, make in methods.items():
+        lens: List[int] = []
+        mats: List[QrMatrix] = []
+        secs: List[float] = []
+        for fields in corpus:
+            payload, encode = make(fields)
+            t0 = time.perf_counter()
+            mats.append(encode(payload))
+            secs.append(time.perf_counter() - t0)
+            lens.append(len(payload))
+        versions = [m.version for m in mats]
+        png = sum(len(render_png(m)[0]) for m in mats) / len(mats)
+        ecs = " ".join(f"{ec}:{c}" for ec, c in sorted(Counter(m.ec for m in mats).items()))
+        print(f"{name:<12} {sum(lens) / len(lens):>5.0f} "
+              f"{'%d/%.1f/%d' % (min(versions), sum(versions) / len(versions), max(versions)):>16} "
+              f"{sum(len(m.rows) for m in mats) / len(mats):>8.1f} {percentile(secs, 50) * 1000:>7.1f} "
+              f"{png:>6.0f}  {ecs}")
+    if bad:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
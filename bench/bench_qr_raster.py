@@ -0,0 +1,101 @@
+"""
+So sánh cách raster QR ra PNG với các độ dài payload điển hình (ma trận mã hoá 1 lần, không tính):
+
+  make_image:  qrcode.QRCode(box_size=10).make_image() + save — đường cũ (vẽ từng module bằng PIL)
+  render_png:  qrrender.render_png — PIL "1" n×n rồi resize NEAREST x10
+  print@DPI:   qrrender.render_png_print — numpy repeat đúng DPI máy in / cỡ in, PNG 1-bit ghi thẳng,
+               mỗi mức nén zlib trong --levels
+
+Mỗi cách: p50 ms / lần, kích thước PNG (pixel, bytes). Ảnh numpy được kiểm tra trùng từng pixel với
+render_png cùng số pixel / module.
+
+    python bench/bench_qr_raster.py
+    python bench/bench_qr_raster.py --width-mm 30 --dpis 203,300,600 --levels 1,6,9
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Callable, List, Tuple
+import argparse
+import io
+import random
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "code"))
+sys.path.insert(0, str(ROOT / "bench"))
+
+from bench_pipeline import percentile  # noqa: E402
+from qrrender import QR_BORDER, QR_BOX, encode_qr, print_scale, render_png, render_png_print  # noqa: E402
+
+LENGTHS = (60, 140, 250, 400)  # 140 ≈ payload asfr102 thường gặp
+
+
+def _payload(rng: random.Random, n: int) -> str:
+    """Chuỗi giống payload thật: 'MS:…;con hang:…;sl:…' (ASCII + vài ký tự tiếng Việt)."""
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 -/.:;()+ abcdefghijklmnopqrstuvwxyz ăâđêôơư"
+    return "".join(rng.choice(alphabet) for _ in range(n))
+
+
+def _time(fn: Callable[[], Tuple[bytes, Tuple[int, int]]], repeat: int) -> Tuple[float, bytes, Tuple[int, int]]:
+    secs: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        data, size = fn()
+        secs.append(time.perf_counter() - t0)
+    return percentile(secs, 50), data, size
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Raster QR: make_image (qrcode/PIL) vs numpy đúng DPI máy in")
+    ap.add_argument("--width-mm", type=float, default=52.5, help="Cỡ in QR (mm, mặc định ~1/4 khổ A4)")
+    ap.add_argument("--dpis", default="203,300,600", help="Các DPI máy in cần đo")
+    ap.add_argument("--levels", default="1,6,9", help="Các mức nén zlib cần đo")
+    ap.add_argument("--repeat", type=int, default=20, help="Số lần đo mỗi ô")
+    ap.add_argument("--seed", type=int, default=23)
+    args = ap.parse_args()
+
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_Q
+    from PIL import Image
+    import numpy  # noqa: F401  (import 1 lần, không tính vào lần đo đầu)
+
+    dpis = [int(d) for d in args.dpis.split(",")]
+    levels = [int(v) for v in args.levels.split(",")]
+    width_pt = args.width_mm / 25.4 * 72
+    rng = random.Random(args.seed)
+    mismatches = 0
+
+    print(f"{'len':>4} {'QR':>6} {'method':<16} {'p50 ms':>7} {'pixels':>10} {'bytes':>7}")
+    for n in LENGTHS:
+        data = _payload(rng, n)
+        qr = qrcode.QRCode(version=None, error_correction=ERROR_CORRECT_Q, box_size=QR_BOX, border=QR_BORDER)
+        qr.add_data(data)
+        qr.make(fit=True)
+        m = encode_qr(data)
+
+        def make_image() -> Tuple[bytes, Tuple[int, int]]:
+            img = qr.make_image(fill_color="black", back_color="white")
+            buf = io.BytesIO()
+            img.save(buf)
+            return buf.getvalue(), img.size
+
+        rows = [("make_image", make_image), ("render_png", lambda: render_png(m))]
+        for dpi in dpis:
+            for level in levels:
+                rows.append((f"print@{dpi} z{level}",
+                             lambda dpi=dpi, level=level: render_png_print(m, width_pt, dpi, level)))
+        for name, fn in rows:
+            sec, png, size = _time(fn, args.repeat)
+            print(f"{n:>4} {'v%d' % m.version:>6} {name:<16} {sec * 1000:>7.2f} {'%dx%d' % size:>10} {len(png):>7}")
+        for dpi in dpis:
+            got = Image.open(io.BytesIO(render_png_print(m, width_pt, dpi)[0]))
+            ref = Image.open(io.BytesIO(render_png(m, box_size=print_scale(m, width_pt, dpi))[0]))
+            mismatches += got.tobytes() != ref.tobytes()
+    print("numpy vs PIL: " + ("giống hệt từng pixel" if not mismatches else f"{mismatches} ảnh lệch"))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
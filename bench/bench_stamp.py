@@ -0,0 +1,112 @@
+"""
+So sánh cách chèn QR vào PDF (pipeline.QR_STAMPS) trên file mẫu pdf/input và corpus asfr102
+giả lập (bench/corpus.py, biến thể text):
+
+  image:   render_png (10 px/module) → page.insert_image (như trước đây)
+  vector:  các đoạn module đen thành 1 path trong content stream mới của trang
+  xobject: QR là Form XObject (PDF 1 trang của render_pdf) → page.show_pdf_page
+
+Ma trận QR mã hoá 1 lần / file (không tính). Mỗi chế độ: p50/p95 ms (render + chèn + tobytes),
+dung lượng PDF tăng thêm so với file gốc, và kiểm tra module: render vùng QR ở 300 dpi,
+lấy mẫu tâm từng module, so với ma trận.
+
+    python bench/bench_stamp.py
+    python bench/bench_stamp.py --count 100
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, List
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "code"))
+sys.path.insert(0, str(ROOT / "bench"))
+
+import corpus  # noqa: E402
+from bench_pipeline import percentile  # noqa: E402
+from fields import build_qr_payload, fields_from_text  # noqa: E402
+from extract import extract_pdfium_sorted  # noqa: E402
+from pdfsession import PdfSession  # noqa: E402
+from pipeline import QR_STAMPS, _qr_rect, stamp_qr, stamp_qr_vector  # noqa: E402
+from qrrender import QrMatrix, encode_qr, render_png  # noqa: E402
+
+
+def _stamp(mode: str, pdf: Path, matrix: QrMatrix) -> bytes:
+    with PdfSession(pdf) as session:
+        if mode == "image":
+            png, size = render_png(matrix)
+            return stamp_qr(session, png, size)
+        return stamp_qr_vector(session, matrix, xobject=mode == "xobject")
+
+
+def _modules_ok(pdf: bytes, matrix: QrMatrix) -> bool:
+    """Lấy mẫu tâm từng module trên bản render 300 dpi của vùng QR, so với ma trận."""
+    import fitz
+
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        page = doc[0]
+        rect = _qr_rect(page, 4.0, matrix.size, matrix.size)
+        pix = page.get_pixmap(dpi=300, colorspace=fitz.csGRAY, clip=rect)
+    cell = pix.width / matrix.size
+    b = matrix.border
+    for y, row in enumerate(matrix.rows):
+        for x, dark in enumerate(row):
+            px = pix.pixel(int((x + b + 0.5) * cell), int((y + b + 0.5) * cell))[0]
+            if (px < 128) != dark:
+                return False
+    return True
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Chèn QR: ảnh PNG vs path vector vs Form XObject")
+    ap.add_argument("--corpus", default=None, help="Thư mục corpus có sẵn (manifest.json); không có thì sinh mới")
+    ap.add_argument("--count", type=int, default=40, help="Số phiếu khi sinh corpus")
+    ap.add_argument("--seed", type=int, default=102, help="Seed khi sinh corpus")
+    ap.add_argument("--repeat", type=int, default=3, help="Số lần đo mỗi file / chế độ")
+    args = ap.parse_args()
+
+    tmp = None
+    try:
+        if args.corpus:
+            docs = [d for d in corpus.load(Path(args.corpus)) if d.variant == "text"]
+        else:
+            tmp = Path(tempfile.mkdtemp(prefix="qrpdf-corpus-"))
+            docs = corpus.generate(tmp, args.count, seed=args.seed, variants=("text",))
+        pdfs = sorted((ROOT / "pdf" / "input").glob("*.pdf")) + [d.path for d in docs]
+        matrices = {p: encode_qr(build_qr_payload(fields_from_text(extract_pdfium_sorted(p, page_index=0))))
+                    for p in pdfs}
+        _stamp("image", pdfs[0], matrices[pdfs[0]])  # làm nóng: import fitz / PIL
+
+        secs: Dict[str, List[float]] = {m: [] for m in QR_STAMPS}
+        grow: Dict[str, List[int]] = {m: [] for m in QR_STAMPS}
+        ok: Dict[str, int] = {m: 0 for m in QR_STAMPS}
+        for p in pdfs:
+            base = p.stat().st_size
+            for mode in QR_STAMPS:
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    out = _stamp(mode, p, matrices[p])
+                    secs[mode].append(time.perf_counter() - t0)
+                grow[mode].append(len(out) - base)
+                ok[mode] += _modules_ok(out, matrices[p])
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{len(pdfs)} file(s), QR {min(m.version for m in matrices.values())}-"
+          f"{max(m.version for m in matrices.values())} (version)")
+    print(f"{'mode':<8} {'p50 ms':>7} {'p95 ms':>7} {'+KB mean':>9} {'+KB max':>8}  modules")
+    for mode in QR_STAMPS:
+        g = grow[mode]
+        print(f"{mode:<8} {percentile(secs[mode], 50) * 1000:>7.1f} {percentile(secs[mode], 95) * 1000:>7.1f} "
+              f"{sum(g) / len(g) / 1024:>9.1f} {max(g) / 1024:>8.1f}  {ok[mode]}/{len(pdfs)} khớp")
+    if any(ok[m] != len(pdfs) for m in QR_STAMPS):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark thời gian khởi động (cold start) của CLI và GUI.
+
+Mỗi kịch bản chạy trong 1 interpreter mới (subprocess), đo wall time từ lúc
+gọi python tới lúc sẵn sàng (parse xong tham số / dựng xong MainWindow); lặp
+--repeat lần, lấy median/min. Thêm 1 lượt `-X importtime` để in các module
+tốn nhất, và kiểm tra không module nặng nào
+(fitz, pdfminer, pytesseract, qrcode, barcode, PIL…) bị nạp lúc khởi động.
+So với ngân sách trong bench/startup_budget.json → vượt thì exit 1.
+
+    python bench/bench_startup.py
+    python bench/bench_startup.py --repeat 10 --top 15 --save startup.json
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Chỉ được import khi bước tương ứng chạy (trích text / OCR / tạo QR / chèn QR)
+HEAVY = ("fitz", "pymupdf", "pdfminer", "pdf2image", "pytesseract", "PIL", "qrcode", "barcode")
+
+# -X importtime chỉ cho process đo: bật qua biến môi trường rồi gỡ ngay, để worker con (pool ấm của GUI)
+# không kế thừa và ghi chen dòng "import time:" vào cùng pipe stderr
+_IMPORTTIME_ENV = "PYTHONPROFILEIMPORTTIME"
+_PRELUDE = f"import os; os.environ.pop({_IMPORTTIME_ENV!r}, None)\n"
+
+_REPORT = f"""
+import json, sys
+print("@@" + json.dumps(sorted({{m.split(".")[0] for m in sys.modules}} & set({list(HEAVY)!r}))), file=sys.stderr)
+"""
+
+_RUN_SCRIPT = """
+import runpy, sys
+sys.argv = [{script!r}, *{argv!r}]
+sys.path.insert(0, {path!r})
+try:
+    runpy.run_path({script!r}, run_name="__main__")
+except SystemExit:
+    pass
+"""
+
+_GUI = """
+import os, sys
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.argv = ["a.py"]
+sys.path.insert(0, {root!r})
+import a
+from PySide6.QtWidgets import QApplication
+app = QApplication(sys.argv)
+w = a.MainWindow()
+"""
+
+SCENARIOS = {
+    # code/mainqr.py: parse tham số rồi thoát (chi phí import toàn bộ module code/)
+    "cli-help": _RUN_SCRIPT.format(script=str(ROOT / "code" / "mainqr.py"), argv=["--help"], path=str(ROOT / "code")),
+    # mainqr.py bản cũ ở thư mục gốc
+    "legacy-cli-help": _RUN_SCRIPT.format(script=str(ROOT / "mainqr.py"), argv=["--help"], path=str(ROOT)),
+    # a.py: import + dựng MainWindow (chưa mở file nào)
+    "gui-mainwindow": _GUI.format(root=str(ROOT)),
+}
+
+
+def run_once(code: str, importtime: bool = False):
+    """(ms tới khi sẵn sàng, module nặng đã nạp, [(ms cộng dồn, module cấp cao nhất)])."""
+    cmd = [sys.executable, "-c", _PRELUDE + code + _REPORT]
+    env = {**os.environ, _IMPORTTIME_ENV: "1"} if importtime else None
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    ready, heavy, imports, tail = None, None, [], []
+    # Tính tới lúc kịch bản báo xong (dòng "@@"), không tính lúc dọn dẹp khi thoát (vd đóng worker GUI)
+    for ln in proc.stderr:
+        at = ln.find("@@[")
+        if at >= 0:  # process khác ghi chen cùng dòng vẫn đọc được: chỉ giải đúng đoạn JSON sau "@@"
+            ready = time.perf_counter() - t0
+            heavy, _ = json.JSONDecoder().raw_decode(ln, at + 2)
+        elif ready is None and ln.startswith("import time:") and "|" in ln:
+            _, cum, name = (p.strip(" ") for p in ln[len("import time:"):].rstrip("\n").split("|"))
+            if cum.isdigit() and not name.startswith(" "):  # chỉ module cấp cao nhất
+                imports.append((int(cum) / 1000, name.strip()))
+        else:
+            tail = (tail + [ln])[-20:]
+    proc.wait()
+    if heavy is None:
+        raise RuntimeError(f"kịch bản lỗi (exit {proc.returncode}):\n{''.join(tail)}")
+    return ready * 1000, heavy, imports
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark thời gian khởi động CLI/GUI (cold start)")
+    ap.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS), help="Kịch bản cần đo")
+    ap.add_argument("--repeat", type=int, default=5, help="Số lần chạy mỗi kịch bản (mỗi lần 1 process mới)")
+    ap.add_argument("--top", type=int, default=8, help="Số module tốn nhất in ra từ -X importtime (0 = tắt)")
+    ap.add_argument("--budget", default=str(ROOT / "bench" / "startup_budget.json"), help="File ngân sách ms theo kịch bản")
+    ap.add_argument("--save", default=None, help="Ghi kết quả ra JSON (để so giữa các bản phát hành)")
+    args = ap.parse_args()
+
+    budget_path = Path(args.budget)
+    budget = json.loads(budget_path.read_text(encoding="utf-8")) if budget_path.exists() else {}
+    results, failed = {}, []
+
+    print(f"{'scenario':<18} {'median ms':>10} {'min ms':>8} {'budget':>8}  heavy modules")
+    for name in args.scenarios:
+        code = SCENARIOS[name]
+        if name.startswith("gui") and subprocess.run([sys.executable, "-c", "import PySide6"],
+                                                      capture_output=True).returncode != 0:
+            print(f"{name:<18} (bỏ qua: chưa cài PySide6)")
+            continue
+        run_once(code)  # làm nóng cache đĩa của OS, không tính
+        times, heavy = [], []
+        for _ in range(args.repeat):
+            ms, heavy, _ = run_once(code)
+            times.append(ms)
+        med = statistics.median(times)
+        limit = budget.get(name)
+        over = limit is not None and med > limit
+        if over or heavy:
+            failed.append(name)
+        flag = " OVER" if over else ""
+        print(f"{name:<18} {med:>10.0f} {min(times):>8.0f} {limit if limit is not None else '-':>8}{flag}  "
+              f"{', '.join(heavy) or '-'}")
+        results[name] = {"median_ms": round(med, 1), "min_ms": round(min(times), 1), "heavy": heavy}
+
+        if args.top:
+            _, _, imports = run_once(code, importtime=True)
+            for cum_ms, mod in sorted(imports, reverse=True)[:args.top]:
+                print(f"    {cum_ms:>8.1f} ms  {mod}")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({"python": sys.version.split()[0], "results": results}, indent=1),
+                                   encoding="utf-8")
+        print(f"saved -> {args.save}")
+    if failed:
+        sys.exit(f"[FAIL] vượt ngân sách hoặc nạp module nặng lúc khởi động: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Sinh PDF giả lập phiếu công lệnh asfr102 (PyMuPDF) hàng loạt cho benchmark.
+
+Bố cục trang 1 chép theo pdf/input (nhãn Việt/Hoa, khối NVL FNW/NPS, ngày, SV…),
+các trang sau là bảng vật liệu. Biến thể:
+  text   — có lớp text (như file xuất từ ERP)
+  scan   — mỗi trang chỉ là ảnh xám JPEG (render từ bản text) → phải OCR
+  mixed  — trang 1 là ảnh scan, các trang sau có lớp text
+Font: Noto Serif (tiếng Việt) + Droid Sans Fallback (chữ Hán), có sẵn trong PyMuPDF.
+Cùng --seed → cùng bộ file (để so với baseline). manifest.json ghi trường mong đợi,
+<tên>.txt là text gốc (mỗi ô 1 dòng, theo hàng) — đáp án cho OCR.
+
+    python bench/corpus.py --out /tmp/corpus --count 50
+    python bench/corpus.py --out /tmp/corpus --count 20 --variants scan --pages 1 3
+"""
+from __future__ import annotations
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import argparse
+import json
+import random
+
+VARIANTS = ("text", "scan", "mixed")
+
+PAGE_W, PAGE_H = 595.0, 841.0
+COMPANY = "Công Ty TNHH  Thiết Bị Kiểm Soát Dòng Chảy KingDom Việt Nam"
+APPROVALS = "批准 Tán thành：____________ 審核 Ôn tập：____________ 製表 lập bảng：____________"
+GAP = 14.0  # khoảng cách tối thiểu giữa 2 ô cùng hàng (pdfminer char_margin=2 không gộp nhãn với giá trị)
+
+PEOPLE = ["裴氏叶 BÙI THỊ DIỆP", "阮文雄 NGUYỄN VĂN HÙNG", "陈氏兰 TRẦN THỊ LAN", "黎明德 LÊ MINH ĐỨC"]
+DEPTS = ["[H110] VN_生管課", "[H120] VN_製造課", "[H130] VN_品保課"]
+ROUTES = ["[L41112]", "[ZP185]", "[M1F203]", "[L40007]"]
+MODELS = ["KV-L41", "KV-M1F", "KV-M1FS", "KV-L40", "KV-020"]
+# (zh, vi) mô tả van
+DESCS = [
+    ("法兰RF ASME B16.10 手柄含滑块 (Nace处理)", "mặt bích RF ASME B16.10 tay cầm có thanh trượt (xử lý Nace)"),
+    ("法兰 RF ASME B16.10 蜗轮操作", "mặt bích RF ASME B16.10 vận hành bánh vít"),
+    ("螺纹 NPT 手柄 (磷化)", "ren NPT tay cầm (phốt phát hoá)"),
+]
+SIZES = ["NPS11/2", "NPS2", "NPS21/2", "NPS3", "NPS4"]
+CLASSES = ["CL150", "CL300", "1000WOG"]
+BODIES = ["CF8M", "WCB", "F316", "SUS316"]
+SEATS = [("(TFM1600+20%玻纤+316+316) TFM1600填料 FKM 客户铭牌",
+          "(TFM1600+20%  thủy tinh+316+316) TFM1600 miếng đệm FKM nhãn hiệu khách hàng"),
+         ("(PTFE+316) PTFE填料 客户铭牌", "(PTFE+316) PTFE miếng đệm nhãn hiệu khách hàng")]
+PARTS = [("阀盖 (NACE)", "Nắp van (NACE)"), ("阀球", "Bi van"), ("阀座", "Đế van"), ("阀杆", "Chốt ty"),
+         ("碟形弹片", "Long đền đĩa"), ("阀杆填料 (上片)", "Oing chốt ty bộ (miếng trên)"), ("垫圈", "Đệm nắp mỏng")]
+
+
+@dataclass
+class Order:
+    """1 phiếu công lệnh giả: giá trị các ô + trường QR mong đợi."""
+    ms: str
+    nvl: str
+    fnw_zh: str
+    fnw_vi: str
+    nps_zh: str
+    nps_vi: str
+    sl: str
+    ngay: str
+    ddh: str
+    ddh2: str
+    printed: str
+    issued: str
+    bom: str
+    item: int
+    person: str
+    dept: str
+    route: str
+    materials: List[Tuple[str, str, str, str, int]] = field(default_factory=list)  # mã, zh, vi, quy cách, SL
+
+
+def random_order(rng: random.Random, n_materials: int) -> Order:
+    model = rng.choice(MODELS)
+    zh, vi = rng.choice(DESCS)
+    size, cls, body = rng.choice(SIZES), rng.choice(CLASSES), rng.choice(BODIES)
+    seat_zh, seat_vi = rng.choice(SEATS)
+    y, m = 2025, rng.randint(1, 12)
+    d = lambda: f"{y}/{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}"  # noqa: E731
+    materials = []
+    for _ in range(n_materials):
+        pzh, pvi = rng.choice(PARTS)
+        materials.append((f"1000{rng.randint(10000000000, 99999999999)}", f"KI {model} {pzh}", f"KI {model} {pvi}",
+                          f"{rng.choice(SIZES)} {rng.choice(CLASSES)} {rng.choice(BODIES)}", rng.choice((10, 20, 40))))
+    return Order(
+        ms=f"PP105-{y % 100}{m:02d}{rng.randint(1, 28):02d}{rng.randint(1, 9999):04d}",
+        nvl=f"988{rng.randint(100000000000, 999999999999)}",
+        fnw_zh=f"FNW {model} {zh}", fnw_vi=f"FNW {model} {vi}",
+        nps_zh=f"{size} {cls} {body} {seat_zh}", nps_vi=f"{size} {cls} {body} {seat_vi}",
+        sl=f"{rng.choice((10, 20, 50, 120, 300))}.000  PCS",
+        ngay=d(), ddh=f"SV011-{y % 100}{m:02d}{rng.randint(1, 28):02d}{rng.randint(1, 9999):04d}",
+        ddh2=f"SV011-{y}{rng.randint(1, 999999):06d}", printed=d(), issued=d(), bom=d(),
+        item=rng.randint(1, 9), person=rng.choice(PEOPLE), dept=rng.choice(DEPTS), route=rng.choice(ROUTES),
+        materials=materials,
+    )
+
+
+def expected_fields(order: Order) -> Dict[str, str]:
+    """Trường QR mong đợi (ms/sl/ngay/ddh chuẩn hoá như fields._norm; desc chỉ cần khác rỗng)."""
+    from fields import _norm
+    return {"ms": _norm(order.ms), "sl": _norm(order.sl), "ngay": _norm(order.ngay), "ddh": _norm(order.ddh)}
+
+
+# ======================
+# Vẽ trang
+# ======================
+
+_FONTS = None
+
+
+def _fonts():
+    global _FONTS
+    if _FONTS is None:
+        import fitz
+        _FONTS = (fitz.Font(language="vi"), fitz.Font("cjk"))  # Noto Serif, Droid Sans Fallback
+    return _FONTS
+
+
+def _runs(s: str):
+    """Tách chuỗi thành các đoạn cùng font (chữ Việt → Noto Serif, chữ Hán/fullwidth → cjk)."""
+    vi, cjk = _fonts()
+    out: List[list] = []
+    for c in s:
+        font = vi if c == " " or vi.has_glyph(ord(c)) else cjk
+        if out and out[-1][1] is font:
+            out[-1][0] += c
+        else:
+            out.append([c, font])
+    return out
+
+
+class _Page:
+    def __init__(self, page):
+        import fitz
+        self.page = page
+        self.tw = fitz.TextWriter(page.rect)
+        self.lines: List[str] = []
+
+    def row(self, y: float, cells: Sequence[Tuple[float, str]], size: float = 9.0) -> None:
+        """1 hàng: (x, text) theo thứ tự trái→phải; ô chồng lên ô trước thì đẩy sang phải."""
+        end = 0.0
+        for x, text in cells:
+            pos = (max(x, end + GAP) if end else x, y + size * 0.9)  # y = đỉnh dòng → baseline
+            for run, font in _runs(text):
+                _, pos = self.tw.append(pos, run, font=font, fontsize=size)
+            end = pos[0]
+            self.lines.append(text)
+
+    def finish(self) -> None:
+        self.tw.write_text(self.page)
+
+
+def _header(p: _Page, order: Order, pno: int, pages: int) -> None:
+    p.row(25.9, [(120.8, COMPANY)], size=12)
+    p.row(47.2, [(251.6, "In dữ liệu CT việc làm")], size=9.9)
+    p.row(64.1, [(42.0, "Ngày lập bảng:"), (107.3, order.printed), (167.6, "09:28:20"), (320.0, "Người lập:"),
+                 (366.0, order.person), (505.0, "Trang:"), (540.0, f"{pno}/{pages}")])
+
+
+def _footer(p: _Page, last: bool) -> None:
+    p.row(741.7, [(40.9, "(asfr102)")] + ([] if last else [(493.8, "(Tiếp trang sau)")]))
+    p.row(770.3, [(40.9, APPROVALS)])
+
+
+def _first_page(p: _Page, o: Order) -> None:
+    p.row(79.1, [(41.0, "MS đơn công lệnh:"), (126.8, o.ms), (219.3, "Tài khoản chi tiết料表已印"),
+                 (386.8, "Bộ phận chế tạo:"), (456.8, o.dept)])
+    p.row(91.1, [(350.3, "Sử dụng lưu trình chế tạo:"), (456.8, o.route)])
+    p.row(103.1, [(60.3, "NVL sản xuất:"), (126.8, f"{o.nvl}  M")])
+    p.row(115.1, [(40.3, o.fnw_zh)])
+    p.row(127.1, [(40.3, o.nps_zh)])
+    p.row(139.1, [(40.3, o.fnw_vi)])
+    p.row(151.1, [(40.3, o.nps_vi)])
+    p.row(163.1, [(41.5, "Số lượng sản xuất:"), (126.8, o.sl), (380.5, "Ngày phát thực tế:"), (456.8, o.issued)])
+    p.row(175.1, [(46.8, "Mã đơn đặt hàng:"), (126.8, o.ddh), (236.8, f"Hạng mục：{o.item}"),
+                  (348.6, "Ngày bắt đầu theo dự tính:"), (456.8, o.ngay)])
+    p.row(187.1, [(395.6, "Ngày Hoàn tất:"), (456.8, o.ngay)])
+    p.row(199.0, [(41.7, "Ngày có hiệu lực BOM:"), (138.0, o.bom)])
+    p.row(211.1, [(402.2, "Đơn đặt hàng"), (456.8, o.ddh2)])
+    p.row(232.9, [(56.3, "Ghi chú:")])
+    p.row(249.3, [(264.5, "**** Dữ liệu vật liệu dự phòng ****")])
+
+
+def _material_page(p: _Page, rows: Sequence[Tuple[str, str, str, str, int]]) -> None:
+    p.row(78.5, [(52.3, "Vật liệu cấp sau"), (136.3, "Tên sản phẩm"), (268.3, "Quy cách"), (377.4, "Mã"),
+                 (406.8, "Đơn vị"), (439.1, "Số lượng"), (487.1, "Số lượng"), (526.3, "Số lô")])
+    p.row(90.5, [(136.3, "品名/規格"), (371.0, "nguồn"), (439.9, "cần phát"), (490.1, "đã phát")])
+    y = 105.1
+    for code, zh, vi, spec, qty in rows:
+        p.row(y, [(40.3, "0"), (48.5, code), (136.3, zh), (268.3, spec), (370.3, "P"), (406.3, "PCS"),
+                  (436.3, str(qty)), (484.3, "0.000")])
+        p.row(y + 36, [(136.3, vi), (364.3, spec)])
+        y += 68.1
+
+
+def render_order(order: Order, pages: int) -> Tuple[bytes, str]:
+    """
+    (PDF có lớp text, text gốc) của 1 phiếu: trang 1 = trường QR,
+    trang 2..pages = bảng vật liệu (8 dòng/trang). Trang trong text gốc ngăn bằng form-feed.
+    """
+    import fitz
+    doc = fitz.open()
+    texts = []
+    for pno in range(1, pages + 1):
+        p = _Page(doc.new_page(width=PAGE_W, height=PAGE_H))
+        _header(p, order, pno, pages)
+        if pno == 1:
+            _first_page(p, order)
+        else:
+            _material_page(p, order.materials[(pno - 2) * 8:(pno - 1) * 8])
+        _footer(p, last=pno == pages)
+        p.finish()
+        texts.append("\n".join(p.lines))
+    doc.subset_fonts()
+    return doc.tobytes(garbage=3, deflate=True), "\n\f\n".join(texts)
+
+
+def to_scanned(pdf: bytes, pages: Optional[Sequence[int]] = None, dpi: int = 200, quality: int = 75) -> bytes:
+    """Thay trang `pages` (mặc định mọi trang) bằng ảnh xám JPEG của chính nó → không còn lớp text."""
+    import fitz
+    src = fitz.open(stream=pdf, filetype="pdf")
+    out = fitz.open()
+    for pno in range(src.page_count):
+        if pages is None or pno in pages:
+            pix = src[pno].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+            page = out.new_page(width=src[pno].rect.width, height=src[pno].rect.height)
+            page.insert_image(page.rect, stream=pix.tobytes("jpeg", jpg_quality=quality))
+        else:
+            out.insert_pdf(src, from_page=pno, to_page=pno)
+    return out.tobytes(garbage=3, deflate=True)
+
+
+@dataclass
+class CorpusDoc:
+    path: Path
+    text: Path
+    variant: str
+    pages: int
+    expected: Dict[str, str]
+
+
+def generate(out: Path, count: int, seed: int = 102, variants: Sequence[str] = VARIANTS,
+             pages: Tuple[int, int] = (1, 4), dpi: int = 200) -> List[CorpusDoc]:
+    """Ghi `count` PDF vào out/ (biến thể xoay vòng theo `variants`) + manifest.json."""
+    rng = random.Random(seed)
+    out.mkdir(parents=True, exist_ok=True)
+    docs = []
+    for i in range(count):
+        variant = variants[i % len(variants)]
+        n_pages = rng.randint(pages[0], pages[1])
+        order = random_order(rng, n_materials=8 * (n_pages - 1))
+        pdf, text = render_order(order, n_pages)
+        if variant == "scan":
+            pdf = to_scanned(pdf, dpi=dpi)
+        elif variant == "mixed":
+            pdf = to_scanned(pdf, pages=[0], dpi=dpi)
+        path = out / f"asfr102-{variant}-{i:04d}.pdf"
+        path.write_bytes(pdf)
+        path.with_suffix(".txt").write_text(text, encoding="utf-8")
+        docs.append(CorpusDoc(path, path.with_suffix(".txt"), variant, n_pages, expected_fields(order)))
+    manifest = {"seed": seed, "count": count, "variants": list(variants), "pages": list(pages), "dpi": dpi,
+                "docs": [dict(asdict(d), path=d.path.name, text=d.text.name) for d in docs]}
+    (out / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+    return docs
+
+
+def load(corpus: Path) -> List[CorpusDoc]:
+    """Đọc lại bộ file đã sinh (manifest.json)."""
+    manifest = json.loads((corpus / "manifest.json").read_text(encoding="utf-8"))
+    return [CorpusDoc(corpus / d["path"], corpus / d["text"], d["variant"], d["pages"], d["expected"])
+            for d in manifest["docs"]]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Sinh PDF asfr102 giả lập (text / scan / mixed) cho benchmark")
+    ap.add_argument("--out", required=True, help="Thư mục ghi PDF + manifest.json")
+    ap.add_argument("--count", type=int, default=30, help="Số file")
+    ap.add_argument("--seed", type=int, default=102, help="Seed ngẫu nhiên (cùng seed → cùng bộ file)")
+    ap.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS), help="Biến thể (xoay vòng)")
+    ap.add_argument("--pages", type=int, nargs=2, default=[1, 4], metavar=("MIN", "MAX"), help="Số trang mỗi phiếu")
+    ap.add_argument("--dpi", type=int, default=200, help="DPI ảnh scan")
+    args = ap.parse_args()
+    docs = generate(Path(args.out), args.count, seed=args.seed, variants=args.variants, pages=tuple(args.pages),
+                    dpi=args.dpi)
+    print(f"{len(docs)} file -> {args.out}")
+
+
+if __name__ == "__main__":
+    import sys
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "code"))
+    main()
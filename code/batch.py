@@ -0,0 +1,258 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import glob
+import importlib
+import multiprocessing
+import os
+import signal
+import time
+
+from pdfsession import PdfSession
+from ocr import DEFAULT_LADDER, DpiLadder, shared_pool
+from pipeline import Artifacts, qr_png_bytes, run_pipeline
+from qrrender import PNG_LEVEL
+from preflight import DEFAULT_ENGINE
+from template import TemplateStore
+from extractcache import ExtractionCache
+
+# ======================
+# Batch: nhiều PDF (thư mục / glob / @danh_sách) chạy song song trên pool process
+# ======================
+
+STAGES = ("extract", "fields", "qr", "stamp")
+
+
+@dataclass
+class BatchOptions:
+    """Tham số chung cho mọi job (picklable để gửi sang worker)."""
+    outpdf: Path
+    outdir: Optional[Path] = None       # có: ghi file trung gian <stem>.txt, <stem>_qr.* ... vào đây
+    page_index: Optional[int] = 0
+    use_ocr: bool = True
+    raster: str = "fitz"
+    text_engine: str = DEFAULT_ENGINE
+    ocr_mode: str = "page"              # "roi": trang scan chỉ OCR vùng giá trị asfr102
+    ocr_backfill: bool = False          # có lớp text nhưng thiếu trường → OCR vùng của trường đó
+    ocr_dpi: DpiLadder = DEFAULT_LADDER
+    ocr_workers: int = 0                # > 0: pool OCR giữ model (shared_pool) trong mỗi process batch
+    cache_dir: Optional[Path] = None    # None: không dùng cache
+    template: bool = False
+    qr_fraction: float = 4.0
+    qr_stamp: str = "image"             # "vector" / "xobject": vẽ module thẳng vào trang, không PNG
+    qr_dpi: int = 0                     # > 0: PNG QR render đúng DPI máy in / cỡ in
+    qr_png_level: int = PNG_LEVEL
+    qr_payload: str = "full"            # "compact": payload gọn (qrpayload)
+    qr_max_version: int = 0             # > 0: chọn EC mạnh nhất còn vừa version này
+    max1d: int = 80
+
+
+@dataclass
+class JobResult:
+    pdf: str
+    ok: bool
+    secs: float
+    out: str = ""
+    error: str = ""
+    payload: str = ""
+    timings: Dict[str, float] = field(default_factory=dict)
+    cpu_timings: Dict[str, float] = field(default_factory=dict)
+    ocr: List[Dict[str, float]] = field(default_factory=list)  # mỗi trang OCR: {"page", "dpi", "conf"}
+    steps: Dict[str, float] = field(default_factory=dict)      # bước con: qr.encode / qr.png / ...
+    cancelled: bool = False
+
+
+@dataclass
+class BatchSummary:
+    results: List[JobResult]
+    wall: float
+    jobs: int
+
+    @property
+    def failed(self) -> List[JobResult]:
+        return [r for r in self.results if not r.ok]
+
+    def stage_totals(self, cpu: bool = False) -> Dict[str, float]:
+        return {s: sum((r.cpu_timings if cpu else r.timings).get(s, 0.0) for r in self.results) for s in STAGES}
+
+    def format(self) -> str:
+        n, n_ok = len(self.results), len(self.results) - len(self.failed)
+        rate = n / self.wall if self.wall > 0 else 0.0
+        totals, cpu = self.stage_totals(), self.stage_totals(cpu=True)
+        lines = [
+            f"[BATCH] {n} file(s): {n_ok} ok, {len(self.failed)} failed in {self.wall:.2f} s, jobs={self.jobs}",
+            f"    throughput: {rate:.2f} docs/s ({rate * 60:.0f} docs/min)",
+            "    stage totals: " + " | ".join(f"{s} {totals[s]:.2f} s" for s in STAGES),
+            "    stage cpu:    " + " | ".join(f"{s} {cpu[s]:.2f} s" for s in STAGES),
+        ]
+        ocr = [p for r in self.results for p in r.ocr]
+        if ocr:
+            by_dpi: Dict[int, int] = {}
+            for p in ocr:
+                by_dpi[p["dpi"]] = by_dpi.get(p["dpi"], 0) + 1
+            confs = [p["conf"] for p in ocr]
+            lines.append(f"    OCR pages: {len(ocr)} | " + " | ".join(f"{d} dpi x{n}" for d, n in sorted(by_dpi.items()))
+                         + f" | conf mean {sum(confs) / len(confs):.1f}, min {min(confs):.1f}")
+        if n_ok:
+            lines.append("    stage mean/doc: " + " | ".join(f"{s} {totals[s] / n_ok * 1000:.0f} ms" for s in STAGES))
+            steps: Dict[str, float] = {}
+            for r in self.results:
+                for k, v in r.steps.items():
+                    steps[k] = steps.get(k, 0.0) + v
+            if steps:
+                lines.append("    QR mean/doc: " + " | ".join(f"{k[3:]} {v / n_ok * 1000:.1f} ms"
+                                                        for k, v in steps.items() if k.startswith("qr.")))
+        lines += [f"    FAILED {r.pdf}: {r.error}" for r in self.failed]
+        return "\n".join(lines)
+
+
+def collect_inputs(specs: Iterable[str]) -> List[Path]:
+    """
+    Gom danh sách PDF từ: thư mục (mọi *.pdf bên trong), glob ("in/*.pdf", "in/**/*.pdf"),
+    @file.txt (mỗi dòng 1 đường dẫn/glob, bỏ dòng trống và dòng '#') hoặc đường dẫn file.
+    Bỏ trùng, giữ thứ tự.
+    """
+    out: List[Path] = []
+    seen = set()
+
+    def add(p: Path) -> None:
+        key = os.path.normcase(str(p.resolve()))
+        if key not in seen:
+            seen.add(key)
+            out.append(p)
+
+    for spec in specs:
+        if spec.startswith("@"):
+            lines = Path(spec[1:]).read_text(encoding="utf-8").splitlines()
+            for p in collect_inputs(ln.strip() for ln in lines if ln.strip() and not ln.lstrip().startswith("#")):
+                add(p)
+        elif any(c in spec for c in "*?["):
+            for m in sorted(glob.glob(spec, recursive=True)):
+                if os.path.isfile(m) and m.lower().endswith(".pdf"):
+                    add(Path(m))
+        elif os.path.isdir(spec):
+            for p in sorted(Path(spec).iterdir()):
+                if p.is_file() and p.suffix.lower() == ".pdf":
+                    add(p)
+        else:
+            add(Path(spec))  # file không tồn tại → job báo lỗi trong tổng kết
+    return out
+
+
+def job_stems(paths: List[Path], used: Optional[Dict[str, int]] = None) -> List[str]:
+    """
+    Tên riêng cho mỗi job (stem file, trùng thì thêm _2, _3…) để các job chạy song song không ghi đè nhau.
+    `used`: bộ đếm giữ qua nhiều lần gọi (hàng đợi GUI thêm file dần trong 1 đợt).
+    """
+    used = {} if used is None else used
+    stems = []
+    for p in paths:
+        stem = p.stem
+        n = used.get(stem.lower(), 0) + 1
+        used[stem.lower()] = n
+        stems.append(stem if n == 1 else f"{stem}_{n}")
+    return stems
+
+
+# Import trước trong process worker giữ lâu (thiếu module tuỳ chọn thì bỏ qua): thư viện nặng
+# đều import lười trong hàm, nên không nạp trước thì file đầu tiên của mỗi worker chịu trọn
+PRELOAD = ("fitz", "pypdfium2", "pdfminer.high_level", "pdfminer.layout", "qrcode",
+           "barcode", "barcode.writer", "PIL.Image", "pytesseract")
+
+
+def preload_libraries() -> None:
+    """Nạp sẵn thư viện nặng cho worker (pool batch / watch / pool ấm của GUI)."""
+    for name in PRELOAD:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    qr_png_bytes("warm")  # nạp nốt plugin PNG của PIL
+
+
+# ---- trạng thái mỗi process worker (cache/template mở 1 lần, dùng cho mọi job) ----
+_opts: Optional[BatchOptions] = None
+_cache: Optional[ExtractionCache] = None
+_templates: Optional[TemplateStore] = None
+
+
+def _init_worker(opts: BatchOptions) -> None:
+    global _opts, _cache, _templates
+    _opts = opts
+    _cache = ExtractionCache(opts.cache_dir) if opts.cache_dir is not None else None
+    if opts.template:
+        _templates = TemplateStore(_cache.root / "templates.json" if _cache is not None else None)
+    if opts.text_engine == "pdfminer":
+        # worker đọc nhiều file: CMap CJK nạp 1 lần ở đây, font ToUnicode dùng chung qua fontcache
+        from fontcache import preload_cmaps
+        preload_cmaps()
+
+
+def _init_pool_worker(opts: BatchOptions) -> None:
+    # Ctrl+C chỉ để process chính xử lý (dừng pool gọn), worker không in traceback
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_worker(opts)
+    preload_libraries()
+
+
+def _run_job(pdf: str, stem: str) -> JobResult:
+    opts = _opts
+    t0 = time.perf_counter()
+    try:
+        artifacts = Artifacts.in_dir(opts.outdir, stem=stem) if opts.outdir is not None else None
+        pool = partial(shared_pool, opts.ocr_workers) if opts.ocr_workers > 0 and opts.use_ocr else None
+        with PdfSession(pdf) as session:
+            result = run_pipeline(session, page_index=opts.page_index, use_ocr=opts.use_ocr, raster=opts.raster,
+                                  pool=pool, cache=_cache, templates=_templates, qr_fraction=opts.qr_fraction,
+                                  max1d=opts.max1d, artifacts=artifacts, log=lambda s: None,
+                                  text_engine=opts.text_engine, ocr_mode=opts.ocr_mode,
+                                  ocr_backfill=opts.ocr_backfill, ocr_dpi=opts.ocr_dpi, qr_stamp=opts.qr_stamp,
+                                  qr_dpi=opts.qr_dpi, qr_png_level=opts.qr_png_level, qr_payload=opts.qr_payload,
+                                  qr_max_version=opts.qr_max_version)
+        out = opts.outpdf / f"{stem}.pdf"
+        if out.resolve() == Path(pdf).resolve():
+            out = opts.outpdf / f"{stem}_qr.pdf"  # không ghi đè file gốc
+        out.write_bytes(result.pdf)
+        return JobResult(pdf, True, time.perf_counter() - t0, out=str(out), payload=result.payload,
+                         timings=result.timings, cpu_timings=result.cpu_timings, ocr=result.ocr,
+                         steps=result.steps)
+    except Exception as e:
+        return JobResult(pdf, False, time.perf_counter() - t0, error=f"{type(e).__name__}: {e}")
+
+
+def run_batch(paths: List[Path], opts: BatchOptions, jobs: int = 0,
+              log: Callable[[str], None] = print) -> BatchSummary:
+    """
+    Chạy pipeline cho từng file trên `jobs` process (0 = số core, 1 = chạy tuần tự trong process này).
+    Lỗi của 1 file không dừng cả batch; mỗi file xong in 1 dòng tiến độ.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(paths) or 1))
+    opts.outpdf.mkdir(parents=True, exist_ok=True)
+    work: List[Tuple[str, str]] = list(zip((str(p) for p in paths), job_stems(paths)))
+    results: List[JobResult] = []
+
+    def report(r: JobResult) -> None:
+        results.append(r)
+        head = f"[{len(results)}/{len(work)}]"
+        if r.ok:
+            log(f"{head} ok   {Path(r.pdf).name} ({r.secs:.2f} s) -> {r.out}")
+        else:
+            log(f"{head} FAIL {Path(r.pdf).name}: {r.error}")
+
+    t0 = time.perf_counter()
+    if jobs == 1:
+        _init_worker(opts)
+        for pdf, stem in work:
+            report(_run_job(pdf, stem))
+    else:
+        # spawn như pool OCR: worker sạch, chạy giống nhau trên Windows/Linux
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx, initializer=_init_pool_worker, initargs=(opts,)) as ex:
+            futures = [ex.submit(_run_job, pdf, stem) for pdf, stem in work]
+            for fut in as_completed(futures):
+                report(fut.result())
+    return BatchSummary(results=results, wall=time.perf_counter() - t0, jobs=jobs)
@@ -0,0 +1,476 @@
+from __future__ import annotations
+from contextlib import nullcontext
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# --- PDF text extractors: pdfminer import khi trích lần đầu (PyMuPDF qua PdfSession.doc) ---
+from pdfsession import PdfSession, PdfSource, pdfminer_input
+from ocr import DEFAULT_LADDER, TESS_CONFIG, DpiLadder, PoolArg, rasterize, resolve_pool, ocr_image_conf
+from fields import QR_FIELDS, fields_complete, parse_fields, stream_until_complete
+from extractcache import ExtractionCache
+from progress import ENGINE, OCR_PAGE, CancelToken, Cancelled, ProgressEvent, ProgressFn, check
+from preflight import DEFAULT_ENGINE, MIN_CHARS, TEXT_ENGINES, plan_page
+
+# Ngăn trang bằng form-feed cho an toàn
+PAGE_SEP = "\n\f\n"
+
+
+# =========================
+# 1) TEXT EXTRACTION (code1)
+# =========================
+
+def iter_pdfminer_pages(pdf_path: PdfSource, page_index: Optional[int] = None, rsrcmgr=None) -> Iterator[str]:
+    """
+    Đọc PDF bằng pdfminer, yield text từng trang (layout trang sau chỉ chạy khi cần).
+    Mỗi trang gom từng dòng (LTTextLine) và sort theo:
+      -y1 (đỉnh dòng) giảm dần => từ trên xuống
+      x0 tăng dần               => từ trái sang phải
+    `rsrcmgr`: SharedResourceManager dùng chung (mặc định: của process, xem fontcache.py).
+    """
+    from pdfminer.converter import PDFPageAggregator
+    from pdfminer.layout import LAParams, LTTextContainer, LTTextLine
+    from pdfminer.pdfinterp import PDFPageInterpreter
+    from pdfminer.pdfpage import PDFPage
+    from fontcache import shared_resource_manager
+
+    laparams = LAParams(char_margin=2.0, line_margin=0.5, word_margin=0.1, boxes_flow=0.5)
+    page_numbers = [page_index] if page_index is not None else None
+    rsrcmgr = rsrcmgr if rsrcmgr is not None else shared_resource_manager()
+    device = PDFPageAggregator(rsrcmgr, laparams=laparams)
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
+
+    src = pdfminer_input(pdf_path)
+    fp = open(src, "rb") if isinstance(src, str) else src
+    try:
+        # PDFResourceManager thường (không có document()): như extract_pages, dùng cho 1 file
+        with rsrcmgr.document() if hasattr(rsrcmgr, "document") else nullcontext():
+            for page in PDFPage.get_pages(fp, page_numbers):
+                interpreter.process_page(page)
+                page_layout = device.get_result()
+                lines = []
+                for element in page_layout:
+                    if isinstance(element, LTTextContainer):
+                        for text_line in element:
+                            if isinstance(text_line, LTTextLine):
+                                x0, y0, x1, y1 = text_line.bbox
+                                s = text_line.get_text().strip()
+                                if s:
+                                    lines.append((-y1, x0, s))
+                lines.sort(key=lambda t: (t[0], t[1]))  # y xuống, x trái→phải
+                yield "\n".join(t[2] for t in lines)
+    finally:
+        fp.close()
+
+
+def extract_pdfminer_topdown_ltr(pdf_path: PdfSource, page_index: Optional[int] = None, rsrcmgr=None) -> str:
+    """
+    Text pdfminer top→down, left→right. Nếu page_index=None: đọc toàn bộ trang.
+    pdf_path có thể là đường dẫn hoặc PdfSession (dùng lại buffer đã đọc).
+    """
+    return PAGE_SEP.join(iter_pdfminer_pages(pdf_path, page_index=page_index, rsrcmgr=rsrcmgr))
+
+
+def extract_pdfminer_many(pdfs: Iterable[PdfSource], page_index: Optional[int] = 0, rsrcmgr=None,
+                          preload: bool = True) -> Iterator[str]:
+    """
+    Nhiều PDF trong 1 process (vd hàng trăm phiếu cùng template): 1 resource manager chung
+    (ToUnicode CMap parse 1 lần theo nội dung) + CMap CJK nạp sẵn trước file đầu tiên.
+    Yield text từng file theo thứ tự `pdfs` (như extract_pdfminer_topdown_ltr).
+    """
+    from fontcache import preload_cmaps, shared_resource_manager
+
+    if preload:
+        preload_cmaps()
+    rsrcmgr = rsrcmgr if rsrcmgr is not None else shared_resource_manager()
+    for pdf in pdfs:
+        yield extract_pdfminer_topdown_ltr(pdf, page_index=page_index, rsrcmgr=rsrcmgr)
+
+
+def iter_pymupdf_pages(pdf_path: PdfSource, page_index: Optional[int] = None) -> Iterator[str]:
+    session = pdf_path if isinstance(pdf_path, PdfSession) else PdfSession(pdf_path)
+    try:
+        doc = session.doc
+        pages = [page_index] if page_index is not None else range(doc.page_count)
+        for pno in pages:
+            yield doc[pno].get_text("text", sort=True)
+    finally:
+        if session is not pdf_path:
+            session.close()
+
+
+def extract_pymupdf_sorted(pdf_path: PdfSource, page_index: Optional[int] = None) -> str:
+    try:
+        return "\n".join(iter_pymupdf_pages(pdf_path, page_index=page_index))
+    except Exception:
+        return ""
+
+
+def _pdfium_chars(page, textpage) -> List[Tuple[str, Tuple[float, float, float, float]]]:
+    # Ký tự thật (bỏ ký tự pdfium tự sinh, khoảng trắng không có bề rộng) theo thứ tự content stream như pdfminer:
+    # pdfium tự sắp lại thứ tự text, nên xếp lại theo vị trí text object chứa ký tự trong trang
+    import ctypes
+    import pypdfium2.raw as pdfium_c
+
+    def addr(obj) -> int:
+        return ctypes.cast(obj, ctypes.c_void_p).value or 0
+
+    order = {addr(pdfium_c.FPDFPage_GetObject(page.raw, k)): k for k in range(pdfium_c.FPDFPage_CountObjects(page.raw))}
+    n = textpage.count_chars()
+    text = textpage.get_text_range(0, n)
+    if len(text) != n:
+        text = "".join(textpage.get_text_range(i, 1) or " " for i in range(n))
+    chars = []
+    for i, ch in enumerate(text):
+        if ch in "\r\n" or pdfium_c.FPDFText_IsGenerated(textpage.raw, i) == 1:
+            continue
+        x0, y0, x1, _ = textpage.get_charbox(i, loose=True)
+        if ch.isspace() and x1 - x0 <= 0:
+            continue
+        box = (x0, y0, x1, y0 + pdfium_c.FPDFText_GetFontSize(textpage.raw, i))  # cao = cỡ chữ như LTChar
+        obj = order.get(addr(pdfium_c.FPDFText_GetTextObject(textpage.raw, i)), len(order))
+        chars.append((obj, i, ch, box))
+    chars.sort(key=lambda t: (t[0], t[1]))
+    return [(ch, box) for _, _, ch, box in chars]
+
+
+def _pdfium_lines(chars: List[Tuple[str, Tuple[float, float, float, float]]]) -> List[Tuple[float, float, str]]:
+    # Gom ký tự liền nhau thành dòng theo đúng quy tắc pdfminer (LAParams ở trên):
+    # chồng dọc > line_overlap (0.5) x chiều cao, cách ngang < char_margin (2.0) x bề rộng;
+    # cách ngang > word_margin (0.1) x cỡ ký tự thì chèn dấu cách
+    lines: List[Tuple[float, float, str]] = []
+    buf: List[str] = []
+    line = None  # bbox dòng đang gom
+    prev = None
+    for ch, box in chars:
+        x0, y0, x1, y1 = box
+        if prev is not None:
+            px0, py0, px1, py1 = prev
+            voverlap = min(y1, py1) - max(y0, py0)
+            hdist = max(0.0, x0 - px1, px0 - x1)
+            if voverlap > 0.5 * min(y1 - y0, py1 - py0) and hdist < 2.0 * max(x1 - x0, px1 - px0):
+                if x0 - px1 > 0.1 * max(x1 - x0, y1 - y0):
+                    buf.append(" ")
+                buf.append(ch)
+                line = (min(line[0], x0), min(line[1], y0), max(line[2], x1), max(line[3], y1))
+                prev = box
+                continue
+            lines.append((-line[3], line[0], "".join(buf).strip()))
+        buf, line, prev = [ch], box, box
+    if buf:
+        lines.append((-line[3], line[0], "".join(buf).strip()))
+    return [t for t in lines if t[2]]
+
+
+def iter_pdfium_pages(pdf_path: PdfSource, page_index: Optional[int] = None) -> Iterator[str]:
+    """
+    Đọc PDF bằng pypdfium2 (nhanh hơn pdfminer nhiều lần), yield text từng trang.
+    Dòng dựng lại từ hộp từng ký tự rồi sort -y1, x0 như iter_pdfminer_pages.
+    """
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(pdfminer_input(pdf_path))
+    try:
+        pages = [page_index] if page_index is not None else range(len(pdf))
+        for pno in pages:
+            page = pdf[pno]
+            textpage = page.get_textpage()
+            try:
+                lines = _pdfium_lines(_pdfium_chars(page, textpage))
+            finally:
+                textpage.close()
+                page.close()
+            lines.sort(key=lambda t: (t[0], t[1]))
+            yield "\n".join(t[2] for t in lines)
+    finally:
+        pdf.close()
+
+
+def extract_pdfium_sorted(pdf_path: PdfSource, page_index: Optional[int] = None) -> str:
+    """Text pypdfium2 top→down, left→right (page_index=None: toàn bộ trang, ngăn bằng PAGE_SEP)."""
+    return PAGE_SEP.join(iter_pdfium_pages(pdf_path, page_index=page_index))
+
+
+def _ocr_page_count(pdf_path: PdfSource, page_index: Optional[int]) -> int:
+    if page_index is not None:
+        return 1
+    if isinstance(pdf_path, PdfSession):
+        return pdf_path.doc.page_count
+    with PdfSession(pdf_path) as session:
+        return session.doc.page_count
+
+
+def _escalate(text: str, conf: float, ladder: DpiLadder) -> str:
+    """Lý do cần render lại DPI cao hơn ('' = trang đạt): conf thấp, hoặc trang phiếu mà thiếu trường."""
+    if conf < ladder.min_conf:
+        return f"conf {conf:.0f} < {ladder.min_conf:g}"
+    fields = parse_fields(text.splitlines())
+    missing = [k for k, _ in QR_FIELDS if not fields.get(k)]
+    if missing and len(missing) < len(QR_FIELDS):  # có trường nhưng chưa đủ: trang phiếu đọc chưa rõ
+        return f"missing {', '.join(missing)}"
+    return ""
+
+
+def _ocr_done(log: Callable[[str], None], page_no: int, tries: List[Tuple[int, float]], dpi: int, conf: float) -> None:
+    tried = f" (tried {', '.join(f'{d}: {c:.0f}' for d, c in tries)})" if len(tries) > 1 else ""
+    log(f"    OCR p{page_no + 1}: {dpi} dpi, conf {conf:.0f}{tried}")
+
+
+def iter_ocr_pages(pdf_path: PdfSource, lang: str = "vie+eng", dpi: Union[int, DpiLadder] = DEFAULT_LADDER,
+                   page_index: Optional[int] = None, raster: str = "fitz", log: Callable[[str], None] = print,
+                   progress: Optional[ProgressFn] = None, cancel: Optional[CancelToken] = None) -> Iterator[str]:
+    """
+    OCR từng trang theo thang DPI: render bậc thấp nhất, trang chưa đạt (_escalate) mới render lại
+    bậc kế tiếp, giữ kết quả conf cao nhất. `dpi` số nguyên = 1 bậc cố định.
+    OCR_PAGE mang DPI + conf đã chốt của trang.
+    """
+    ladder = dpi if isinstance(dpi, DpiLadder) else DpiLadder((dpi,))
+    first = ladder.steps[0]
+    total = _ocr_page_count(pdf_path, page_index) if progress is not None else 0
+    for n, (page_no, img, secs) in enumerate(rasterize(pdf_path, dpi=first, page_index=page_index, backend=raster), 1):
+        check(cancel)  # giữa các trang OCR
+        log(f"    OCR raster p{page_no + 1} ({raster}, {first} dpi): {secs * 1000:.0f} ms")
+        text, conf = ocr_image_conf(img, lang=lang, config=TESS_CONFIG)
+        best = (text, conf, first)
+        tries = [(first, conf)]
+        for step in ladder.steps[1:]:
+            why = _escalate(best[0], best[1], ladder)
+            if not why:
+                break
+            check(cancel)
+            log(f"    OCR p{page_no + 1}: {why} -> {step} dpi")
+            for _, img, secs in rasterize(pdf_path, dpi=step, page_index=page_no, backend=raster):
+                log(f"    OCR raster p{page_no + 1} ({raster}, {step} dpi): {secs * 1000:.0f} ms")
+                text, conf = ocr_image_conf(img, lang=lang, config=TESS_CONFIG)
+            tries.append((step, conf))
+            if conf >= best[1]:
+                best = (text, conf, step)
+        _ocr_done(log, page_no, tries, best[2], best[1])
+        if progress is not None:
+            progress(ProgressEvent(OCR_PAGE, stage="extract", engine="ocr", page=n, pages=total,
+                                   dpi=best[2], conf=best[1]))
+        yield best[0].strip()
+
+
+def extract_ocr(pdf_path: PdfSource, lang: str = "vie+eng", dpi: Union[int, DpiLadder] = DEFAULT_LADDER,
+                page_index: Optional[int] = None, raster: str = "fitz", log: Callable[[str], None] = print,
+                pool: Optional[PoolArg] = None, progress: Optional[ProgressFn] = None,
+                cancel: Optional[CancelToken] = None) -> str:
+    pool = resolve_pool(pool)
+    if pool is None:
+        return "\n".join(iter_ocr_pages(pdf_path, lang=lang, dpi=dpi, page_index=page_index, raster=raster, log=log,
+                                        progress=progress, cancel=cancel))
+
+    # Pool: mỗi bậc DPI 1 lượt OCR song song, lượt sau chỉ gồm các trang chưa đạt
+    ladder = dpi if isinstance(dpi, DpiLadder) else DpiLadder((dpi,))
+    best: Dict[int, Tuple[str, float, int]] = {}
+    tries: Dict[int, List[Tuple[int, float]]] = {}
+    pending: Optional[List[int]] = None  # None: mọi trang (lượt đầu)
+    for step in ladder.steps:
+        pages = [page_index] if pending is None and page_index is not None else pending
+        images, page_nos = [], []
+        for pno in (pages if pages is not None else [None]):
+            for page_no, img, secs in rasterize(pdf_path, dpi=step, page_index=pno, backend=raster):
+                check(cancel)
+                log(f"    OCR raster p{page_no + 1} ({raster}, {step} dpi): {secs * 1000:.0f} ms")
+                images.append(img)  # gom lại, OCR song song trên pool
+                page_nos.append(page_no)
+
+        def on_page(n: int) -> None:
+            if progress is not None and pending is None:
+                progress(ProgressEvent(OCR_PAGE, stage="extract", engine="ocr", page=n, pages=len(images)))
+            check(cancel)
+
+        for page_no, (text, conf) in zip(page_nos, pool.ocr_conf(images, on_page=on_page)):
+            tries.setdefault(page_no, []).append((step, conf))
+            if page_no not in best or conf >= best[page_no][1]:
+                best[page_no] = (text, conf, step)
+        pending = [pno for pno in sorted(best) if _escalate(best[pno][0], best[pno][1], ladder)]
+        if not pending:
+            break
+        if step != ladder.steps[-1]:
+            log(f"    OCR: {len(pending)} page(s) below target -> next dpi")
+
+    for n, pno in enumerate(sorted(best), 1):
+        text, conf, step = best[pno]
+        _ocr_done(log, pno, tries[pno], step, conf)
+        if progress is not None:
+            progress(ProgressEvent(OCR_PAGE, stage="extract", engine="ocr", page=n, pages=len(best),
+                                   dpi=step, conf=conf))
+    return "\n".join(best[pno][0].strip() for pno in sorted(best))
+
+
+def _engine(progress: Optional[ProgressFn], name: str) -> None:
+    if progress is not None:
+        progress(ProgressEvent(ENGINE, stage="extract", engine=name))
+
+
+def extract_page(session: PdfSession, page_index: int, use_ocr: bool = True, raster: str = "fitz",
+                 pool: Optional[PoolArg] = None, log: Callable[[str], None] = print,
+                 progress: Optional[ProgressFn] = None, cancel: Optional[CancelToken] = None,
+                 engine: str = DEFAULT_ENGINE, ocr_dpi: DpiLadder = DEFAULT_LADDER) -> str:
+    """
+    Text 1 trang: pre-flight (preflight.plan_page) chọn engine đầu tiên, ghi quyết định + chi phí vào log.
+    Engine trả < MIN_CHARS ký tự (hoặc lỗi khi còn engine khác) thì thử engine kế trong kế hoạch.
+    Trang có nhãn phiếu mà engine lớp text đọc thiếu trường (fields_complete) thì thử engine text kế
+    (preflight.FALLBACK), giữ bản đọc được nhiều trường nhất; thiếu trường không kéo theo OCR.
+    OCR theo thang `ocr_dpi` (DPI thấp trước, chưa đạt mới lên bậc).
+    """
+    plan = plan_page(session, page_index, use_ocr=use_ocr, engine=engine)
+    log(f"    {plan.describe()}")
+    txt = ""
+    partial: Optional[Tuple[int, str]] = None  # (số trường, text): engine text đủ chữ nhưng thiếu trường
+    for i, name in enumerate(plan.engines):
+        check(cancel)
+        if name == "ocr" and partial is not None:
+            break
+        if name == "ocr" and i > 0:
+            log("    (Fallback to OCR)")
+        _engine(progress, name)
+        try:
+            if name == "pdfminer":
+                txt = extract_pdfminer_topdown_ltr(session, page_index=page_index)
+            elif name == "pdfium":
+                txt = extract_pdfium_sorted(session, page_index=page_index)
+            elif name == "pymupdf":
+                txt = extract_pymupdf_sorted(session, page_index=page_index)
+            else:
+                txt = extract_ocr(session, dpi=ocr_dpi, page_index=page_index, raster=raster, log=log, pool=pool,
+                                  progress=progress, cancel=cancel)
+        except Cancelled:
+            raise
+        except Exception as e:
+            if i == len(plan.engines) - 1 and partial is None:
+                raise
+            log(f"    {name} failed ({type(e).__name__}: {e}), trying next engine")
+            continue
+        if len(txt.strip()) < MIN_CHARS:
+            continue
+        if name == "ocr" or not plan.labels:
+            return txt
+        fields, complete = fields_complete(txt.splitlines())
+        if complete:
+            return txt
+        found = sum(1 for key, _ in QR_FIELDS if fields[key])
+        if partial is None or found > partial[0]:
+            partial = (found, txt)
+        nxt = plan.engines[i + 1] if i + 1 < len(plan.engines) else "ocr"
+        if nxt == "ocr":
+            break
+        log(f"    {name}: {found}/{len(QR_FIELDS)} field(s), trying {nxt}")
+    return partial[1] if partial is not None else txt
+
+
+def _page_progress(progress: Optional[ProgressFn], page_index: int, pages: int) -> Optional[ProgressFn]:
+    # OCR từng trang riêng lẻ: đánh số OCR_PAGE theo trang thật trong file
+    if progress is None:
+        return None
+
+    def emit(ev: ProgressEvent) -> None:
+        progress(replace(ev, page=page_index + 1, pages=pages) if ev.kind == OCR_PAGE else ev)
+    return emit
+
+
+def iter_planned_pages(session: PdfSession, use_ocr: bool = True, raster: str = "fitz",
+                       pool: Optional[PoolArg] = None, log: Callable[[str], None] = print,
+                       progress: Optional[ProgressFn] = None, cancel: Optional[CancelToken] = None,
+                       engine: str = DEFAULT_ENGINE, ocr_dpi: DpiLadder = DEFAULT_LADDER) -> Iterator[str]:
+    """Yield text từng trang, mỗi trang qua pre-flight + engine riêng (trang sau chỉ chạy khi cần)."""
+    pages = session.doc.page_count
+    for pno in range(pages):
+        check(cancel)
+        yield extract_page(session, pno, use_ocr=use_ocr, raster=raster, pool=pool, log=log,
+                           progress=_page_progress(progress, pno, pages), cancel=cancel, engine=engine,
+                           ocr_dpi=ocr_dpi)
+
+
+def extract_until_fields_complete(session: PdfSession, use_ocr: bool = True, raster: str = "fitz",
+                                  log: Callable[[str], None] = print, progress: Optional[ProgressFn] = None,
+                                  cancel: Optional[CancelToken] = None, pool: Optional[PoolArg] = None,
+                                  engine: str = DEFAULT_ENGINE,
+                                  ocr_dpi: DpiLadder = DEFAULT_LADDER) -> Tuple[str, Dict[str, str]]:
+    """
+    Chế độ stream: đọc từng trang vào bộ parse trường, dừng ngay khi đủ
+    MS / hàng / SL / ngày hoàn tất / đơn đặt hàng (thường chỉ cần trang 1).
+    Mỗi trang chọn engine riêng qua pre-flight (trang scan đi thẳng OCR).
+    """
+    text, fields, n_read = stream_until_complete(
+        iter_planned_pages(session, use_ocr=use_ocr, raster=raster, pool=pool, log=log,
+                           progress=progress, cancel=cancel, engine=engine, ocr_dpi=ocr_dpi), sep=PAGE_SEP)
+    log(f"    read {n_read} page(s)")
+    return text, fields
+
+
+def extract_text(session: PdfSession, page_index: Optional[int] = 0, use_ocr: bool = True, raster: str = "fitz",
+                 pool: Optional[PoolArg] = None, cache: Optional[ExtractionCache] = None,
+                 log: Callable[[str], None] = print, progress: Optional[ProgressFn] = None,
+                 cancel: Optional[CancelToken] = None, engine: str = DEFAULT_ENGINE,
+                 ocr_dpi: DpiLadder = DEFAULT_LADDER) -> str:
+    """
+    Bước 1 của pipeline: pre-flight chọn engine cho trang (pdfminer / PyMuPDF / OCR), xem extract_page.
+    page_index=None: đọc lần lượt các trang, dừng khi đủ trường QR.
+    Có `cache`: kết quả được lưu theo SHA-256 nội dung file + tham số, lần sau trả về ngay.
+    `engine`: engine lớp text thử đầu tiên (TEXT_ENGINES: pdfminer / pdfium / pymupdf).
+    `ocr_dpi`: thang DPI cho trang phải OCR (ocr.DpiLadder).
+    `progress` nhận sự kiện ENGINE mỗi lần đổi engine; `cancel` được kiểm tra giữa các engine/trang.
+    """
+    if engine not in TEXT_ENGINES:
+        raise ValueError(f"engine phải là một trong {TEXT_ENGINES}: {engine!r}")
+    key = None
+    if cache is not None:
+        key = cache.key(session.data, stage="text", page=page_index, ocr=use_ocr, raster=raster,
+                        select="preflight", engine=engine, dpi=list(ocr_dpi.steps), conf=ocr_dpi.min_conf)
+        hit = cache.get(key)
+        if hit is not None:
+            log("    (cache hit)")
+            _engine(progress, "cache")
+            return hit["text"]
+
+    if page_index is None:
+        txt, _ = extract_until_fields_complete(session, use_ocr=use_ocr, raster=raster, log=log,
+                                               progress=progress, cancel=cancel, pool=pool, engine=engine,
+                                               ocr_dpi=ocr_dpi)
+    else:
+        txt = extract_page(session, page_index, use_ocr=use_ocr, raster=raster, pool=pool, log=log,
+                           progress=progress, cancel=cancel, engine=engine, ocr_dpi=ocr_dpi)
+
+    if cache is not None and txt.strip():
+        cache.put(key, {"text": txt})
+    return txt
+
+
+def pdf_to_txt(pdf_path: PdfSource, out_txt: Optional[str] = None, page_index: Optional[int] = None,
+               stop_when_complete: bool = False, cache: Optional[ExtractionCache] = None,
+               engine: str = DEFAULT_ENGINE) -> str:
+    """
+    - page_index=None  => xuất toàn bộ file
+    - page_index=0     => chỉ trang 1
+    - stop_when_complete=True (khi page_index=None): dừng ở trang đã đủ trường QR
+    - engine: engine lớp text (TEXT_ENGINES)
+    """
+    session = pdf_path if isinstance(pdf_path, PdfSession) else PdfSession(pdf_path)
+    try:
+        if page_index is None and not stop_when_complete:
+            txt = _extract_all_pages(session, cache, engine=engine)
+        else:
+            txt = extract_text(session, page_index=page_index, cache=cache, log=lambda s: None, engine=engine)
+    finally:
+        if session is not pdf_path:
+            session.close()
+
+    if out_txt:
+        Path(out_txt).parent.mkdir(parents=True, exist_ok=True)
+        Path(out_txt).write_text(txt, encoding="utf-8")
+    return txt
+
+
+def _extract_all_pages(session: PdfSession, cache: Optional[ExtractionCache] = None, engine: str = DEFAULT_ENGINE) -> str:
+    # Xuất toàn bộ trang (không dừng sớm) — giữ hành vi cũ của pdf_to_txt(page_index=None)
+    key = cache.key(session.data, stage="text-all", select="preflight", engine=engine) if cache is not None else None
+    hit = cache.get(key) if cache is not None else None
+    if hit is not None:
+        return hit["text"]
+    txt = PAGE_SEP.join(iter_planned_pages(session, log=lambda s: None, engine=engine))
+    if cache is not None and txt.strip():
+        cache.put(key, {"text": txt})
+    return txt
@@ -0,0 +1,120 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+import hashlib
+import json
+import os
+import re
+import time
+
+# Tăng khi đổi cách trích/parse để bỏ qua cache cũ
+CACHE_VERSION = 1
+# Tên file entry = SHA-256 hex; file khác trong thư mục (templates.json của TemplateStore…) không bị dọn
+_ENTRY_NAME = re.compile(r"[0-9a-f]{64}\.json")
+
+
+def _engine_versions() -> Dict[str, str]:
+    import fitz
+    import pdfminer
+    versions = {"pymupdf": str(getattr(fitz, "VersionBind", "")), "pdfminer": str(getattr(pdfminer, "__version__", ""))}
+    try:  # pypdfium2 tuỳ chọn (engine "pdfium"); bản 4+ có pypdfium2.version, bản cũ V_PYPDFIUM2 / V_PDFIUM
+        import pypdfium2
+    except ImportError:
+        return versions
+    info = getattr(pypdfium2, "version", None)
+    if info is not None and hasattr(info, "PYPDFIUM_INFO"):
+        versions["pypdfium2"] = f"{info.PYPDFIUM_INFO}/{info.PDFIUM_INFO}"
+    else:
+        versions["pypdfium2"] = f"{getattr(pypdfium2, 'V_PYPDFIUM2', '')}/{getattr(pypdfium2, 'V_PDFIUM', '')}"
+    return versions
+
+
+class ExtractionCache:
+    """
+    Cache trên đĩa cho text trích xuất và dict trường QR.
+    Key = SHA-256(bytes đầu vào) + engine/version/tham số → 1 file JSON mỗi key.
+    Dọn cache theo tuổi (max_age_days) và tổng dung lượng (max_mb, xoá cái ít dùng nhất trước).
+    """
+
+    def __init__(self, root: Union[str, Path], max_mb: float = 200.0, max_age_days: float = 30.0):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._versions: Optional[Dict[str, str]] = None  # lấy khi tạo key đầu tiên (import fitz/pdfminer/pypdfium2)
+
+    def key(self, data: Union[bytes, memoryview, str], **params: Any) -> str:
+        """Key cho nội dung `data` (bytes PDF hoặc text) cùng các tham số ảnh hưởng kết quả."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        h = hashlib.sha256(data)
+        if self._versions is None:
+            self._versions = _engine_versions()
+        meta = {"v": CACHE_VERSION, **self._versions, **params}
+        h.update(json.dumps(meta, sort_keys=True, default=str).encode("utf-8"))
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        p = self._path(key)
+        try:
+            st = p.stat()
+            if time.time() - st.st_mtime > self.max_age:
+                p.unlink(missing_ok=True)
+                raise FileNotFoundError(p)
+            value = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(p)  # đánh dấu vừa dùng (LRU)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        p = self._path(key)
+        tmp = p.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(value, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, p)  # ghi nguyên tử, an toàn khi nhiều process cùng chạy
+        self.evict()
+
+    def evict(self) -> int:
+        """Xoá entry quá hạn, rồi entry ít dùng nhất cho tới khi tổng dung lượng <= max. Trả về số file đã xoá."""
+        now = time.time()
+        entries = []
+        removed = 0
+        for p in self.root.glob("*.json"):
+            if not _ENTRY_NAME.fullmatch(p.name):
+                continue
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if now - st.st_mtime > self.max_age:
+                p.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self) -> str:
+        return f"cache: {self.hits} hit / {self.misses} miss"
+
+
+def default_cache_dir() -> Path:
+    """QRPDF_CACHE_DIR nếu có, không thì thư mục cache của user."""
+    env = os.environ.get("QRPDF_CACHE_DIR")
+    if env:
+        return Path(env)
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "qrpdf"
@@ -0,0 +1,332 @@
+from __future__ import annotations
+from pathlib import Path
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+import re
+import unicodedata
+
+if TYPE_CHECKING:
+    from extractcache import ExtractionCache
+
+
+# ======================
+# 2) FIELD EXTRACTION (code2)
+# ======================
+
+# Các trường cần cho payload QR (key → nhãn trong payload)
+QR_FIELDS = (
+    ("ms", "MS"),
+    ("desc", "con hang"),
+    ("sl", "sl"),
+    ("ngay", "Ngay Hoan tat"),
+    ("ddh", "Don dat hang"),
+)
+
+STOP_LABELS = [
+    "Số lượng sản xuất:", "Số lượng:", "Ngày phát thực tế:", "Mã đơn đặt hàng:",
+    "Đơn đặt hàng", "Ghi chú:", "Hạng mục", "Ngày bắt đầu theo dự tính:",
+    "Ngày Hoàn tất:", "Ngày có hiệu lực BOM:", "NVL sản xuất:"
+]
+
+
+def read_lines(path: Path) -> List[str]:
+    text = path.read_text(encoding="utf-8", errors="replace")
+    return [ln.rstrip("\r\n") for ln in text.splitlines()]
+
+
+def next_non_empty(lines: List[str], start_idx: int) -> Optional[str]:
+    for i in range(start_idx + 1, len(lines)):
+        s = lines[i].strip()
+        if s:
+            return s
+    return None
+
+
+def find_value_after_label(lines: List[str], label: str) -> Optional[str]:
+    for i, line in enumerate(lines):
+        if line.strip() == label.strip():
+            return next_non_empty(lines, i)
+    return None
+
+
+def find_nps_line(lines: List[str]) -> Optional[str]:
+    for line in lines:
+        if "NPS" in line:
+            m = re.search(r"(NPS.*)", line)
+            if not m:
+                continue
+            chunk = m.group(1).strip()
+            close_idx = chunk.rfind(")")
+            if close_idx != -1:
+                return chunk[: close_idx + 1]
+            return chunk
+    return None
+
+
+def strip_accents(s: str) -> str:
+    """Bỏ dấu, giữ ASCII"""
+    if not s:
+        return ""
+    s_norm = unicodedata.normalize("NFKD", s)
+    return s_norm.encode("ascii", "ignore").decode("ascii")
+
+
+# ---- tiện ích so sánh/so khớp không dấu ----
+def _norm_cmp(s: str) -> str:
+    return _norm(s).lower()
+
+
+# ---- chuẩn hoá: bỏ dấu, nén khoảng trắng ----
+def _norm(s: Optional[str]) -> str:
+    s = s or ""
+    if not s.isascii():  # dòng ASCII thuần: NFKD không đổi gì, bỏ qua cho nhanh
+        s = strip_accents(s)
+    return " ".join(s.split())
+
+
+# ---- bảng nhãn biên dịch sẵn (chuẩn hoá 1 lần lúc import) ----
+# Nhãn có giá trị ở dòng kế tiếp (so khớp nguyên dòng, giữ dấu như find_value_after_label)
+VALUE_LABELS = {
+    "MS đơn công lệnh:": "ms",
+    "Số lượng sản xuất:": "sl",
+    "Ngày Hoàn tất:": "ngay",
+}
+NVL_LABEL = "NVL sản xuất:"
+
+# 1 regex cho mọi nhãn dừng (so trên dòng đã chuẩn hoá, dạng "bắt đầu bằng")
+_STOP_RE = re.compile("|".join(re.escape(_norm_cmp(lbl)) for lbl in sorted(STOP_LABELS, key=len, reverse=True)))
+_NVL_NORM = _norm_cmp(NVL_LABEL)
+_NPS_RE = re.compile(r"\bNPS\s*\d", re.IGNORECASE)
+_M_CODE_RE = re.compile(r"\bM\b")
+
+# Quét cả text 1 lượt tìm ứng viên: nhãn giá trị | "SV" | "NPS" (chuỗi literal → regex tìm rất nhanh),
+# vị trí đầu dòng/nguyên dòng được kiểm lại trên dòng tương ứng
+_CANDIDATE_RE = re.compile("|".join(re.escape(lbl) for lbl in VALUE_LABELS) + "|SV|NPS")
+# Ứng viên NVL, tìm trên text đã bỏ dấu + lower (mọi dòng khớp _NVL_NORM đều chứa chuỗi này)
+_NVL_CANDIDATE_RE = re.compile(r"nvl\s+san\s+xuat:")
+
+
+def _is_stop(norm_line: str) -> bool:
+    return _STOP_RE.match(norm_line) is not None
+
+
+# ---- lấy FNW đầu tiên + NPS đầu tiên sau NVL ----
+def _fnw_nps_block_after_nvl(lines: List[str]) -> Tuple[Optional[str], bool]:
+    """Trả về (mô tả, closed). closed=False nghĩa là khối chạm cuối `lines` (có thể còn tiếp ở trang sau)."""
+    idx = None
+    for i, l in enumerate(lines):
+        if _norm_cmp(l).startswith(_NVL_NORM):
+            idx = i
+            break
+    if idx is None:
+        return None, False
+    return _block_from(lines, idx)
+
+
+def _block_from(lines: List[str], idx: int) -> Tuple[Optional[str], bool]:
+    j = idx + 1
+    # bỏ qua dòng mã “…  M” nếu có
+    if j < len(lines) and _M_CODE_RE.search(lines[j]):
+        j += 1
+    return pick_fnw_nps(islice(lines, j, None))
+
+
+def pick_fnw_nps(lines: Iterable[str]) -> Tuple[Optional[str], bool]:
+    """Ghép dòng FNW đầu tiên + dòng NPS đầu tiên (dừng ở nhãn kế tiếp), cắt tới ')' cuối."""
+    got_fnw = False
+    got_nps = False
+    closed = False
+    pieces = []
+
+    for raw in lines:
+        s = raw.strip()
+        if not s or _is_stop(_norm_cmp(s)):
+            closed = True
+            break
+
+        # chỉ lấy FNW đầu tiên
+        if (not got_fnw) and ("FNW" in s):
+            pieces.append(s)
+            got_fnw = True
+        # chỉ lấy NPS đầu tiên
+        elif (not got_nps) and _NPS_RE.search(s):
+            pieces.append(s)
+            got_nps = True
+
+        # nếu đã có đủ FNW + NPS thì dừng (tránh dính các dòng song ngữ lặp lại)
+        if got_fnw and got_nps:
+            closed = True
+            break
+
+    if not pieces:
+        return None, closed
+
+    merged = " ".join(pieces)
+
+    # --- cắt đến dấu ngoặc ')' cuối cùng (bao gồm dấu ')') ---
+    last_paren = merged.rfind(")")
+    if last_paren != -1:
+        merged = merged[: last_paren + 1]
+
+    return merged, closed
+
+
+def _match_lines(text: str, pattern: "re.Pattern[str]", accept) -> Iterator[Tuple[int, "re.Match[str]"]]:
+    """Yield (chỉ số dòng, match) cho từng match của `pattern` trong `text` (đếm '\n' bằng C, không duyệt từng dòng)."""
+    pos, line_no = 0, 0
+    for m in pattern.finditer(text):
+        line_no += text.count("\n", pos, m.start())
+        pos = m.start()
+        if accept(line_no, m):
+            yield line_no, m
+
+
+def _parse(lines: List[str]) -> Tuple[Dict[str, str], bool]:
+    """
+    Parse 1 lượt: nối các dòng rồi cho 1 regex gộp (nhãn giá trị / "SV" / "NPS") chạy qua,
+    NVL tìm bằng 1 regex trên text đã bỏ dấu (NFKD 1 lần cho cả text, không phải từng dòng).
+    Chỉ dòng ứng viên mới được kiểm lại đúng như cách cũ → kết quả giống hệt _parse_rescan.
+    """
+    text = "\n".join(lines)
+    if text.count("\n") != max(len(lines) - 1, 0):
+        return _parse_rescan(lines)  # có dòng chứa '\n' → không map được vị trí dòng
+
+    first: Dict[str, int] = {}  # ms / sl / ngay / sv / nps → dòng đầu tiên
+    want = len(VALUE_LABELS) + 2
+
+    def accept(i: int, m: "re.Match[str]") -> bool:
+        g = m.group()
+        if g == "NPS":
+            key = "nps"
+        elif g == "SV":
+            key = "sv" if lines[i].strip().startswith("SV") else None
+        else:
+            key = VALUE_LABELS.get(lines[i].strip())
+        if key is None or key in first:
+            return False
+        first[key] = i
+        return True
+
+    for _ in _match_lines(text, _CANDIDATE_RE, accept):
+        if len(first) == want:
+            break
+
+    plain = (text if text.isascii() else strip_accents(text)).lower()
+    nvl = next(_match_lines(plain, _NVL_CANDIDATE_RE,
+                            lambda i, m: _norm_cmp(lines[i]).startswith(_NVL_NORM)), None)
+    block, closed = _block_from(lines, nvl[0]) if nvl else (None, False)
+
+    nps_fallback = find_nps_line([lines[first["nps"]]]) if "nps" in first else None
+    raw_desc = block or nps_fallback
+
+    def value(key: str) -> Optional[str]:
+        return next_non_empty(lines, first[key]) if key in first else None
+
+    fields = {
+        "ms":   _norm(value("ms")),
+        "desc": _norm(raw_desc),          # FNW + NPS (đã cắt tới ')')
+        "sl":   _norm(value("sl")),
+        "ngay": _norm(value("ngay")),
+        "ddh":  _norm(lines[first["sv"]].strip() if "sv" in first else None),
+    }
+    return fields, closed
+
+
+def _parse_rescan(lines: List[str]) -> Tuple[Dict[str, str], bool]:
+    """Cách cũ: quét lại `lines` cho từng nhãn. Giữ để đối chiếu/benchmark với _parse."""
+    ms_don        = find_value_after_label(lines, "MS đơn công lệnh:")
+    so_luong      = find_value_after_label(lines, "Số lượng sản xuất:")
+    ngay_hoan_tat = find_value_after_label(lines, "Ngày Hoàn tất:")
+    nps_fallback  = find_nps_line(lines)  # dự phòng
+
+    block, closed = _fnw_nps_block_after_nvl(lines)
+    raw_desc = block or nps_fallback
+
+    # ---- mã đơn đặt hàng (SV...) nếu có ----
+    ddh_line = next((l for l in lines if l.strip().startswith("SV")), None)
+
+    fields = {
+        "ms":   _norm(ms_don),
+        "desc": _norm(raw_desc),          # FNW + NPS (đã cắt tới ')')
+        "sl":   _norm(so_luong),
+        "ngay": _norm(ngay_hoan_tat),
+        "ddh":  _norm(ddh_line),
+    }
+    return fields, closed
+
+
+def parse_fields(lines: List[str]) -> Dict[str, str]:
+    """Tách các trường QR từ các dòng text (giá trị đã bỏ dấu, '' nếu không thấy)."""
+    return _parse(lines)[0]
+
+
+def build_qr_payload(fields: Dict[str, str]) -> str:
+    return ";".join(f"{label}:{fields[key]}" for key, label in QR_FIELDS if fields.get(key))
+
+
+def fields_complete(lines: List[str]) -> Tuple[Dict[str, str], bool]:
+    """
+    (fields, complete): complete=True khi đủ mọi trường QR và khối NVL đã khép lại,
+    tức đọc thêm trang cũng không đổi kết quả.
+    """
+    fields, closed = _parse(lines)
+    return fields, closed and all(fields[key] for key, _ in QR_FIELDS)
+
+
+def stream_until_complete(pages: Iterable[str], sep: str = "\n") -> Tuple[str, Dict[str, str], int]:
+    """
+    Nhận text từng trang (generator), parse dần và dừng ngay khi đủ trường.
+    Trả về (text các trang đã đọc, fields, số trang đã đọc). Generator được đóng sớm.
+    """
+    texts: List[str] = []
+    fields: Dict[str, str] = {}
+    it = iter(pages)
+    try:
+        for page_text in it:
+            texts.append(page_text)
+            fields, done = fields_complete(sep.join(texts).splitlines())
+            if done:
+                break
+    finally:
+        close = getattr(it, "close", None)
+        if close is not None:
+            close()
+    return sep.join(texts), fields, len(texts)
+
+
+def write_qr_payload(fields: Dict[str, str], output_qr_txt: Path, payload: Optional[str] = None) -> str:
+    """Ghi payload QR (mặc định dựng từ `fields`; `payload` = đã dựng sẵn, vd dạng gọn) ra file."""
+    if payload is None:
+        payload = build_qr_payload(fields)
+    output_qr_txt.parent.mkdir(parents=True, exist_ok=True)
+    output_qr_txt.write_text(payload + "\n", encoding="utf-8")
+    return payload
+
+
+def fields_from_text(text: str, cache: Optional["ExtractionCache"] = None) -> Dict[str, str]:
+    """Parse trường từ text trong bộ nhớ; có `cache` thì key theo nội dung text."""
+    if cache is None:
+        return parse_fields(text.splitlines())
+    # key theo nội dung text: cùng text → cùng dict trường, khỏi parse lại
+    key = cache.key(text, stage="fields")
+    hit = cache.get(key)
+    if hit is not None:
+        return hit["fields"]
+    fields = parse_fields(text.splitlines())
+    cache.put(key, {"fields": fields})
+    return fields
+
+
+def extract_fields_to_qr_text(input_txt: Path, output_qr_txt: Path, cache: Optional["ExtractionCache"] = None,
+                              compact: bool = False) -> None:
+    """`compact`: ghi payload gọn (qrpayload) thay vì nhãn đầy đủ."""
+    if not input_txt.exists():
+        raise FileNotFoundError(f"Không thấy file: {input_txt}")
+
+    text = input_txt.read_text(encoding="utf-8", errors="replace")
+    fields = fields_from_text(text, cache=cache)
+    payload = None
+    if compact:
+        from qrpayload import build_compact_payload  # import trong hàm: qrpayload import ngược fields
+        payload = build_compact_payload(fields)
+    write_qr_payload(fields, output_qr_txt, payload=payload)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+import hashlib
+import io
+import threading
+import time
+
+from pdfminer.cmapdb import CMapDB, CMapParser, FileUnicodeMap
+from pdfminer.pdffont import PDFFont
+from pdfminer.pdfinterp import PDFResourceManager
+from pdfminer.pdftypes import PDFStream, resolve1
+
+# ======================
+# pdfminer: resource manager dùng chung cho nhiều tài liệu trong 1 process
+#   - ToUnicode CMap nhúng trong font được parse 1 lần theo nội dung (phiếu cùng template
+#     thường có ToUnicode giống hệt nhau dù font subset mang tên khác),
+#   - CMap CJK có sẵn của pdfminer (UniGB/UniCNS, Adobe-GB1/CNS1) nạp trước 1 lần.
+# Font vẫn cache theo objid nhưng chỉ trong 1 tài liệu: objid trùng nhau giữa các file
+# (vd font 9/10 của mọi phiếu asfr102) lại là font subset khác nhau.
+# ======================
+
+# CMap có sẵn cho chữ Hán giản thể / phồn thể trong phiếu (font không nhúng ToUnicode)
+PRELOAD_CMAPS = ("UniGB-UCS2-H", "UniGB-UTF16-H", "UniCNS-UCS2-H", "UniCNS-UTF16-H", "GBK-EUC-H")
+PRELOAD_UNICODE_MAPS = ("Adobe-GB1", "Adobe-CNS1")
+
+MAX_UNICODE_MAPS = 256  # số ToUnicode CMap giữ lại (LRU)
+
+_EMPTY_TOUNICODE = PDFStream({}, b"")
+_preloaded = False
+_preload_lock = threading.Lock()
+
+
+def preload_cmaps(cmaps: Tuple[str, ...] = PRELOAD_CMAPS,
+                  unicode_maps: Tuple[str, ...] = PRELOAD_UNICODE_MAPS) -> float:
+    """Nạp CMap có sẵn vào cache class của CMapDB (1 lần / process). Trả về số giây đã tốn."""
+    global _preloaded
+    with _preload_lock:
+        if _preloaded:
+            return 0.0
+        t0 = time.perf_counter()
+        for name in cmaps:
+            try:
+                CMapDB.get_cmap(name)
+            except CMapDB.CMapNotFound:
+                pass
+        for name in unicode_maps:
+            try:
+                CMapDB.get_unicode_map(name)
+            except CMapDB.CMapNotFound:
+                pass
+        _preloaded = True
+        return time.perf_counter() - t0
+
+
+class SharedResourceManager(PDFResourceManager):
+    """
+    PDFResourceManager dùng lại được cho nhiều tài liệu (và nhiều thread):
+    ToUnicode CMap cache theo SHA-1 nội dung, font cache theo objid trong phạm vi document().
+    """
+
+    def __init__(self, max_unicode_maps: int = MAX_UNICODE_MAPS):
+        super().__init__(caching=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._umaps: "OrderedDict[str, FileUnicodeMap]" = OrderedDict()
+        self._max_umaps = max_unicode_maps
+        self.hits = 0
+        self.misses = 0
+
+    @contextmanager
+    def document(self) -> Iterator[None]:
+        """Phạm vi 1 tài liệu: font theo objid chỉ dùng lại bên trong (riêng mỗi thread)."""
+        prev = getattr(self._local, "fonts", None)
+        self._local.fonts = {}
+        try:
+            yield
+        finally:
+            self._local.fonts = prev
+
+    def _unicode_map(self, data: bytes) -> FileUnicodeMap:
+        key = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            umap = self._umaps.get(key)
+            if umap is not None:
+                self._umaps.move_to_end(key)
+                self.hits += 1
+                return umap
+            self.misses += 1
+        umap = FileUnicodeMap()
+        CMapParser(umap, io.BytesIO(data)).run()
+        with self._lock:
+            self._umaps[key] = umap
+            while len(self._umaps) > self._max_umaps:
+                self._umaps.popitem(last=False)
+        return umap
+
+    def get_font(self, objid: object, spec: Dict[str, object]) -> PDFFont:
+        fonts: Optional[dict] = getattr(self._local, "fonts", None)
+        if fonts is None:
+            fonts = {}  # gọi ngoài document(): không cache theo objid
+        if objid and objid in fonts:
+            return fonts[objid]
+
+        tounicode = resolve1(spec.get("ToUnicode")) if "ToUnicode" in spec else None
+        if isinstance(tounicode, PDFStream) and tounicode is not _EMPTY_TOUNICODE:
+            # Dựng font với ToUnicode rỗng (không parse) rồi gắn CMap đã cache theo nội dung
+            umap = self._unicode_map(tounicode.get_data())
+            font = super().get_font(None, {**spec, "ToUnicode": _EMPTY_TOUNICODE})
+            font.unicode_map = umap
+        else:
+            font = super().get_font(None, spec)
+        if objid:
+            fonts[objid] = font
+        return font
+
+    def stats(self) -> str:
+        return f"ToUnicode CMap: {self.hits} hit / {self.misses} parse"
+
+
+_shared: Optional[SharedResourceManager] = None
+
+
+def shared_resource_manager() -> SharedResourceManager:
+    """Resource manager chung của process (như ocr.shared_pool)."""
+    global _shared
+    if _shared is None:
+        _shared = SharedResourceManager()
+    return _shared
@@ -1,272 +1,35 @@
 from __future__ import annotations
+from functools import partial
 from pathlib import Path
-from typing import Optional, List
 import argparse
-import re
-import unicodedata
+import os
 import sys
 
-# --- PDF text extractors ---
-import fitz  # PyMuPDF
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LAParams, LTTextContainer, LTTextLine
-from pdf2image import convert_from_path
-import pytesseract
-
-# --- QR & 1D barcode ---
-import qrcode
-from qrcode.constants import ERROR_CORRECT_Q
-import qrcode.image.svg as qrcode_svg
-from barcode import Code128
-from barcode.writer import ImageWriter
-
-# --- Images ---
-from PIL import Image
-
-
-# =========================
-# 1) TEXT EXTRACTION (code1)
-# =========================
-
-def extract_pdfminer_topdown_ltr(pdf_path: str, page_index: Optional[int] = None) -> str:
-    """
-    Đọc PDF bằng pdfminer, gom từng dòng (LTTextLine) và sort theo:
-      -y1 (đỉnh dòng) giảm dần => từ trên xuống
-      x0 tăng dần               => từ trái sang phải
-    Nếu page_index=None: đọc toàn bộ trang.
-    """
-    laparams = LAParams(char_margin=2.0, line_margin=0.5, word_margin=0.1, boxes_flow=0.5)
-
-    page_numbers = [page_index] if page_index is not None else None
-    pages_text: List[str] = []
-
-    for page_layout in extract_pages(pdf_path, page_numbers=page_numbers, laparams=laparams):
-        lines = []
-        for element in page_layout:
-            if isinstance(element, LTTextContainer):
-                for text_line in element:
-                    if isinstance(text_line, LTTextLine):
-                        x0, y0, x1, y1 = text_line.bbox
-                        s = text_line.get_text().strip()
-                        if s:
-                            lines.append((-y1, x0, s))
-        lines.sort(key=lambda t: (t[0], t[1]))  # y xuống, x trái→phải
-        page_text = "\n".join(t[2] for t in lines)
-        pages_text.append(page_text)
-
-    # Ngăn trang bằng form-feed cho an toàn, bạn có thể đổi thành "\n\n"
-    return "\n\f\n".join(pages_text)
-
-
-def extract_pymupdf_sorted(pdf_path: str, page_index: Optional[int] = None) -> str:
-    try:
-        txt_parts: List[str] = []
-        with fitz.open(pdf_path) as doc:
-            if doc.is_encrypted:
-                try:
-                    doc.authenticate("")
-                except Exception:
-                    return ""
-            if page_index is None:
-                for page in doc:
-                    txt_parts.append(page.get_text("text", sort=True))
-            else:
-                page = doc[page_index]
-                txt_parts.append(page.get_text("text", sort=True))
-        return "\n".join(txt_parts)
-    except Exception:
-        return ""
-
+# fitz/pdfminer/pytesseract/qrcode/barcode chỉ import khi bước tương ứng chạy
+# (xem pipeline/extract/ocr) → --help, --batch/--watch khởi động nhanh
 
-def extract_ocr(pdf_path: str, lang: str = "vie+eng", dpi: int = 300, page_index: Optional[int] = None) -> str:
-    kwargs = {"dpi": dpi}
-    if page_index is not None:
-        # pdf2image dùng chỉ số trang bắt đầu từ 1
-        kwargs.update({"first_page": page_index + 1, "last_page": page_index + 1})
-    images = convert_from_path(pdf_path, **kwargs)
-    texts = []
-    for img in images:
-        t = pytesseract.image_to_string(img, lang=lang, config="--oem 1 --psm 6")
-        texts.append(t.strip())
-    return "\n".join(texts)
+# --- Mở PDF 1 lần dùng chung ---
+from pdfsession import PdfSession, PdfSource
 
+# --- OCR (raster PyMuPDF trong process, pdf2image tuỳ chọn) ---
+from ocr import RASTER_BACKENDS, DpiLadder, shared_pool
 
-def pdf_to_txt(pdf_path: str, out_txt: Optional[str] = None, page_index: Optional[int] = None) -> str:
-    pdf = Path(pdf_path)
-    if not pdf.exists():
-        raise FileNotFoundError(pdf)
+# --- 1) TEXT EXTRACTION (code1) & 2) FIELD EXTRACTION (code2) ---
+from extract import DEFAULT_ENGINE, TEXT_ENGINES
+from template import TemplateStore
+from roiocr import OCR_MODES
+from qrrender import PNG_LEVEL, encode_qr, render_png, render_svg
 
-    # 1) Thử pdfminer (top→down, left→right)
-    txt = extract_pdfminer_topdown_ltr(str(pdf), page_index=page_index)
+# --- 3) QR/Code128 + 4) chèn QR: các bước trong bộ nhớ ---
+from pipeline import Artifacts, QR_PAYLOADS, QR_STAMPS, run_pipeline, code128_pngs, stamp_qr
 
-    # 2) Nếu kết quả quá ít, thử PyMuPDF (đã sort)
-    if len(txt.strip()) < 10:
-        txt = extract_pymupdf_sorted(str(pdf), page_index=page_index)
+# --- Batch nhiều file / thư mục theo dõi, trên pool process ---
+from batch import BatchOptions, collect_inputs, run_batch
+from watch import FolderWatcher
 
-    # 3) Nếu vẫn rỗng, chạy OCR (cho PDF scan)
-    if len(txt.strip()) < 10:
-        txt = extract_ocr(str(pdf), page_index=page_index)
+# --- Cache kết quả trích/parse theo nội dung file ---
+from extractcache import ExtractionCache, default_cache_dir
 
-    if out_txt:
-        Path(out_txt).parent.mkdir(parents=True, exist_ok=True)
-        Path(out_txt).write_text(txt, encoding="utf-8")
-    return txt
-
-
-# ======================
-# 2) FIELD EXTRACTION (code2)
-# ======================
-
-def read_lines(path: Path) -> List[str]:
-    text = path.read_text(encoding="utf-8", errors="replace")
-    return [ln.rstrip("\r\n") for ln in text.splitlines()]
-
-
-def next_non_empty(lines: List[str], start_idx: int) -> Optional[str]:
-    for i in range(start_idx + 1, len(lines)):
-        s = lines[i].strip()
-        if s:
-            return s
-    return None
-
-
-def find_value_after_label(lines: List[str], label: str) -> Optional[str]:
-    for i, line in enumerate(lines):
-        if line.strip() == label.strip():
-            return next_non_empty(lines, i)
-    return None
-
-
-def find_nps_line(lines: List[str]) -> Optional[str]:
-    for line in lines:
-        if "NPS" in line:
-            m = re.search(r"(NPS.*)", line)
-            if not m:
-                continue
-            chunk = m.group(1).strip()
-            close_idx = chunk.rfind(")")
-            if close_idx != -1:
-                return chunk[: close_idx + 1]
-            return chunk
-    return None
-
-
-def strip_accents(s: str) -> str:
-    """Bỏ dấu, giữ ASCII"""
-    if not s:
-        return ""
-    s_norm = unicodedata.normalize("NFKD", s)
-    return s_norm.encode("ascii", "ignore").decode("ascii")
-
-
-def extract_fields_to_qr_text(input_txt: Path, output_qr_txt: Path) -> None:
-    if not input_txt.exists():
-        raise FileNotFoundError(f"Không thấy file: {input_txt}")
-
-    lines = read_lines(input_txt)
-
-    ms_don        = find_value_after_label(lines, "MS đơn công lệnh:")
-    so_luong      = find_value_after_label(lines, "Số lượng sản xuất:")
-    ngay_hoan_tat = find_value_after_label(lines, "Ngày Hoàn tất:")
-    nps_fallback  = find_nps_line(lines)  # dự phòng
-
-    # ---- tiện ích so sánh/so khớp không dấu ----
-    def _norm_cmp(s: str) -> str:
-        s = strip_accents(s or "")
-        s = re.sub(r"\s+", " ", s).strip().lower()
-        return s
-
-    STOP_LABELS = [
-        "Số lượng sản xuất:", "Số lượng:", "Ngày phát thực tế:", "Mã đơn đặt hàng:",
-        "Đơn đặt hàng", "Ghi chú:", "Hạng mục", "Ngày bắt đầu theo dự tính:",
-        "Ngày Hoàn tất:", "Ngày có hiệu lực BOM:", "NVL sản xuất:"
-    ]
-
-    # ---- lấy FNW đầu tiên + NPS đầu tiên sau NVL ----
-    def find_fnw_nps_block_after_nvl(lines):
-        idx = None
-        for i, l in enumerate(lines):
-            if _norm_cmp(l).startswith(_norm_cmp("NVL sản xuất:")):
-                idx = i
-                break
-        if idx is None:
-            return None
-
-        j = idx + 1
-        # bỏ qua dòng mã “…  M” nếu có
-        if j < len(lines) and re.search(r"\bM\b", lines[j]):
-            j += 1
-
-        got_fnw = False
-        got_nps = False
-        pieces = []
-
-        nps_re = re.compile(r"\bNPS\s*\d", re.IGNORECASE)
-
-        while j < len(lines):
-            raw = lines[j]
-            s = raw.strip()
-            if not s:
-                break
-            if any(_norm_cmp(s).startswith(_norm_cmp(lbl)) for lbl in STOP_LABELS):
-                break
-
-            # chỉ lấy FNW đầu tiên
-            if (not got_fnw) and ("FNW" in s):
-                pieces.append(s)
-                got_fnw = True
-            # chỉ lấy NPS đầu tiên
-            elif (not got_nps) and nps_re.search(s):
-                pieces.append(s)
-                got_nps = True
-
-            # nếu đã có đủ FNW + NPS thì dừng (tránh dính các dòng song ngữ lặp lại)
-            if got_fnw and got_nps:
-                break
-
-            j += 1
-
-        if not pieces:
-            return None
-
-        merged = " ".join(pieces)
-
-        # --- cắt đến dấu ngoặc ')' cuối cùng (bao gồm dấu ')') ---
-        last_paren = merged.rfind(")")
-        if last_paren != -1:
-            merged = merged[: last_paren + 1]
-
-        return merged
-
-    raw_desc = find_fnw_nps_block_after_nvl(lines) or nps_fallback
-
-    # ---- chuẩn hoá: bỏ dấu, nén khoảng trắng ----
-    def norm(s: Optional[str]) -> str:
-        s = strip_accents(s or "")
-        s = re.sub(r"\s+", " ", s).strip()
-        return s
-
-    ms   = norm(ms_don)
-    desc = norm(raw_desc)          # FNW + NPS (đã cắt tới ')')
-    sl   = norm(so_luong)
-    ngay = norm(ngay_hoan_tat)
-
-    # ---- mã đơn đặt hàng (SV...) nếu có ----
-    ddh_line = next((l for l in lines if l.strip().startswith("SV")), None)
-    ddh = norm(ddh_line)
-
-    # ---- ghép payload ----
-    parts = []
-    if ms:   parts.append(f"MS:{ms}")
-    if desc: parts.append(f"con hang:{desc}")
-    if sl:   parts.append(f"sl:{sl}")
-    if ngay: parts.append(f"Ngay Hoan tat:{ngay}")
-    if ddh:  parts.append(f"Don dat hang:{ddh}")
-
-    payload = ";".join(parts)
-
-    output_qr_txt.parent.mkdir(parents=True, exist_ok=True)
-    output_qr_txt.write_text(payload + "\n", encoding="utf-8")
 
 # ============================
 # 3) QR + CODE128 GENERATION (code3)
@@ -277,115 +40,40 @@ def read_text(path: Path) -> str:
 
 
 def make_qr(data: str, out_png: Path, out_svg: Path) -> None:
-    # Tạo QR linh hoạt kích thước, EC mức Q (ổn cho in tem)
-    qr = qrcode.QRCode(
-        version=None,  # auto-size
-        error_correction=ERROR_CORRECT_Q,
-        box_size=10,
-        border=4,      # quiet zone = 4 modules
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-
-    img = qr.make_image(fill_color="black", back_color="white")
+    # QR PNG + SVG vector để in sắc nét, vẽ từ cùng 1 lần mã hoá (tham số QR ở qrrender)
     out_png.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_png)
-
-    # SVG vector để in sắc nét
-    img_svg = qrcode.make(data, image_factory=qrcode_svg.SvgImage)
-    img_svg.save(out_svg)
-
-
-def to_ascii_one_line(s: str, sep: str = " | ") -> str:
-    s = unicodedata.normalize("NFKD", s)
-    s = s.encode("ascii", "ignore").decode("ascii")
-    lines = [ln.strip() for ln in s.splitlines() if ln.strip()]
-    lines = [re.sub(r"\s+", " ", ln) for ln in lines]
-    return sep.join(lines)
-
-
-def split_for_1d(payload: str, maxlen: int = 80, sep: str = " | ") -> List[str]:
-    if len(payload) <= maxlen:
-        return [payload]
-    parts: List[str] = []
-    current = ""
-    tokens = payload.split(sep)
-    for tk in tokens:
-        candidate = (current + sep + tk) if current else tk
-        if len(candidate) <= maxlen:
-            current = candidate
-        else:
-            if current:
-                parts.append(current)
-                current = tk
-            else:
-                parts.append(tk[:maxlen])
-                current = tk[maxlen:]
-    if current:
-        parts.append(current)
-    return parts
+    matrix = encode_qr(data)
+    out_png.write_bytes(render_png(matrix)[0])
+    out_svg.write_bytes(render_svg(matrix))
 
 
 def make_code128(payload: str, out_base: Path, maxlen: int = 80) -> None:
-    chunks = split_for_1d(payload, maxlen=maxlen)
+    chunks = code128_pngs(payload, maxlen=maxlen)
     out_base.parent.mkdir(parents=True, exist_ok=True)
-
-    if len(chunks) == 1:
-        code = Code128(chunks[0], writer=ImageWriter())
-        code.save(str(out_base), options={
-            "module_width": 0.3,
-            "module_height": 30.0,
-            "quiet_zone": 6.5,
-            "font_size": 10,
-            "text_distance": 2.0,
-            "write_text": False,
-        })
-    else:
-        for idx, chunk in enumerate(chunks, 1):
-            code = Code128(chunk, writer=ImageWriter())
-            code.save(str(out_base.with_name(out_base.stem + f"_part{idx}")), options={
-                "module_width": 0.3,
-                "module_height": 30.0,
-                "quiet_zone": 6.5,
-                "font_size": 10,
-                "text_distance": 2.0,
-                "write_text": False,
-            })
+    for idx, data in enumerate(chunks, 1):
+        name = out_base.name if len(chunks) == 1 else f"{out_base.name}_part{idx}"
+        out_base.with_name(name + ".png").write_bytes(data)
 
 
 # ======================
 # 4) EMBED QR INTO PDF (code4)
 # ======================
 
-def embed_qr_into_pdf(pdf_path: Path, qr_png: Path, output_pdf: Path, page_index: int = 0, width_fraction: float = 4.0) -> None:
-    """Chèn ảnh QR vào giữa trang `page_index`. width_fraction=4.0 -> QR rộng ~1/4 chiều rộng trang."""
-    doc = fitz.open(str(pdf_path))
+def embed_qr_into_pdf(pdf_path: PdfSource, qr_png: Path, output_pdf: Path, page_index: int = 0, width_fraction: float = 4.0) -> None:
+    """Chèn ảnh QR vào giữa trang `page_index`. width_fraction=4.0 -> QR rộng ~1/4 chiều rộng trang.
+    Nếu truyền PdfSession thì dùng lại document đã mở (session tự đóng khi kết thúc)."""
+    import fitz
+
+    session = pdf_path if isinstance(pdf_path, PdfSession) else PdfSession(pdf_path)
     try:
-        page = doc[page_index]
-        page_rect = page.rect
-        page_width, page_height = page_rect.width, page_rect.height
-
-        # Kích thước ảnh QR
-        img = Image.open(qr_png)
-        qr_w_px, qr_h_px = img.size
-
-        # Tỉ lệ: chiếm 1/width_fraction chiều rộng trang
-        scale = page_width / (width_fraction * qr_w_px)
-        qr_w = qr_w_px * scale
-        qr_h = qr_h_px * scale
-
-        # Căn giữa
-        x0 = (page_width - qr_w) / 2
-        y0 = (page_height - qr_h) / 2
-        x1 = x0 + qr_w
-        y1 = y0 + qr_h
-        rect = fitz.Rect(x0, y0, x1, y1)
-
-        page.insert_image(rect, filename=str(qr_png))
-        output_pdf.parent.mkdir(parents=True, exist_ok=True)
-        doc.save(str(output_pdf))
+        png = Path(qr_png).read_bytes()
+        pix = fitz.Pixmap(png)
+        pdf = stamp_qr(session, png, (pix.width, pix.height), page_index=page_index, width_fraction=width_fraction)
     finally:
-        doc.close()
+        if session is not pdf_path:
+            session.close()
+    output_pdf.parent.mkdir(parents=True, exist_ok=True)
+    output_pdf.write_bytes(pdf)
 
 
 # ======================
@@ -393,74 +81,152 @@ def embed_qr_into_pdf(pdf_path: Path, qr_png: Path, output_pdf: Path, page_index
 # ======================
 
 def main():
-    print("qr1")
     ap = argparse.ArgumentParser(description="PDF→Text→Fields→QR/Code128→Embed QR (all-in-one)")
-    ap.add_argument("--pdf", required=True, help="Đường dẫn file PDF đầu vào")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--pdf", help="Đường dẫn file PDF đầu vào ('-' = đọc từ stdin, kéo theo --in-memory)")
+    src.add_argument("--batch", nargs="+", metavar="SPEC", help="Chạy nhiều file: thư mục, glob ('in/*.pdf') hoặc @danh_sach.txt; PDF ra <outpdf>/<tên file>.pdf")
+    src.add_argument("--watch", metavar="DIR", help="Chạy nền: theo dõi thư mục drop, PDF mới ghi xong thì tự chèn QR ra --outpdf (Ctrl+C để dừng)")
+    ap.add_argument("--jobs", type=int, default=0, help="Số process song song cho --batch/--watch (0 = số core, 1 = chạy trong process này)")
+    ap.add_argument("--settle", type=float, default=2.0, help="--watch: file phải đứng yên (size/mtime) bao nhiêu giây mới xử lý")
+    ap.add_argument("--poll", type=float, default=5.0, help="--watch: chu kỳ quét os.scandir (dự phòng khi mất sự kiện, vd ổ SMB)")
+    ap.add_argument("--queue", type=int, default=0, help="--watch: số file tối đa đang chờ/chạy trên worker (0 = 2 x jobs)")
     ap.add_argument("--outdir", default="scan/output", help="Thư mục output")
     ap.add_argument("--outpdf", default="pdf/output", help="Thư mục outputpdf")
-    ap.add_argument("--page", type=int, default=0, help="Chỉ số trang để trích/xử lý (0=trang đầu)")
+    ap.add_argument("--out", default=None, help="File PDF kết quả (mặc định <outpdf>/qrpdf.pdf, '-' = ghi ra stdout, kéo theo --in-memory)")
+    ap.add_argument("--in-memory", action="store_true", help="Không ghi file trung gian (a.txt, a_qr.txt, PNG/SVG, Code128), chỉ ghi PDF kết quả")
+    ap.add_argument("--debug-artifacts", action="store_true", help="Vẫn ghi file trung gian vào --outdir khi chạy --in-memory")
+    ap.add_argument("--page", type=int, default=0, help="Chỉ số trang để trích/xử lý (0=trang đầu, -1=đọc lần lượt các trang, dừng khi đủ trường; QR chèn trang đầu)")
     ap.add_argument("--no-ocr", action="store_true", help="Không dùng OCR (nếu muốn bắt buộc text-based)")
+    ap.add_argument("--text-engine", choices=TEXT_ENGINES, default=DEFAULT_ENGINE, help="Engine đọc lớp text của PDF (pdfium nhanh hơn nhiều, xem bench/bench_engines.py); OCR vẫn là dự phòng")
+    ap.add_argument("--ocr-mode", choices=OCR_MODES, default="page", help="OCR trang scan: page = cả trang, roi = chỉ vùng giá trị asfr102 (psm/whitelist riêng từng vùng, thiếu trường thì OCR cả trang)")
+    ap.add_argument("--ocr-backfill", action="store_true", help="PDF có lớp text nhưng thiếu trường: OCR đúng vùng asfr102 của trường thiếu")
+    ap.add_argument("--ocr-dpi", default="200,300,400", help="Thang DPI OCR: render DPI thấp trước, trang/vùng conf thấp hoặc thiếu trường mới lên bậc kế (1 số = DPI cố định, vd 300)")
+    ap.add_argument("--ocr-min-conf", type=float, default=80.0, help="Độ tin cậy trung bình (0-100) tối thiểu để không phải lên bậc DPI")
+    ap.add_argument("--ocr-workers", type=int, default=0, help="Số worker OCR chạy nền (nạp model 1 lần, 0 = tắt, gọi tesseract từng trang)")
+    ap.add_argument("--ocr-raster", choices=RASTER_BACKENDS, default="fitz", help="Backend render trang cho OCR (mặc định fitz, pdf2image cần poppler)")
+    ap.add_argument("--cache-dir", default=None, help="Thư mục cache text/trường (mặc định: QRPDF_CACHE_DIR hoặc cache của user)")
+    ap.add_argument("--no-cache", action="store_true", help="Không dùng cache, luôn trích lại")
+    ap.add_argument("--template", action="store_true", help="Đọc trường theo toạ độ template asfr102 (vùng học 1 lần, lưu cạnh cache); không khớp thì trích text như thường")
     ap.add_argument("--qr-fraction", type=float, default=4.0, help="QR sẽ rộng ~1/fraction chiều rộng trang (mặc định 4)")
+    ap.add_argument("--qr-stamp", choices=QR_STAMPS, default="image", help="Cách chèn QR: image = ảnh PNG, vector = vẽ module thẳng vào trang (file nhỏ, in sắc nét mọi cỡ), xobject = Form XObject vector")
+    ap.add_argument("--qr-dpi", type=int, default=0, help="DPI máy in: > 0 thì PNG QR render thẳng ở DPI này, đúng cỡ in (module trùng lưới chấm), 0 = 10 px/module rồi co giãn")
+    ap.add_argument("--qr-png-level", type=int, choices=range(10), default=PNG_LEVEL, metavar="0-9", help="Mức nén zlib của PNG QR khi dùng --qr-dpi")
+    ap.add_argument("--qr-payload", choices=QR_PAYLOADS, default="full", help="Nội dung QR: full = nhãn đầy đủ như trước, compact = khoá ngắn + ngày/số lượng chuẩn hoá (giải ngược: python code/qrpayload.py)")
+    ap.add_argument("--qr-max-version", type=int, choices=range(41), default=0, metavar="0-40", help="Version QR tối đa mong muốn: > 0 thì chọn mức EC mạnh nhất còn vừa (H→Q→M→L), 0 = luôn EC Q")
     ap.add_argument("--max1d", type=int, default=80, help="Độ dài tối đa mỗi mã Code128")
     args = ap.parse_args()
-
-    pdf_path = Path(args.pdf)
-    outdir = Path(args.outdir)
-    outdir.mkdir(parents=True, exist_ok=True)
-    outpdf = Path(args.outpdf)
-    outpdf.mkdir(parents=True, exist_ok=True)
-    print("qr2")
-
-    # Các đường dẫn trung gian/đầu ra
-    txt_out = outdir / "a.txt"
-    qr_txt = Path("scan/input/a_qr.txt")  # giữ đúng như cấu trúc trước
-    qr_png = outdir / "a_qr.png"
-    qr_svg = outdir / "a_qr.svg"
-    code128_base = outdir / "a_code128"
-    pdf_with_qr = outpdf / "qrpdf.pdf"
-
-
-    # 1) PDF → TXT
-    print("[1] Extracting text from PDF…")
-    text = extract_pdfminer_topdown_ltr(str(pdf_path), page_index=args.page)
-    if len(text.strip()) < 10:
-        text = extract_pymupdf_sorted(str(pdf_path), page_index=args.page)
-    if len(text.strip()) < 10 and not args.no_ocr:
-        print("    (Fallback to OCR)")
-        text = extract_ocr(str(pdf_path), page_index=args.page)
-    if len(text.strip()) < 1:
-        print("[ERROR] Không trích xuất được văn bản từ PDF.")
-        sys.exit(1)
-    txt_out.write_text(text, encoding="utf-8")
-    print(f"    Saved text -> {txt_out}")
-
-    # 2) Parse fields → a_qr.txt
-    print("[2] Parsing fields to QR text…")
-    extract_fields_to_qr_text(txt_out, qr_txt)
-    print(f"    Saved QR payload -> {qr_txt}")
-
-    # 3) Tạo QR & Code128
-    print("[3] Generating QR & Code128…")
-    qr_payload = read_text(qr_txt)
-    make_qr(qr_payload, qr_png, qr_svg)
-    print(f"    QR -> {qr_png}, {qr_svg}")
-
-    payload_1d = to_ascii_one_line(qr_payload)
-    make_code128(payload_1d, code128_base, maxlen=args.max1d)
-    print(f"    Code128 -> {outdir} (a_code128*.png)")
-
-    # 4) Nhúng QR vào PDF đầu vào → a.pdf
-    print("[4] Embedding QR into PDF…")
-    embed_qr_into_pdf(pdf_path, qr_png, pdf_with_qr, page_index=args.page, width_fraction=args.qr_fraction)
-    print(f"    PDF with QR -> {pdf_with_qr}")
-
-    print("[DONE] Pipeline completed.")
+    try:
+        args.ocr_ladder = DpiLadder.parse(args.ocr_dpi, args.ocr_min_conf)
+    except ValueError as e:
+        ap.error(str(e))
+
+    if args.batch:
+        sys.exit(batch_main(args))
+    if args.watch:
+        sys.exit(watch_main(args))
+
+    to_stdout = args.out == "-"
+    in_memory = args.in_memory or args.pdf == "-" or to_stdout
+    # PDF ra stdout → log sang stderr để không lẫn vào dữ liệu; cả lúc chạy, mọi thứ in ra fd 1
+    # (cảnh báo của fitz, thư viện C…) cũng sang stderr, PDF ghi vào stdout gốc giữ riêng
+    pdf_out = _stdout_to_stderr() if to_stdout else None
+    log = (lambda s: print(s, file=sys.stderr)) if to_stdout else print
+
+    page_index = args.page if args.page >= 0 else None
+    cache = None if args.no_cache else ExtractionCache(args.cache_dir or default_cache_dir())
+    templates = TemplateStore(None if cache is None else cache.root / "templates.json") if args.template else None
+
+    # Các file trung gian chỉ ghi khi không chạy in-memory (hoặc có --debug-artifacts)
+    artifacts = None
+    if not in_memory or args.debug_artifacts:
+        # a_qr.txt giữ đúng như cấu trúc trước
+        artifacts = Artifacts.in_dir(Path(args.outdir), qr_txt=Path("scan/input/a_qr.txt"))
+    pdf_with_qr = None if to_stdout else Path(args.out) if args.out else Path(args.outpdf) / "qrpdf.pdf"
+
+    # Đọc PDF đúng 1 lần; mọi bước bên dưới dùng chung buffer/document
+    session = PdfSession.from_bytes(sys.stdin.buffer.read(), name="stdin.pdf") if args.pdf == "-" else PdfSession(Path(args.pdf))
+    with session:
+        pool = partial(shared_pool, args.ocr_workers) if args.ocr_workers > 0 and not args.no_ocr else None
+        try:
+            result = run_pipeline(session, page_index=page_index, use_ocr=not args.no_ocr, raster=args.ocr_raster,
+                                  pool=pool, cache=cache, templates=templates, qr_fraction=args.qr_fraction,
+                                  max1d=args.max1d, artifacts=artifacts, log=log, text_engine=args.text_engine,
+                                  ocr_mode=args.ocr_mode, ocr_backfill=args.ocr_backfill, ocr_dpi=args.ocr_ladder,
+                                  qr_stamp=args.qr_stamp, qr_dpi=args.qr_dpi, qr_png_level=args.qr_png_level,
+                                  qr_payload=args.qr_payload, qr_max_version=args.qr_max_version)
+        except RuntimeError as e:
+            log(f"[ERROR] {e}")
+            sys.exit(1)
+
+    if pdf_out is not None:
+        pdf_out.write(result.pdf)
+        pdf_out.flush()
+    else:
+        pdf_with_qr.parent.mkdir(parents=True, exist_ok=True)
+        pdf_with_qr.write_bytes(result.pdf)
+        log(f"    PDF with QR -> {pdf_with_qr}")
+
+    if cache is not None:
+        log(f"    {cache.stats()}")
+    log("[DONE] Pipeline completed.")
+
+
+def _stdout_to_stderr():
+    """Trỏ fd 1 sang stderr (cả ghi từ code C); trả về file nhị phân ghi vào stdout gốc."""
+    sys.stdout.flush()
+    out = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    return out
+
+
+def batch_main(args) -> int:
+    """--batch: mỗi file 1 job trên pool process, file trung gian đặt tên theo từng file (<stem>.txt, <stem>_qr.png…)."""
+    paths = collect_inputs(args.batch)
+    if not paths:
+        print("[ERROR] Không tìm thấy file PDF nào.")
+        return 1
+    opts = batch_options(args)
+    print(f"[BATCH] {len(paths)} file(s), jobs={args.jobs or os.cpu_count()}")
+    summary = run_batch(paths, opts, jobs=args.jobs)
+    print(summary.format())
+    return 1 if summary.failed else 0
+
+
+def watch_main(args) -> int:
+    """--watch: daemon giữ thư viện/worker sẵn trong bộ nhớ, mỗi file chỉ tốn thời gian xử lý."""
+    watcher = FolderWatcher(Path(args.watch), batch_options(args), workers=args.jobs, queue_size=args.queue,
+                            settle=args.settle, poll=args.poll)
+    watcher.run()
+    return 0
+
+
+def batch_options(args) -> BatchOptions:
+    return BatchOptions(
+        outpdf=Path(args.outpdf),
+        outdir=Path(args.outdir) if not args.in_memory or args.debug_artifacts else None,
+        page_index=args.page if args.page >= 0 else None,
+        use_ocr=not args.no_ocr,
+        raster=args.ocr_raster,
+        text_engine=args.text_engine,
+        ocr_mode=args.ocr_mode,
+        ocr_backfill=args.ocr_backfill,
+        ocr_dpi=args.ocr_ladder,
+        ocr_workers=args.ocr_workers,
+        cache_dir=None if args.no_cache else Path(args.cache_dir or default_cache_dir()),
+        template=args.template,
+        qr_fraction=args.qr_fraction,
+        qr_stamp=args.qr_stamp,
+        qr_dpi=args.qr_dpi,
+        qr_png_level=args.qr_png_level,
+        qr_payload=args.qr_payload,
+        qr_max_version=args.qr_max_version,
+        max1d=args.max1d,
+    )
 
 
 if __name__ == "__main__":
     # Buộc stdout unbuffered để QProcess đọc được ngay
     try:
-        import sys
         sys.stdout.reconfigure(line_buffering=True)
     except Exception:
         pass
@@ -0,0 +1,290 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import atexit
+import multiprocessing
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+
+from pdfsession import PdfSession, PdfSource
+
+if TYPE_CHECKING:
+    # fitz / pytesseract / PIL import trong hàm: chỉ tốn khi thật sự OCR
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+# Backend raster cho OCR: "fitz" (mặc định, trong process) | "pdf2image" (poppler, tuỳ chọn)
+RASTER_BACKENDS = ("fitz", "pdf2image")
+TESS_CONFIG = "--oem 1 --psm 6"
+
+
+@dataclass(frozen=True)
+class DpiLadder:
+    """
+    OCR thích ứng: render DPI thấp trước, trang/vùng có độ tin cậy trung bình (word tesseract)
+    < min_conf hoặc thiếu trường mới render lại ở bậc DPI kế tiếp. 1 bậc = DPI cố định như cũ.
+    """
+    steps: Tuple[int, ...] = (200, 300, 400)
+    min_conf: float = 80.0
+
+    @classmethod
+    def parse(cls, spec: str, min_conf: float = 80.0) -> "DpiLadder":
+        """ "200,300,400" → DpiLadder((200, 300, 400)); DPI phải tăng dần."""
+        steps = tuple(int(x) for x in spec.replace(" ", "").split(",") if x)
+        if not steps or any(d <= 0 for d in steps) or list(steps) != sorted(set(steps)):
+            raise ValueError(f"Thang DPI không hợp lệ: {spec!r} (vd 200,300,400)")
+        return cls(steps, min_conf)
+
+    def __str__(self) -> str:
+        return f"{'>'.join(map(str, self.steps))} dpi, conf >= {self.min_conf:g}"
+
+
+DEFAULT_LADDER = DpiLadder()
+
+PageImage = Union["fitz.Pixmap", "Image.Image"]
+
+
+def rasterize_fitz(src: PdfSource, dpi: int = 300, page_index: Optional[int] = None) -> Iterator[Tuple[int, fitz.Pixmap, float]]:
+    """Render từng trang bằng PyMuPDF (grayscale). Yield (page_no, pixmap, giây render)."""
+    import fitz
+
+    session = src if isinstance(src, PdfSession) else PdfSession(src)
+    try:
+        doc = session.doc
+        pages = [page_index] if page_index is not None else range(doc.page_count)
+        for pno in pages:
+            t0 = time.perf_counter()
+            pix = doc[pno].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+            yield pno, pix, time.perf_counter() - t0
+    finally:
+        if session is not src:
+            session.close()
+
+
+def rasterize_pdf2image(src: PdfSource, dpi: int = 300, page_index: Optional[int] = None) -> Iterator[Tuple[int, Image.Image, float]]:
+    """
+    Backend cũ qua pdf2image/pdftoppm. pdftoppm render cả loạt trang trong 1 subprocess
+    nên thời gian mỗi trang là trung bình của cả lần gọi.
+    """
+    try:
+        from pdf2image import convert_from_path, convert_from_bytes
+    except ImportError as e:
+        raise RuntimeError("Chưa cài pdf2image (backend raster 'pdf2image')") from e
+
+    kwargs = {"dpi": dpi}
+    first = 0
+    if page_index is not None:
+        # pdf2image dùng chỉ số trang bắt đầu từ 1
+        kwargs.update({"first_page": page_index + 1, "last_page": page_index + 1})
+        first = page_index
+    t0 = time.perf_counter()
+    if isinstance(src, PdfSession):
+        images = convert_from_bytes(src.tobytes(), **kwargs)
+    else:
+        images = convert_from_path(str(src), **kwargs)
+    per_page = (time.perf_counter() - t0) / max(len(images), 1)
+    for i, img in enumerate(images):
+        yield first + i, img, per_page
+
+
+def rasterize(src: PdfSource, dpi: int = 300, page_index: Optional[int] = None, backend: str = "fitz"):
+    if backend == "fitz":
+        return rasterize_fitz(src, dpi=dpi, page_index=page_index)
+    if backend == "pdf2image":
+        return rasterize_pdf2image(src, dpi=dpi, page_index=page_index)
+    raise ValueError(f"Backend raster không hỗ trợ: {backend!r} (chọn {', '.join(RASTER_BACKENDS)})")
+
+
+def ocr_image(img: PageImage, lang: str = "vie+eng", config: str = TESS_CONFIG) -> str:
+    """
+    OCR 1 ảnh trang. Pixmap PyMuPDF được pipe thẳng vào tesseract (stdin → stdout)
+    dạng PGM, không ghi file tạm; ảnh PIL (pdf2image) đi qua pytesseract như cũ.
+    """
+    if _is_pil(img):
+        import pytesseract
+        return pytesseract.image_to_string(img, lang=lang, config=config)
+    return _tesseract_cli(img.tobytes("pnm"), lang, config)
+
+
+def tsv_lines(tsv: str) -> Dict[Tuple[str, ...], List[Tuple[int, float, str]]]:
+    """Word (level 5) có chữ trong output TSV của tesseract, gom theo (page, block, par, line): [(top px, conf, text)]."""
+    lines: Dict[Tuple[str, ...], List[Tuple[int, float, str]]] = {}
+    for row in tsv.splitlines()[1:]:
+        cols = row.split("\t")
+        if len(cols) < 12 or cols[0] != "5" or not cols[11].strip():
+            continue
+        lines.setdefault(tuple(cols[1:5]), []).append((int(cols[7]), float(cols[10]), cols[11]))
+    return lines
+
+
+def tsv_text(tsv: str) -> Tuple[str, float]:
+    """Text (1 dòng / line, các đoạn cách nhau 1 dòng trống như output txt) + conf trung bình các word."""
+    out: List[str] = []
+    confs: List[float] = []
+    prev = None
+    for key, words in tsv_lines(tsv).items():
+        if prev is not None and key[:3] != prev:
+            out.append("")
+        prev = key[:3]
+        out.append(" ".join(w for _, _, w in words))
+        confs += [c for _, c, _ in words if c >= 0]
+    return "\n".join(out), sum(confs) / len(confs) if confs else 0.0
+
+
+def ocr_image_conf(img: PageImage, lang: str = "vie+eng", config: str = TESS_CONFIG) -> Tuple[str, float]:
+    """Như ocr_image nhưng đọc output TSV: (text, độ tin cậy trung bình 0-100) trong 1 lần chạy tesseract."""
+    if _is_pil(img):
+        import pytesseract
+        return tsv_text(pytesseract.image_to_data(img, lang=lang, config=config))
+    return tsv_text(_tesseract_cli(img.tobytes("pnm"), lang, f"{config} tsv"))
+
+
+def _is_pil(img: PageImage) -> bool:
+    # Ảnh PIL chỉ có khi backend pdf2image đã import PIL → không import PIL chỉ để kiểm tra
+    pil = sys.modules.get("PIL.Image")
+    return pil is not None and isinstance(img, pil.Image)
+
+
+def _tesseract_cli(pnm: bytes, lang: str, config: str) -> str:
+    import pytesseract
+    cmd = [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout", "-l", lang, *shlex.split(config)]
+    proc = subprocess.run(cmd, input=pnm, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"tesseract lỗi ({proc.returncode}): {proc.stderr.decode('utf-8', 'ignore').strip()}")
+    return proc.stdout.decode("utf-8", "replace")
+
+
+# ======================
+# Pool worker OCR sống lâu
+# ======================
+
+# (width, height, gray samples) — dạng gửi qua pipe cho worker
+GrayImage = Tuple[int, int, bytes]
+
+
+def to_gray(img: PageImage) -> GrayImage:
+    if _is_pil(img):
+        g = img.convert("L")
+        return g.width, g.height, g.tobytes()
+    import fitz
+    if img.n != 1 or img.alpha:
+        img = fitz.Pixmap(fitz.csGRAY, img)
+    return img.width, img.height, img.samples
+
+
+def _parse_config(config: str) -> Tuple[int, int]:
+    oem = re.search(r"--oem\s+(\d)", config)
+    psm = re.search(r"--psm\s+(\d+)", config)
+    return int(oem.group(1)) if oem else 3, int(psm.group(1)) if psm else 3
+
+
+_worker_api = None
+_worker_args: Tuple[str, str] = ("vie+eng", TESS_CONFIG)
+
+
+def _worker_init(lang: str, config: str) -> None:
+    # Chạy 1 lần mỗi process: nạp traineddata qua libtesseract (tesserocr) rồi giữ lại
+    global _worker_api, _worker_args
+    _worker_args = (lang, config)
+    try:
+        import tesserocr
+    except ImportError:
+        _worker_api = None  # không có tesserocr → worker gọi CLI (vẫn chạy song song)
+        return
+    oem, psm = _parse_config(config)
+    # tesserocr.OEM / PSM chỉ là lớp chứa hằng số (không gọi được) → truyền thẳng số nguyên
+    _worker_api = tesserocr.PyTessBaseAPI(lang=lang, oem=oem, psm=psm)
+
+
+def _worker_ocr(item: GrayImage) -> str:
+    w, h, samples = item
+    if _worker_api is not None:
+        _worker_api.SetImageBytes(samples, w, h, 1, w)
+        return _worker_api.GetUTF8Text()
+    lang, config = _worker_args
+    return _tesseract_cli(b"P5\n%d %d\n255\n" % (w, h) + samples, lang, config)
+
+
+def _worker_ocr_conf(item: GrayImage) -> Tuple[str, float]:
+    w, h, samples = item
+    if _worker_api is not None:
+        _worker_api.SetImageBytes(samples, w, h, 1, w)
+        return _worker_api.GetUTF8Text(), float(_worker_api.MeanTextConf())
+    lang, config = _worker_args
+    return tsv_text(_tesseract_cli(b"P5\n%d %d\n255\n" % (w, h) + samples, lang, f"{config} tsv"))
+
+
+class TesseractPool:
+    """
+    Pool process OCR dùng lâu dài: mỗi worker nạp model `lang` đúng 1 lần (tesserocr),
+    nhận ảnh grayscale qua pipe. Mặc định số worker = số core.
+    Không có tesserocr thì worker fallback sang CLI tesseract (vẫn chạy song song).
+    """
+
+    def __init__(self, lang: str = "vie+eng", config: str = TESS_CONFIG, workers: Optional[int] = None):
+        self.lang = lang
+        self.config = config
+        self.workers = workers or os.cpu_count() or 1
+        ctx = multiprocessing.get_context("spawn")
+        self._pool = ctx.Pool(self.workers, initializer=_worker_init, initargs=(lang, config))
+
+    def ocr(self, images: Sequence[PageImage], on_page: Optional[Callable[[int], None]] = None) -> List[str]:
+        """OCR song song, giữ thứ tự trang. `on_page(n)` gọi khi xong trang thứ n (có thể raise để dừng chờ)."""
+        return self._map(_worker_ocr, images, on_page)
+
+    def ocr_conf(self, images: Sequence[PageImage],
+                 on_page: Optional[Callable[[int], None]] = None) -> List[Tuple[str, float]]:
+        """Như ocr() nhưng trả (text, conf trung bình) mỗi trang — cho DpiLadder."""
+        return self._map(_worker_ocr_conf, images, on_page)
+
+    def _map(self, fn, images: Sequence[PageImage], on_page: Optional[Callable[[int], None]]) -> list:
+        if on_page is None:
+            return self._pool.map(fn, [to_gray(img) for img in images])
+        out = []
+        for n, res in enumerate(self._pool.imap(fn, [to_gray(img) for img in images]), 1):
+            out.append(res)
+            on_page(n)
+        return out
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> "TesseractPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_shared_pool: Optional[TesseractPool] = None
+
+
+def shared_pool(workers: Optional[int] = None, lang: str = "vie+eng") -> TesseractPool:
+    """
+    Pool dùng chung trong process (GUI / batch), tạo lần đầu khi cần, đóng lúc thoát.
+    Gọi lại với `lang` hoặc số worker khác → đóng pool cũ, tạo pool mới đúng cỡ.
+    """
+    global _shared_pool
+    want = workers or os.cpu_count() or 1
+    if _shared_pool is None or _shared_pool.lang != lang or _shared_pool.workers != want:
+        if _shared_pool is not None:
+            _shared_pool.close()
+        _shared_pool = TesseractPool(lang=lang, workers=workers)
+        atexit.register(_shared_pool.close)
+    return _shared_pool
+
+
+# Pool hoặc hàm tạo pool (vd partial(shared_pool, n)): hàm chỉ được gọi khi thật sự OCR,
+# file có lớp text / trúng cache không tốn khởi động process Tesseract
+PoolArg = Union[TesseractPool, Callable[[], TesseractPool]]
+
+
+def resolve_pool(pool: Optional[PoolArg]) -> Optional[TesseractPool]:
+    return pool() if callable(pool) else pool
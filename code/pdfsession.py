@@ -0,0 +1,103 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Union
+import io
+import mmap
+
+if TYPE_CHECKING:
+    import fitz  # PyMuPDF (import khi mở doc lần đầu, không tốn lúc khởi động)
+
+
+class PdfSession:
+    """
+    Mở file PDF đúng 1 lần cho cả pipeline:
+      - đọc bytes 1 lần (mmap nếu được, không thì read()),
+      - pdfminer / PyMuPDF / OCR / bước chèn QR đều dùng chung buffer này,
+      - PyMuPDF chỉ parse 1 lần (self.doc), bước embed dùng lại doc đó.
+    Dùng với `with PdfSession(path) as s:` để đóng mọi thứ khi xong.
+    """
+
+    def __init__(self, pdf_path: Union[str, Path, None] = None, data: Optional[bytes] = None):
+        if pdf_path is None and data is None:
+            raise ValueError("Cần pdf_path hoặc data")
+        self.path: Optional[Path] = Path(pdf_path) if pdf_path is not None else None
+        self._fh = None
+        self._mm: Optional[mmap.mmap] = None
+        self._doc: Optional[fitz.Document] = None
+
+        if data is not None:
+            self.data = memoryview(data)
+            return
+
+        if not self.path.exists():
+            raise FileNotFoundError(self.path)
+        self._fh = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = memoryview(self._mm)
+        except (ValueError, OSError):
+            # File rỗng hoặc FS không hỗ trợ mmap → đọc thường
+            self.data = memoryview(self._fh.read())
+            self._fh.close()
+            self._fh = None
+
+    @classmethod
+    def from_bytes(cls, data: bytes, name: Optional[str] = None) -> "PdfSession":
+        s = cls(data=data)
+        if name:
+            s.path = Path(name)
+        return s
+
+    @property
+    def name(self) -> str:
+        return self.path.name if self.path is not None else "<bytes>"
+
+    @property
+    def doc(self) -> fitz.Document:
+        """Document PyMuPDF dùng chung (parse lần đầu khi cần)."""
+        if self._doc is None:
+            import fitz
+            doc = fitz.open(stream=self.data, filetype="pdf")
+            if doc.is_encrypted:
+                doc.authenticate("")
+            self._doc = doc
+        return self._doc
+
+    def stream(self) -> io.BytesIO:
+        """File-like mới (vị trí 0) trên cùng buffer, cho pdfminer / pdf2image."""
+        return io.BytesIO(self.data)
+
+    def tobytes(self) -> bytes:
+        return self.data.tobytes()
+
+    def close(self) -> None:
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+        if self._mm is not None:
+            try:
+                self.data.release()
+                self._mm.close()
+            except BufferError:
+                # Còn view đang trỏ vào mmap → để GC đóng sau
+                pass
+            self._mm = None
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self) -> "PdfSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+PdfSource = Union[str, Path, PdfSession]
+
+
+def pdfminer_input(src: PdfSource):
+    """Đầu vào cho pdfminer.extract_pages: đường dẫn hoặc stream từ session."""
+    if isinstance(src, PdfSession):
+        return src.stream()
+    return str(src)
@@ -0,0 +1,305 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import io
+import re
+import unicodedata
+
+# fitz / qrcode / barcode import trong hàm của từng bước (khởi động CLI/GUI không tốn)
+from pdfsession import PdfSession
+from ocr import DEFAULT_LADDER, DpiLadder, PoolArg
+from extract import extract_text
+from preflight import DEFAULT_ENGINE
+from fields import build_qr_payload, fields_from_text, write_qr_payload
+from template import TemplateStore, extract_fields_template, template_text
+from roiocr import backfill_fields, scan_fields
+from qrpayload import build_compact_payload
+from qrrender import (
+    PNG_LEVEL, QR_EC, QrMatrix, encode_qr, encode_qr_optimal, pdf_ops, png_idat, render_pdf, render_png,
+    render_png_print, render_svg,
+)
+from extractcache import ExtractionCache
+from progress import ENGINE, OCR_PAGE, CancelToken, ProgressEvent, ProgressFn, StageClock
+
+# ======================
+# Pipeline trong bộ nhớ: mỗi bước truyền object/bytes cho bước sau,
+# chỉ PDF kết quả ra đĩa (file debug chỉ ghi khi có `artifacts`)
+# ======================
+
+CODE128_OPTIONS = {
+    "module_width": 0.3,
+    "module_height": 30.0,
+    "quiet_zone": 6.5,
+    "font_size": 10,
+    "text_distance": 2.0,
+    "write_text": False,
+}
+
+
+@dataclass
+class Artifacts:
+    """Đường dẫn các file trung gian (a.txt, a_qr.txt, PNG/SVG/PDF, Code128) để debug."""
+    txt: Path
+    qr_txt: Path
+    qr_png: Path
+    qr_svg: Path
+    qr_pdf: Path
+    code128_base: Path
+
+    @classmethod
+    def in_dir(cls, outdir: Path, qr_txt: Optional[Path] = None, stem: str = "a") -> "Artifacts":
+        """<stem>.txt, <stem>_qr.txt/png/svg/pdf, <stem>_code128*.png trong outdir (batch: stem riêng mỗi job)."""
+        return cls(outdir / f"{stem}.txt", qr_txt or outdir / f"{stem}_qr.txt", outdir / f"{stem}_qr.png",
+                   outdir / f"{stem}_qr.svg", outdir / f"{stem}_qr.pdf", outdir / f"{stem}_code128")
+
+
+@dataclass
+class PipelineResult:
+    text: str
+    fields: Dict[str, str]
+    payload: str
+    qr_png: bytes  # rỗng khi chèn vector mà không ghi artifacts
+    pdf: bytes
+    timings: Dict[str, float] = field(default_factory=dict)  # giây theo bước: extract / fields / qr / stamp
+    cpu_timings: Dict[str, float] = field(default_factory=dict)  # giây CPU (thread pipeline) theo bước
+    ocr: List[Dict[str, float]] = field(default_factory=list)    # mỗi trang OCR: {"page", "dpi", "conf"}
+    steps: Dict[str, float] = field(default_factory=dict)        # giây bước con: qr.encode / qr.png / qr.svg / qr.pdf
+
+
+def qr_png_bytes(data: str) -> Tuple[bytes, Tuple[int, int]]:
+    """PNG của QR (bytes) + kích thước pixel — mã hoá + vẽ 1 lần (warm-up / benchmark)."""
+    return render_png(encode_qr(data))
+
+
+def to_ascii_one_line(s: str, sep: str = " | ") -> str:
+    s = unicodedata.normalize("NFKD", s)
+    s = s.encode("ascii", "ignore").decode("ascii")
+    lines = [ln.strip() for ln in s.splitlines() if ln.strip()]
+    lines = [re.sub(r"\s+", " ", ln) for ln in lines]
+    return sep.join(lines)
+
+
+def split_for_1d(payload: str, maxlen: int = 80, sep: str = " | ") -> List[str]:
+    if len(payload) <= maxlen:
+        return [payload]
+    parts: List[str] = []
+    current = ""
+    for tk in payload.split(sep):
+        candidate = (current + sep + tk) if current else tk
+        if len(candidate) <= maxlen:
+            current = candidate
+        elif current:
+            parts.append(current)
+            current = tk
+        else:
+            parts.append(tk[:maxlen])
+            current = tk[maxlen:]
+    if current:
+        parts.append(current)
+    return parts
+
+
+def code128_pngs(payload: str, maxlen: int = 80) -> List[bytes]:
+    """PNG Code128 cho từng đoạn (payload dài được tách theo maxlen)."""
+    from barcode import Code128
+    from barcode.writer import ImageWriter
+
+    out = []
+    for chunk in split_for_1d(payload, maxlen=maxlen):
+        buf = io.BytesIO()
+        Code128(chunk, writer=ImageWriter()).write(buf, options=CODE128_OPTIONS)
+        out.append(buf.getvalue())
+    return out
+
+
+QR_STAMPS = ("image", "vector", "xobject")  # cách chèn QR: ảnh PNG / path vector trong content stream / Form XObject
+QR_PAYLOADS = ("full", "compact")  # payload QR: nhãn đầy đủ như trước / schema gọn (qrpayload)
+
+
+def _qr_rect(page, width_fraction: float, w: float, h: float, width: float = 0.0):
+    """Khung QR: rộng 1/width_fraction chiều rộng trang (hoặc đúng `width` pt), giữ tỉ lệ w:h, căn giữa."""
+    import fitz
+
+    page_width, page_height = page.rect.width, page.rect.height
+    scale = (width or page_width / width_fraction) / w
+    qr_w, qr_h = w * scale, h * scale
+    x0 = (page_width - qr_w) / 2
+    y0 = (page_height - qr_h) / 2
+    return fitz.Rect(x0, y0, x0 + qr_w, y0 + qr_h)
+
+
+def stamp_qr(session: PdfSession, png: bytes, size: Tuple[int, int], page_index: int = 0,
+             width_fraction: float = 4.0, dpi: int = 0) -> bytes:
+    """
+    Chèn QR (PNG bytes) vào giữa trang `page_index` của session.doc, trả về PDF bytes.
+    dpi > 0: PNG đã render đúng DPI máy in → chèn đúng cỡ thật (size / dpi inch), không co giãn.
+    """
+    doc = session.doc
+    page = doc[page_index]
+    width = size[0] * 72 / dpi if dpi > 0 else 0.0
+    xref = page.insert_image(_qr_rect(page, width_fraction, *size, width=width), stream=png)
+    if dpi > 0:
+        # MuPDF lưu bitmap thô (không nén): thay bằng đúng zlib của PNG 1-bit + predictor PNG
+        doc.update_stream(xref, png_idat(png), compress=False)
+        doc.xref_set_key(xref, "Filter", "/FlateDecode")
+        doc.xref_set_key(xref, "DecodeParms", f"<</Predictor 15/Colors 1/BitsPerComponent 1/Columns {size[0]}>>")
+    return doc.tobytes()
+
+
+def stamp_qr_vector(session: PdfSession, matrix: QrMatrix, page_index: int = 0, width_fraction: float = 4.0,
+                    xobject: bool = False, qr_pdf: Optional[bytes] = None) -> bytes:
+    """
+    Chèn QR dạng vector (không PNG): cùng khung với stamp_qr.
+    xobject=False: thêm 1 content stream (1 path gộp các đoạn module, 1 lệnh fill) vào cuối trang.
+    xobject=True: QR là Form XObject (PDF 1 trang của render_pdf, `qr_pdf` nếu đã có), dùng lại được.
+    """
+    import fitz
+
+    doc = session.doc
+    page = doc[page_index]
+    rect = _qr_rect(page, width_fraction, matrix.size, matrix.size)
+    if xobject:
+        with fitz.open(stream=qr_pdf or render_pdf(matrix), filetype="pdf") as src:
+            page.show_pdf_page(rect, src, 0)
+        return doc.tobytes()
+
+    # module → toạ độ trang (gốc trên-trái) → không gian PDF của trang (mediabox, trục y)
+    u = rect.width / matrix.size
+    m = fitz.Matrix(u, 0, 0, u, rect.x0, rect.y0) * ~page.transformation_matrix
+    page.wrap_contents()  # nội dung cũ bọc q/Q: CTM của trang không ảnh hưởng QR
+    xref = doc.get_new_xref()
+    doc.update_object(xref, "<<>>")
+    doc.update_stream(xref, b"q %g %g %g %g %g %g cm " % tuple(m) + pdf_ops(matrix) + b" Q")
+    contents = page.get_contents() + [xref]
+    doc.xref_set_key(page.xref, "Contents", "[" + " ".join(f"{x} 0 R" for x in contents) + "]")
+    return doc.tobytes()
+
+
+def _write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def run_pipeline(session: PdfSession, page_index: Optional[int] = 0, use_ocr: bool = True, raster: str = "fitz",
+                 pool: Optional[PoolArg] = None, cache: Optional[ExtractionCache] = None,
+                 templates: Optional[TemplateStore] = None, qr_fraction: float = 4.0, max1d: int = 80,
+                 artifacts: Optional[Artifacts] = None, log: Callable[[str], None] = print,
+                 progress: Optional[ProgressFn] = None, cancel: Optional[CancelToken] = None,
+                 text_engine: str = DEFAULT_ENGINE, ocr_mode: str = "page",
+                 ocr_backfill: bool = False, ocr_dpi: DpiLadder = DEFAULT_LADDER,
+                 qr_stamp: str = "image", qr_dpi: int = 0, qr_png_level: int = PNG_LEVEL,
+                 qr_payload: str = "full", qr_max_version: int = 0) -> PipelineResult:
+    """
+    PDF → text → trường → QR → PDF đã chèn QR, toàn bộ trong bộ nhớ.
+    page_index=None: đọc lần lượt các trang tới khi đủ trường (QR chèn trang đầu).
+    `progress` nhận ProgressEvent (vào/ra bước, engine, trang OCR); `cancel` được kiểm tra
+    đầu mỗi bước và giữa các trang OCR (huỷ → raise Cancelled, không tạo PDF).
+    `text_engine`: engine lớp text thử đầu tiên (pdfminer / pdfium / pymupdf).
+    `ocr_mode`: "page" OCR cả trang scan; "roi" chỉ OCR vùng giá trị asfr102 (thiếu trường thì cả trang).
+    `ocr_backfill`: có lớp text nhưng thiếu trường → OCR đúng vùng của trường thiếu.
+    `ocr_dpi`: thang DPI OCR (trang/vùng); DPI + conf đã chốt từng trang vào PipelineResult.ocr.
+    `qr_stamp`: "image" chèn PNG; "vector" / "xobject" vẽ module trực tiếp (không render PNG trừ khi ghi artifacts).
+    `qr_dpi`: > 0 → PNG 1-bit render thẳng ở DPI máy in, đúng cỡ in (numpy, nén zlib `qr_png_level`);
+    0 → PNG 10 px/module rồi co giãn như trước.
+    `qr_payload`: "compact" → payload gọn (khoá ngắn, ngày/số lượng chuẩn hoá, qrpayload.parse_payload giải ngược).
+    `qr_max_version`: > 0 → chọn EC mạnh nhất còn vừa version này. Compact hoặc có `qr_max_version` thì
+    mã hoá theo đoạn numeric/alnum/byte tối ưu; mặc định giữ nguyên QR cũ (byte, EC Q).
+    Trả về PipelineResult; ghi PDF ra đâu (file/stdout) là việc của bên gọi.
+    """
+    clock = StageClock(progress, cancel)
+    ocr_pages: List[Dict[str, float]] = []
+
+    def on_event(ev: ProgressEvent) -> None:
+        if ev.kind == OCR_PAGE and ev.dpi:
+            ocr_pages.append({"page": ev.page, "dpi": ev.dpi, "conf": round(ev.conf, 1)})
+        if progress is not None:
+            progress(ev)
+
+    # 1) PDF → text (hoặc đọc thẳng trường theo template / OCR vùng giá trị)
+    with clock.stage("extract"):
+        log("[1] Extracting text from PDF…")
+        fields, engine = None, "template"
+        if templates is not None:
+            fields = extract_fields_template(session, templates, page_index=page_index or 0, log=log)
+        if fields is None and use_ocr and ocr_mode == "roi":
+            fields, engine = scan_fields(session, page_index=page_index or 0, store=templates, engine=text_engine,
+                                         dpi=ocr_dpi, log=log, cancel=cancel), "roi-ocr"
+        if fields is not None:
+            clock.emit(ProgressEvent(ENGINE, stage="extract", engine=engine))
+            text = template_text(fields)
+        else:
+            text = extract_text(session, page_index=page_index, use_ocr=use_ocr, raster=raster,
+                                pool=pool, cache=cache, log=log, progress=on_event, cancel=cancel,
+                                engine=text_engine, ocr_dpi=ocr_dpi)
+        if len(text.strip()) < 1:
+            raise RuntimeError("Không trích xuất được văn bản từ PDF.")
+        if artifacts is not None:
+            _write(artifacts.txt, text.encode("utf-8"))
+            log(f"    Saved text -> {artifacts.txt}")
+
+    # 2) Text → trường → payload
+    with clock.stage("fields"):
+        log("[2] Parsing fields to QR text…")
+        if fields is None:
+            fields = fields_from_text(text, cache=cache)
+            if use_ocr and ocr_backfill:
+                fields = backfill_fields(session, fields, page_index=page_index or 0, store=templates,
+                                         dpi=ocr_dpi, log=log, cancel=cancel)
+        payload = build_qr_payload(fields)
+        if qr_payload == "compact":
+            try:
+                payload = build_compact_payload(fields)
+            except ValueError as e:
+                log(f"    compact payload: {e}, using full payload")
+        if artifacts is not None:
+            write_qr_payload(fields, artifacts.qr_txt, payload=payload)
+            log(f"    Saved QR payload -> {artifacts.qr_txt}")
+
+    # 3) QR: mã hoá 1 lần → PNG bytes (chèn dạng ảnh); SVG/PDF vector/Code128 chỉ là file debug
+    with clock.stage("qr"):
+        log("[3] Generating QR & Code128…")
+        with clock.step("qr.encode"):
+            if qr_payload == "compact" or qr_max_version > 0:
+                matrix = encode_qr_optimal(payload, ec="L" if qr_max_version > 0 else QR_EC,
+                                           max_version=qr_max_version)
+            else:
+                matrix = encode_qr(payload)
+        if 0 < qr_max_version < matrix.version:
+            log(f"    QR needs v{matrix.version} > max version {qr_max_version} even at EC L")
+        png, size, qr_pdf = b"", (0, 0), None
+        if qr_stamp == "image" or artifacts is not None:
+            with clock.step("qr.png"):
+                if qr_dpi > 0:
+                    width_pt = session.doc[page_index or 0].rect.width / qr_fraction
+                    png, size = render_png_print(matrix, width_pt, qr_dpi, level=qr_png_level)
+                else:
+                    png, size = render_png(matrix)
+        if artifacts is not None:
+            with clock.step("qr.svg"):
+                svg = render_svg(matrix)
+            with clock.step("qr.pdf"):
+                qr_pdf = render_pdf(matrix)
+            _write(artifacts.qr_png, png)
+            _write(artifacts.qr_svg, svg)
+            _write(artifacts.qr_pdf, qr_pdf)
+            log(f"    QR -> {artifacts.qr_png}, {artifacts.qr_svg}, {artifacts.qr_pdf}")
+            chunks = code128_pngs(to_ascii_one_line(payload), maxlen=max1d)
+            base = artifacts.code128_base
+            for idx, data in enumerate(chunks, 1):
+                name = base.name if len(chunks) == 1 else f"{base.name}_part{idx}"
+                _write(base.with_name(name + ".png"), data)
+            log(f"    Code128 -> {base.parent} ({base.name}*.png)")
+        log(f"    QR {matrix.describe()}: " + ", ".join(
+            f"{k[3:]} {v * 1000:.1f} ms" for k, v in clock.steps.items() if k.startswith("qr.")))
+
+    # 4) Chèn QR vào PDF (dùng lại document của session)
+    with clock.stage("stamp"):
+        log("[4] Embedding QR into PDF…")
+        if qr_stamp == "image":
+            pdf = stamp_qr(session, png, size, page_index=page_index or 0, width_fraction=qr_fraction, dpi=qr_dpi)
+        else:
+            pdf = stamp_qr_vector(session, matrix, page_index=page_index or 0, width_fraction=qr_fraction,
+                                  xobject=qr_stamp == "xobject", qr_pdf=qr_pdf)
+    return PipelineResult(text=text, fields=fields, payload=payload, qr_png=png, pdf=pdf,
+                          timings=clock.wall, cpu_timings=clock.cpu, ocr=ocr_pages, steps=clock.steps)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Tuple
+import time
+import unicodedata
+
+from pdfsession import PdfSession
+from fields import NVL_LABEL, VALUE_LABELS, _norm_cmp
+
+# ======================
+# Pre-flight từng trang: đo nhanh lớp text / font / ảnh / nhãn (PyMuPDF, vài ms)
+# rồi chọn thẳng engine rẻ nhất có khả năng đọc được trang, thay cho chuỗi thử
+# pdfminer → PyMuPDF → OCR chỉ dựa vào "text < 10 ký tự".
+# ======================
+
+MIN_CHARS = 10        # ít hơn: coi như không có lớp text (ngưỡng cũ của chuỗi fallback)
+SCAN_COVER = 0.5      # ảnh phủ ≥ 50% trang: trang scan
+MAX_GARBAGE = 0.3     # tỉ lệ ký tự hỏng (U+FFFD, vùng riêng, ký tự điều khiển) tối đa của lớp text dùng được
+
+LABELS = (*sorted(VALUE_LABELS), NVL_LABEL)
+_LABELS_CMP = tuple(_norm_cmp(lb).rstrip(":") for lb in LABELS)
+
+TEXT_ENGINES = ("pdfminer", "pdfium", "pymupdf")   # engine lớp text chọn được mỗi lần chạy
+DEFAULT_ENGINE = "pdfium"                          # nhanh nhất mà khớp 100% trường (bench/bench_engines.py)
+FALLBACK = ("pdfminer", "pymupdf")                 # thứ tự cũ sau engine đã chọn
+
+
+def _text_order(engine: str) -> Tuple[str, ...]:
+    return (engine, *(e for e in FALLBACK if e != engine))
+
+
+@dataclass
+class PagePlan:
+    """Kết quả pre-flight 1 trang: số đo + thứ tự engine sẽ thử."""
+    page: int
+    chars: int
+    fonts: int
+    image_cover: float
+    labels: int
+    garbage: float
+    engines: Tuple[str, ...]
+    reason: str
+    secs: float
+
+    def describe(self) -> str:
+        order = " > ".join(self.engines) or "skip"
+        return (f"preflight p{self.page + 1}: {self.chars} chars, {self.fonts} font(s), "
+                f"image {self.image_cover:.0%}, labels {self.labels}/{len(LABELS)} -> {order} "
+                f"({self.reason}; {self.secs * 1000:.1f} ms)")
+
+
+def _garbage_ratio(text: str) -> float:
+    chars = [ch for ch in text if not ch.isspace()]
+    if not chars:
+        return 0.0
+    bad = sum(1 for ch in chars
+              if ch == "�" or 0xE000 <= ord(ch) <= 0xF8FF or unicodedata.category(ch) == "Cc")
+    return bad / len(chars)
+
+
+def _image_cover(page) -> float:
+    area = abs(page.rect)
+    if not area:
+        return 0.0
+    covered = sum(abs(page.rect & info["bbox"]) for info in page.get_image_info())
+    return min(1.0, covered / area)
+
+
+def plan_page(session: PdfSession, page_index: int, use_ocr: bool = True, engine: str = DEFAULT_ENGINE) -> PagePlan:
+    """
+    Pre-flight trang `page_index` (`engine`: engine lớp text, một trong TEXT_ENGINES):
+      - lớp text đọc được + có nhãn phiếu            → `engine`, lỗi/ít text thì pdfminer → PyMuPDF
+      - lớp text đọc được, không nhãn, ảnh phủ trang → OCR trước (scan có text chân trang)
+      - lớp text hỏng / không có text nhưng có ảnh   → OCR
+      - không text, chỉ có hình vẽ vector            → OCR
+      - không text, không ảnh, không hình vẽ         → trang trắng, bỏ qua
+    Engine đã chọn trả < MIN_CHARS (hoặc thiếu trường, xem extract_page) thì thử các engine còn lại theo thứ tự.
+    """
+    t0 = time.perf_counter()
+    page = session.doc[page_index]
+    text = page.get_text("text")
+    chars = len(text.strip())
+    fonts = len(page.get_fonts())
+    cover = _image_cover(page)
+    garbage = _garbage_ratio(text)
+    text_cmp = _norm_cmp(text)
+    labels = sum(1 for lb in _LABELS_CMP if lb in text_cmp)
+
+    text_first = (*_text_order(engine), "ocr")
+    ocr_first = ("ocr", *_text_order(engine))
+    has_text = chars >= MIN_CHARS and fonts > 0
+    if has_text and garbage <= MAX_GARBAGE:
+        if labels or cover < SCAN_COVER:
+            engines, reason = text_first, "text layer" if labels else "text layer, no labels"
+        else:
+            engines, reason = ocr_first, "scan, labels not in text layer"
+    elif has_text:
+        engines, reason = ocr_first, f"garbled text layer ({garbage:.0%})"
+    elif cover > 0:
+        engines, reason = ("ocr",), "no text layer"
+    elif page.get_cdrawings():
+        engines, reason = ("ocr",), "vector-only page"
+    else:
+        engines, reason = (), "blank page"
+
+    if not use_ocr:
+        # không OCR: còn chút text thì vẫn lấy như chuỗi cũ
+        engines = tuple(e for e in engines if e != "ocr") or (_text_order(engine) if chars else ())
+    return PagePlan(page=page_index, chars=chars, fonts=fonts, image_cover=cover, labels=labels,
+                    garbage=garbage, engines=engines, reason=reason, secs=time.perf_counter() - t0)
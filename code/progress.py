@@ -0,0 +1,103 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Optional
+import threading
+import time
+
+# ======================
+# Sự kiện tiến độ có kiểu + huỷ hợp tác cho pipeline
+# ======================
+
+STAGE_START = "stage_start"
+STAGE_END = "stage_end"
+ENGINE = "engine"        # engine trích text đang dùng (cache / template / pdfminer / pymupdf / ocr)
+OCR_PAGE = "ocr_page"    # OCR xong trang page/pages
+
+
+@dataclass
+class ProgressEvent:
+    """1 sự kiện tiến độ (picklable để gửi từ worker process về GUI)."""
+    kind: str
+    stage: str = ""
+    engine: str = ""
+    page: int = 0        # OCR_PAGE: trang thứ n (từ 1)
+    pages: int = 0       # OCR_PAGE: tổng số trang sẽ OCR
+    dpi: int = 0         # OCR_PAGE: DPI đã giữ cho trang (0: chỉ báo tiến độ, chưa chốt DPI)
+    conf: float = 0.0    # OCR_PAGE: độ tin cậy trung bình (0-100) ở DPI đó
+    wall: float = 0.0    # STAGE_END: giây thực
+    cpu: float = 0.0     # STAGE_END: giây CPU của thread chạy pipeline (không tính process tesseract)
+    ok: bool = True      # STAGE_END: False nếu bước bị lỗi/huỷ
+
+
+ProgressFn = Callable[[ProgressEvent], None]
+
+
+class Cancelled(Exception):
+    """Job bị huỷ (CancelToken.check ở 1 điểm kiểm tra)."""
+
+
+class CancelToken:
+    """
+    Cờ huỷ hợp tác: pipeline gọi check() ở điểm an toàn (đầu mỗi bước, giữa các trang OCR),
+    không bao giờ ngắt giữa chừng 1 thao tác. `probe`: nguồn huỷ bên ngoài (vd cờ dùng chung
+    giữa process GUI và worker).
+    """
+
+    def __init__(self, probe: Optional[Callable[[], bool]] = None):
+        self._event = threading.Event()
+        self._probe = probe
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or (self._probe is not None and self._probe())
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise Cancelled("đã huỷ")
+
+
+def check(cancel: Optional[CancelToken]) -> None:
+    if cancel is not None:
+        cancel.check()
+
+
+class StageClock:
+    """Đo wall + CPU từng bước, phát STAGE_START/STAGE_END, kiểm tra huỷ khi vào bước."""
+
+    def __init__(self, progress: Optional[ProgressFn] = None, cancel: Optional[CancelToken] = None):
+        self.progress = progress
+        self.cancel = cancel
+        self.wall: Dict[str, float] = {}
+        self.cpu: Dict[str, float] = {}
+        self.steps: Dict[str, float] = {}  # giây wall các bước con (vd qr.encode / qr.png), không phát event
+
+    def emit(self, event: ProgressEvent) -> None:
+        if self.progress is not None:
+            self.progress(event)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        check(self.cancel)
+        self.emit(ProgressEvent(STAGE_START, stage=name))
+        t0, c0 = time.perf_counter(), time.thread_time()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.wall[name] = time.perf_counter() - t0
+            self.cpu[name] = time.thread_time() - c0
+            self.emit(ProgressEvent(STAGE_END, stage=name, wall=self.wall[name], cpu=self.cpu[name], ok=ok))
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        """Đo riêng 1 bước con bên trong stage (cộng dồn nếu gọi nhiều lần)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = self.steps.get(name, 0.0) + time.perf_counter() - t0
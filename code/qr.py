@@ -4,9 +4,7 @@ import unicodedata
 import re
 
 # QR
-import qrcode
-from qrcode.constants import ERROR_CORRECT_Q
-import qrcode.image.svg as qrcode_svg
+from qrrender import encode_qr, render_png, render_svg
 
 # Code 128 (1D)
 from barcode import Code128
@@ -19,23 +17,11 @@ def read_text(path: Path) -> str:
 
 # ---------- QR (2D, UTF-8, giữ xuống dòng) ----------
 def make_qr(data: str, out_png: Path, out_svg: Path) -> None:
-    # Tạo QR linh hoạt kích thước, EC mức Q (ổn cho in tem)
-    qr = qrcode.QRCode(
-        version=None,  # auto-size
-        error_correction=ERROR_CORRECT_Q,
-        box_size=10,
-        border=4,      # quiet zone = 4 modules (khuyến nghị)
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-
-    img = qr.make_image(fill_color="black", back_color="white")
+    # QR linh hoạt kích thước, EC mức Q: mã hoá 1 lần, PNG + SVG vector vẽ từ cùng ma trận
+    matrix = encode_qr(data)
     out_png.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_png)
-
-    # SVG vector để in sắc nét
-    img_svg = qrcode.make(data, image_factory=qrcode_svg.SvgImage)
-    img_svg.save(out_svg)
+    out_png.write_bytes(render_png(matrix)[0])
+    out_svg.write_bytes(render_svg(matrix))
 
 
 # ---------- Code 128 (1D, ASCII) ----------
@@ -0,0 +1,302 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from qrrender import EC_LEVELS, QR_BORDER, QR_EC, QrMatrix
+
+# ======================
+# Mã hoá QR hàng loạt: nhiều payload 1 lần, bit-giống-hệt qrcode.QRCode(...).make(fit=True).
+#   - chia đoạn (numeric / alnum / byte) bằng util.optimal_data_chunks; chọn version, bit stream + pad
+#     như QRCode.best_fit / util.create_data nhưng ghi bit vào 1 số nguyên (BitBuffer ghi từng bit),
+#   - payload gom theo (version, EC); trong mỗi nhóm Reed–Solomon, xếp bit, 8 mask và điểm phạt
+#     (4 luật của qrcode.util.lost_point) tính bằng numpy cho cả nhóm cùng lúc,
+#   - khuôn (finder / timing / alignment / vùng format), thứ tự đặt bit, bảng mask: cache theo version.
+# qrcode / numpy import trong hàm (khởi động CLI/GUI không tốn)
+# ======================
+
+GROUP_CHUNK = 256  # số payload tối đa / lượt numpy (giới hạn RAM: 256 x 8 mask x 177² byte ~ 64 MB ở v40)
+
+_templates: Dict[Tuple[int, int], "_Template"] = {}
+
+
+class _Template:
+    """Phần không phụ thuộc dữ liệu của 1 (version, EC): khuôn, vị trí bit dữ liệu, mask, khối RS."""
+
+    def __init__(self, version: int, ec: int):
+        import numpy as np
+        from qrcode import base
+        from qrcode.main import QRCode
+
+        qr = QRCode(version=version, error_correction=ec)
+        n = qr.modules_count = version * 4 + 17
+        qr.modules = [[None] * n for _ in range(n)]
+        qr.setup_position_probe_pattern(0, 0)
+        qr.setup_position_probe_pattern(n - 7, 0)
+        qr.setup_position_probe_pattern(0, n - 7)
+        qr.setup_position_adjust_pattern()
+        qr.setup_timing_pattern()
+
+        # khuôn lúc chấm điểm mask (test=True: vùng format / version để trắng) và khuôn cuối từng mask
+        def with_info(test: bool, mask: int) -> List[list]:
+            qr.modules = [row[:] for row in blank]
+            qr.setup_type_info(test, mask)
+            if version >= 7:
+                qr.setup_type_number(test)
+            return qr.modules
+
+        blank = [row[:] for row in qr.modules]
+        test = with_info(True, 0)
+        self.size = n
+        self.func_test = np.array(test, dtype=object) == True  # noqa: E712  (None → trắng)
+        info = [(r, c) for r in range(n) for c in range(n) if blank[r][c] is None and test[r][c] is not None]
+        info_r, info_c = np.array(info).T
+        self.func_final = np.repeat(self.func_test[None], 8, axis=0)
+        for k in range(8):
+            final = with_info(False, k)
+            self.func_final[k, info_r, info_c] = [bool(final[r][c]) for r, c in info]
+
+        # thứ tự đặt bit dữ liệu (zigzag 2 cột như QRCode.map_data)
+        rows, cols = [], []
+        inc, row = -1, n - 1
+        for col in range(n - 1, 0, -2):
+            if col <= 6:
+                col -= 1
+            while True:
+                for c in (col, col - 1):
+                    if test[row][c] is None:
+                        rows.append(row)
+                        cols.append(c)
+                row += inc
+                if row < 0 or n <= row:
+                    row -= inc
+                    inc = -inc
+                    break
+        self.rows = np.array(rows)
+        self.cols = np.array(cols)
+        self.masks = _mask_table(self.rows, self.cols)
+
+        # khối RS: (data_count, ec_count) từng khối, và hoán vị xen kẽ codeword như util.create_bytes
+        self.blocks = [(b.data_count, b.total_count - b.data_count) for b in base.rs_blocks(version, ec)]
+        dc_pos, ec_pos, off = [], [], 0
+        for dc, _ in self.blocks:
+            dc_pos.append(list(range(off, off + dc)))
+            off += dc
+        for _, ecc in self.blocks:
+            ec_pos.append(list(range(off, off + ecc)))
+            off += ecc
+        order = [p[i] for i in range(max(map(len, dc_pos))) for p in dc_pos if i < len(p)]
+        order += [p[i] for i in range(max(map(len, ec_pos))) for p in ec_pos if i < len(p)]
+        self.order = np.array(order)
+
+
+def _mask_table(i, j):
+    """8 mask của util.mask_func tính trên mảng chỉ số (hàng i, cột j) → (8, len(i)) bool."""
+    import numpy as np
+
+    ij = i * j
+    return np.stack([
+        (i + j) % 2 == 0,
+        i % 2 == 0,
+        j % 3 == 0,
+        (i + j) % 3 == 0,
+        (i // 2 + j // 3) % 2 == 0,
+        ij % 2 + ij % 3 == 0,
+        (ij % 2 + ij % 3) % 2 == 0,
+        (ij % 3 + (i + j) % 2) % 2 == 0,
+    ])
+
+
+def _template(version: int, ec: int) -> _Template:
+    key = (version, ec)
+    if key not in _templates:
+        _templates[key] = _Template(version, ec)
+    return _templates[key]
+
+
+def _gf_tables():
+    import numpy as np
+    from qrcode import base
+
+    return np.array(base.EXP_TABLE[:255] * 2, dtype=np.int32), np.array(base.LOG_TABLE, dtype=np.int32)
+
+
+def _rs_remainder(data, ec_count: int):
+    """Phần dư Reed–Solomon (GF(256), đa thức sinh của qrcode) cho mọi hàng của `data` (N, dc) cùng lúc."""
+    import numpy as np
+    from qrcode import LUT, base
+
+    exp, log = _gf_tables()
+    if ec_count in LUT.rsPoly_LUT:
+        gen = list(LUT.rsPoly_LUT[ec_count])
+    else:
+        poly = base.Polynomial([1], 0)
+        for i in range(ec_count):
+            poly = poly * base.Polynomial([1, base.gexp(i)], 0)
+        gen = [poly[i] for i in range(len(poly))]
+    gen_log = log[np.array(gen[1:], dtype=np.int32)]  # hệ số đầu = 1
+
+    n, dc = data.shape
+    msg = np.zeros((n, dc + ec_count), dtype=np.int32)
+    msg[:, :dc] = data
+    for i in range(dc):
+        lead = msg[:, i]
+        nz = lead != 0
+        if not nz.any():
+            continue
+        term = exp[(log[lead[nz]][:, None] + gen_log[None, :]) % 255]
+        msg[nz, i + 1:i + 1 + ec_count] ^= term
+    return msg[:, dc:]
+
+
+class _Bits:
+    """Thay util.BitBuffer khi ghi (cùng put(num, length)) nhưng dồn vào 1 số nguyên, không từng bit."""
+
+    def __init__(self):
+        self.value = 0
+        self.length = 0
+
+    def put(self, num: int, length: int) -> None:
+        self.value = (self.value << length) | (num & ((1 << length) - 1))
+        self.length += length
+
+
+def _chunk_bits(data_list) -> List[Tuple[int, int, int, int]]:
+    """Mỗi đoạn: (mode, số ký tự, bit dữ liệu, số bit) — ghi 1 lần, dùng cho mọi version."""
+    out = []
+    for data in data_list:
+        bits = _Bits()
+        data.write(bits)
+        out.append((data.mode, len(data), bits.value, bits.length))
+    return out
+
+
+def _fit_version(chunks, ec: int, start: int = 1) -> int:
+    """QRCode.best_fit: version nhỏ nhất chứa được dữ liệu (độ dài trường đếm đổi theo version)."""
+    from bisect import bisect_left
+    from qrcode import exceptions, util
+
+    mode_sizes = util.mode_sizes_for_version(start)
+    needed = sum(4 + mode_sizes[mode] + n for mode, _, _, n in chunks)
+    version = bisect_left(util.BIT_LIMIT_TABLE[ec], needed, start)
+    if version == 41:
+        raise exceptions.DataOverflowError()
+    if mode_sizes is not util.mode_sizes_for_version(version):
+        return _fit_version(chunks, ec, version)
+    return version
+
+
+def _data_codewords(chunks, version: int, ec: int) -> List[int]:
+    """Bit stream + kết thúc + pad (giống util.create_data, chưa có RS) → danh sách byte dữ liệu."""
+    from qrcode import base, exceptions, util
+
+    buf = _Bits()
+    for mode, count, value, n in chunks:
+        buf.put(mode, 4)
+        buf.put(count, util.length_in_bits(mode, version))
+        buf.put(value, n)
+    bit_limit = sum(block.data_count * 8 for block in base.rs_blocks(version, ec))
+    if buf.length > bit_limit:
+        raise exceptions.DataOverflowError(
+            "Code length overflow. Data size (%s) > size available (%s)" % (buf.length, bit_limit))
+    buf.put(0, min(bit_limit - buf.length, 4))  # kết thúc
+    buf.put(0, -buf.length % 8)
+    for i in range((bit_limit - buf.length) // 8):
+        buf.put(util.PAD0 if i % 2 == 0 else util.PAD1, 8)
+    return list(buf.value.to_bytes(buf.length // 8, "big"))
+
+
+def _runs_penalty(g):
+    """Luật 1 + 3 của lost_point theo hàng của g (..., n, n): chuỗi >= 5 cùng màu và mẫu 1:1:3:1:1."""
+    eq = g[..., 1:] == g[..., :-1]
+    same5 = eq[..., :-3] & eq[..., 1:-2] & eq[..., 2:-1] & eq[..., 3:]  # cửa sổ 5 ô cùng màu
+    starts = same5.copy()
+    starts[..., 1:] &= ~eq[..., :-4]  # cửa sổ bắt đầu 1 chuỗi mới
+    # chuỗi dài L >= 5: (L - 2) điểm = (L - 4) cửa sổ + 2 cho mỗi chuỗi
+    p1 = same5.sum(axis=(-1, -2)) + 2 * starts.sum(axis=(-1, -2))
+
+    w = [g[..., i:g.shape[-1] - 10 + i] for i in range(11)]
+    core = ~w[1] & w[4] & ~w[5] & w[6] & ~w[9]
+    pat = core & ((w[0] & w[2] & w[3] & ~w[7] & ~w[8] & ~w[10]) | (~w[0] & ~w[2] & ~w[3] & w[7] & w[8] & w[10]))
+    return p1 + 40 * pat.sum(axis=(-1, -2))
+
+
+def _lost_points(g):
+    """util.lost_point cho cả lô g (N, n, n) bool → (N,) điểm phạt."""
+    import numpy as np
+
+    n = g.shape[-1]
+    score = _runs_penalty(g) + _runs_penalty(np.swapaxes(g, -1, -2))
+    # luật 2: khối 2x2 cùng màu
+    tl = g[:, :-1, :-1]
+    block = (tl == g[:, 1:, :-1]) & (tl == g[:, :-1, 1:]) & (tl == g[:, 1:, 1:])
+    score += 3 * block.sum(axis=(1, 2))
+    # luật 4: tỉ lệ ô đen lệch 50% (cùng phép tính float như qrcode)
+    percent = g.sum(axis=(1, 2)).astype(np.float64) / (n ** 2)
+    score += (np.abs(percent * 100 - 50) / 5).astype(np.int64) * 10
+    return score
+
+
+def _encode_group(t: _Template, codewords: List[List[int]], border: int, version: int, ec: str) -> List[QrMatrix]:
+    import numpy as np
+
+    data = np.array(codewords, dtype=np.int32)
+    count = len(codewords)
+    dcs, offs = [], []
+    for dc, _ in t.blocks:
+        offs.append(sum(dcs))
+        dcs.append(dc)
+    # khối cùng cỡ (dc, ec) xếp chồng → 1 lần chia đa thức cho cả nhóm x mọi khối đó
+    ecs: List = [None] * len(t.blocks)
+    for shape in sorted(set(t.blocks)):
+        idx = [b for b, blk in enumerate(t.blocks) if blk == shape]
+        rem = _rs_remainder(np.vstack([data[:, offs[b]:offs[b] + shape[0]] for b in idx]), shape[1])
+        for j, b in enumerate(idx):
+            ecs[b] = rem[j * count:(j + 1) * count]
+    final = np.hstack([data] + ecs)[:, t.order].astype(np.uint8)
+
+    bits = np.zeros((len(codewords), len(t.rows)), dtype=bool)
+    raw = np.unpackbits(final, axis=1).astype(bool)
+    bits[:, :raw.shape[1]] = raw  # bit dư sau codeword cuối = 0 (trước mask), như map_data
+
+    grids = np.empty((len(codewords), t.size, t.size), dtype=bool)
+    scores = np.empty((len(codewords), 8), dtype=np.int64)
+    for k in range(8):
+        grids[:] = t.func_test
+        grids[:, t.rows, t.cols] = bits ^ t.masks[k]
+        scores[:, k] = _lost_points(grids)
+    best = scores.argmin(axis=1)  # mask đầu tiên có điểm nhỏ nhất, như best_mask_pattern
+
+    out = []
+    for i, k in enumerate(best):
+        g = t.func_final[k].copy()
+        g[t.rows, t.cols] = bits[i] ^ t.masks[k]
+        out.append(QrMatrix(tuple(map(tuple, g.tolist())), version, ec, border))
+    return out
+
+
+def encode_qr_many(payloads: Sequence[str], ec: str = QR_EC, border: int = QR_BORDER,
+                   version: Optional[int] = None) -> List[QrMatrix]:
+    """
+    Mã hoá nhiều payload, kết quả theo đúng thứ tự; từng ma trận giống hệt qrrender.encode_qr(payload).
+    version=None: mỗi payload version nhỏ nhất vừa dữ liệu; payload quá dài → DataOverflowError.
+    """
+    from qrcode import constants, util
+
+    if ec not in EC_LEVELS:
+        raise ValueError(f"Mức EC không hợp lệ: {ec!r} (chọn {', '.join(EC_LEVELS)})")
+    level = getattr(constants, f"ERROR_CORRECT_{ec}")
+
+    groups: Dict[int, List[Tuple[int, List[int]]]] = {}
+    for idx, data in enumerate(payloads):
+        chunks = _chunk_bits(util.optimal_data_chunks(data, minimum=20))  # như QRCode.add_data(optimize=20)
+        v = _fit_version(chunks, level) if version is None else version
+        util.check_version(v)
+        groups.setdefault(v, []).append((idx, _data_codewords(chunks, v, level)))
+
+    out: List[Optional[QrMatrix]] = [None] * len(payloads)
+    for v, items in sorted(groups.items()):
+        t = _template(v, level)
+        for start in range(0, len(items), GROUP_CHUNK):
+            chunk = items[start:start + GROUP_CHUNK]
+            for (idx, _), m in zip(chunk, _encode_group(t, [cw for _, cw in chunk], border, v, ec)):
+                out[idx] = m
+    return out
@@ -0,0 +1,115 @@
+from __future__ import annotations
+from typing import Dict
+import json
+import re
+import sys
+
+from fields import QR_FIELDS
+
+# ======================
+# Payload QR gọn (schema v1) + bộ giải ngược về trường.
+#   đầy đủ: MS:PP105-2507180001;con hang:NPS11/2 CL600 …;sl:25.000 PCS;Ngay Hoan tat:2025/10/15;Don dat hang:SV011-…
+#   gọn:    Q1*MPP105-2507180001*OSV011-2507170003*N20251015*S25PCS*DNPS11/2 CL600 …
+# Khoá 1 chữ, tách bằng "*" (đều thuộc bảng alnum của QR → đoạn alnum/numeric dài, version nhỏ hơn).
+# Ngày YYYY/MM/DD → YYYYMMDD, số lượng "25.000 PCS" → "25PCS"; chỉ chuẩn hoá khi giải ngược ra đúng
+# chuỗi cũ, không thì giữ nguyên với khoá chữ thường (n / s). "con hang" luôn ở cuối (chứa gì cũng được).
+# ======================
+
+COMPACT_PREFIX = "Q1"
+SEP = "*"
+COMPACT_KEYS = (("ms", "M"), ("ddh", "O"), ("ngay", "N"), ("sl", "S"), ("desc", "D"))  # desc phải ở cuối
+SL_DECIMALS = 3  # số lượng in trên phiếu luôn 3 số lẻ ("25.000 PCS")
+
+_DATE = re.compile(r"(\d{4})/(\d{2})/(\d{2})")
+_DATE_C = re.compile(r"\d{8}")
+_SL = re.compile(r"(\d+)\.(\d{%d})(?: ([A-Z]+))?" % SL_DECIMALS)
+_SL_C = re.compile(r"(\d+)(?:\.(\d{1,%d}))?([A-Z]*)" % SL_DECIMALS)
+_LABELS = re.compile("(?:^|;)(" + "|".join(re.escape(label) for _, label in QR_FIELDS) + "):")
+
+
+def _pack_date(value: str) -> str:
+    m = _DATE.fullmatch(value)
+    return "".join(m.groups()) if m else ""
+
+
+def _unpack_date(value: str) -> str:
+    if not _DATE_C.fullmatch(value):
+        raise ValueError(f"Ngày không hợp lệ trong payload gọn: {value!r}")
+    return f"{value[:4]}/{value[4:6]}/{value[6:]}"
+
+
+def _pack_sl(value: str) -> str:
+    m = _SL.fullmatch(value)
+    if not m:
+        return ""
+    frac = m.group(2).rstrip("0")
+    return m.group(1) + ("." + frac if frac else "") + (m.group(3) or "")
+
+
+def _unpack_sl(value: str) -> str:
+    m = _SL_C.fullmatch(value)
+    if not m:
+        raise ValueError(f"Số lượng không hợp lệ trong payload gọn: {value!r}")
+    unit = m.group(3)
+    return f"{m.group(1)}.{(m.group(2) or '').ljust(SL_DECIMALS, '0')}" + (f" {unit}" if unit else "")
+
+
+_PACK = {"ngay": (_pack_date, _unpack_date), "sl": (_pack_sl, _unpack_sl)}
+
+
+def build_compact_payload(fields: Dict[str, str]) -> str:
+    """Payload gọn từ trường; ValueError nếu không biểu diễn được (MS / ĐĐH chứa "*")."""
+    parts = [COMPACT_PREFIX]
+    for key, tag in COMPACT_KEYS:
+        value = fields.get(key)
+        if not value:
+            continue
+        if key in _PACK:
+            pack, unpack = _PACK[key]
+            packed = pack(value)
+            if packed and unpack(packed) == value:
+                value = packed
+            else:
+                tag = tag.lower()  # giữ nguyên chuỗi
+        if SEP in value and key != "desc":
+            raise ValueError(f"Trường {key} chứa '{SEP}', không dùng được payload gọn: {value!r}")
+        parts.append(tag + value)
+    return SEP.join(parts)
+
+
+def is_compact(payload: str) -> bool:
+    return payload.startswith(COMPACT_PREFIX + SEP)
+
+
+def parse_payload(payload: str) -> Dict[str, str]:
+    """Payload QR (gọn hoặc đầy đủ) → trường, đủ mọi khoá của QR_FIELDS (thiếu = "")."""
+    fields = {key: "" for key, _ in QR_FIELDS}
+    payload = payload.strip()
+    if is_compact(payload):
+        by_tag = {tag: key for key, tag in COMPACT_KEYS}
+        rest = payload[len(COMPACT_PREFIX) + 1:]
+        while rest:
+            tag, rest = rest[0], rest[1:]
+            key = by_tag.get(tag.upper())
+            if key is None or (tag.islower() and key not in _PACK):
+                raise ValueError(f"Khoá không hợp lệ trong payload gọn: {tag!r}")
+            if key == "desc":
+                value, rest = rest, ""
+            else:
+                value, _, rest = rest.partition(SEP)
+            fields[key] = _PACK[key][1](value) if key in _PACK and tag.isupper() else value
+        return fields
+    by_label = {label: key for key, label in QR_FIELDS}
+    found = list(_LABELS.finditer(payload))
+    if not found or found[0].start() != 0:
+        raise ValueError(f"Không nhận ra payload QR: {payload[:40]!r}")
+    for m, nxt in zip(found, found[1:] + [None]):
+        fields[by_label[m.group(1)]] = payload[m.end():nxt.start() if nxt else len(payload)]
+    return fields
+
+
+if __name__ == "__main__":
+    # Giải payload quét được (tham số hoặc từng dòng stdin) → JSON trường
+    for line in sys.argv[1:] or sys.stdin:
+        if line.strip():
+            print(json.dumps(parse_payload(line), ensure_ascii=False))
@@ -0,0 +1,291 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+import io
+import struct
+import zlib
+
+# ======================
+# QR: mã hoá payload đúng 1 lần thành ma trận module; PNG / SVG / PDF đều vẽ từ ma trận đó
+# (trước đây PNG và SVG mã hoá 2 lần với tham số khác nhau → có thể khác version / EC).
+# qrcode / PIL / numpy / fitz import trong hàm (khởi động CLI/GUI không tốn)
+# ======================
+
+EC_LEVELS = ("L", "M", "Q", "H")
+QR_EC = "Q"            # EC mức Q (ổn cho in tem)
+QR_BORDER = 4          # quiet zone = 4 modules
+QR_BOX = 10            # px / module của PNG
+MODULE_MM = 1.0        # SVG / PDF: 1 mm / module (như SvgImage mặc định của qrcode)
+PNG_LEVEL = 6          # mức nén zlib mặc định của PNG in theo DPI (0-9)
+
+
+@dataclass(frozen=True)
+class QrMatrix:
+    """Ma trận module đã mã hoá (không gồm quiet zone), True = module đen."""
+    rows: Tuple[Tuple[bool, ...], ...]
+    version: int
+    ec: str
+    border: int = QR_BORDER
+
+    @property
+    def size(self) -> int:
+        """Số module mỗi cạnh, tính cả quiet zone."""
+        return len(self.rows) + 2 * self.border
+
+    def runs(self) -> Iterator[Tuple[int, int, int]]:
+        """Các đoạn module đen liền nhau trên từng hàng: (x, y, dài), toạ độ module tính cả quiet zone."""
+        b = self.border
+        for y, row in enumerate(self.rows):
+            x, n = 0, len(row)
+            while x < n:
+                if not row[x]:
+                    x += 1
+                    continue
+                x0 = x
+                while x < n and row[x]:
+                    x += 1
+                yield x0 + b, y + b, x - x0
+
+    def describe(self) -> str:
+        return f"v{self.version}-{self.ec} ({len(self.rows)}x{len(self.rows)} modules)"
+
+
+def encode_qr(data: str, ec: str = QR_EC, border: int = QR_BORDER, version: Optional[int] = None) -> QrMatrix:
+    """Mã hoá `data` 1 lần (version=None: nhỏ nhất vừa dữ liệu)."""
+    import qrcode
+    from qrcode import constants
+
+    if ec not in EC_LEVELS:
+        raise ValueError(f"Mức EC không hợp lệ: {ec!r} (chọn {', '.join(EC_LEVELS)})")
+    qr = qrcode.QRCode(version=version, error_correction=getattr(constants, f"ERROR_CORRECT_{ec}"), border=border)
+    qr.add_data(data)
+    qr.make(fit=version is None)
+    return _matrix(qr, ec, border)
+
+
+def _matrix(qr, ec: str, border: int) -> QrMatrix:
+    return QrMatrix(tuple(tuple(bool(c) for c in row) for row in qr.modules), qr.version, ec, border)
+
+
+# ======================
+# Phân đoạn tối ưu numeric / alnum / byte + chọn EC theo version đích.
+# qrcode chỉ tách đoạn số / alnum khi dài >= 20 ký tự; ở đây quy hoạch động theo số bit
+# (đơn vị 1/6 bit: numeric 10/3, alnum 11/2, byte 8 / byte UTF-8), tính lại cho từng nhóm
+# version vì độ dài trường đếm ký tự đổi ở version 10 và 27.
+# ======================
+
+SEG_NUMERIC, SEG_ALNUM, SEG_BYTE = 1, 2, 4   # mode indicator chuẩn QR (= qrcode.util.MODE_*)
+ALNUM_CHARS = frozenset("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:")
+_SEG_MODES = (SEG_BYTE, SEG_ALNUM, SEG_NUMERIC)
+_CHAR_COST = {SEG_NUMERIC: 20, SEG_ALNUM: 33}  # 1/6 bit / ký tự
+
+
+def _count_bits(mode: int, version: int) -> int:
+    """Độ dài trường đếm ký tự của đoạn `mode` ở `version`."""
+    group = 0 if version < 10 else 1 if version < 27 else 2
+    return {SEG_NUMERIC: (10, 12, 14), SEG_ALNUM: (9, 11, 13), SEG_BYTE: (8, 16, 16)}[mode][group]
+
+
+def _encodable(mode: int, ch: str) -> bool:
+    if mode == SEG_NUMERIC:
+        return "0" <= ch <= "9"
+    return mode == SEG_BYTE or ch in ALNUM_CHARS
+
+
+def optimal_segments(text: str, version: int) -> List[Tuple[int, str]]:
+    """Chia `text` thành các đoạn (mode, chuỗi) ít bit nhất ở `version`."""
+    if not text:
+        return []
+    n_modes = len(_SEG_MODES)
+    head = [(4 + _count_bits(m, version)) * 6 for m in _SEG_MODES]
+    prev = list(head)
+    choices: List[List[Optional[int]]] = []
+    for ch in text:
+        cur: List[Optional[int]] = [None] * n_modes
+        costs = [0] * n_modes
+        for j, mode in enumerate(_SEG_MODES):  # nối tiếp đoạn cùng mode
+            if _encodable(mode, ch):
+                costs[j] = prev[j] + _CHAR_COST.get(mode, len(ch.encode("utf-8")) * 48)
+                cur[j] = mode
+        for j in range(n_modes):  # kết thúc đoạn ở ký tự này, mở đoạn mode j cho ký tự sau
+            for k in range(n_modes):
+                if cur[k] is None:
+                    continue
+                cost = (costs[k] + 5) // 6 * 6 + head[j]
+                if cur[j] is None or cost < costs[j]:
+                    costs[j], cur[j] = cost, _SEG_MODES[k]
+        choices.append(cur)
+        prev = costs
+    mode = _SEG_MODES[min(range(n_modes), key=lambda j: prev[j])]
+    modes: List[int] = [0] * len(text)
+    for i in range(len(text) - 1, -1, -1):
+        mode = choices[i][_SEG_MODES.index(mode)]
+        modes[i] = mode
+    segments: List[Tuple[int, str]] = []
+    start = 0
+    for i in range(1, len(text) + 1):
+        if i == len(text) or modes[i] != modes[start]:
+            segments.append((modes[start], text[start:i]))
+            start = i
+    return segments
+
+
+def segments_bits(segments: List[Tuple[int, str]], version: int) -> int:
+    """Tổng số bit dữ liệu (header + trường đếm + nội dung) của các đoạn ở `version`."""
+    bits = 0
+    for mode, chunk in segments:
+        if mode == SEG_NUMERIC:
+            body = len(chunk) // 3 * 10 + (0, 4, 7)[len(chunk) % 3]
+        elif mode == SEG_ALNUM:
+            body = len(chunk) // 2 * 11 + len(chunk) % 2 * 6
+        else:
+            chunk = chunk.encode("utf-8")
+            body = len(chunk) * 8
+        bits += 4 + _count_bits(mode, version) + body
+    return bits
+
+
+def fit_segments(text: str, ec: str = QR_EC) -> Tuple[int, List[Tuple[int, str]]]:
+    """(version nhỏ nhất, các đoạn tối ưu) chứa vừa `text` ở mức EC `ec`."""
+    from qrcode import constants
+    from qrcode.util import BIT_LIMIT_TABLE
+
+    limits = BIT_LIMIT_TABLE[getattr(constants, f"ERROR_CORRECT_{ec}")]
+    by_group: Dict[int, List[Tuple[int, str]]] = {}
+    for version in range(1, 41):
+        group = _count_bits(SEG_BYTE, version) + _count_bits(SEG_NUMERIC, version)
+        if group not in by_group:
+            by_group[group] = optimal_segments(text, version)
+        segments = by_group[group]
+        if segments_bits(segments, version) <= limits[version]:
+            return version, segments
+    raise ValueError(f"Payload quá dài cho QR mức EC {ec} ({len(text)} ký tự)")
+
+
+def encode_segments(segments: List[Tuple[int, str]], version: int, ec: str = QR_EC,
+                    border: int = QR_BORDER) -> QrMatrix:
+    """Mã hoá đúng các đoạn đã chia ở `version` cố định."""
+    import qrcode
+    from qrcode import constants
+    from qrcode.util import QRData
+
+    qr = qrcode.QRCode(version=version, error_correction=getattr(constants, f"ERROR_CORRECT_{ec}"), border=border)
+    for mode, chunk in segments:
+        qr.add_data(QRData(chunk.encode("utf-8"), mode=mode, check_data=False))
+    qr.make(fit=False)
+    return _matrix(qr, ec, border)
+
+
+def encode_qr_optimal(data: str, ec: str = QR_EC, border: int = QR_BORDER, max_version: int = 0) -> QrMatrix:
+    """
+    Mã hoá `data` với các đoạn tối ưu (version thường nhỏ hơn encode_qr).
+    max_version > 0: chọn EC mạnh nhất (H → Q → M → L, `ec` là mức thấp nhất chấp nhận) còn vừa
+    version <= max_version; không mức nào vừa → dùng `ec` ở version nhỏ nhất có thể.
+    """
+    if ec not in EC_LEVELS:
+        raise ValueError(f"Mức EC không hợp lệ: {ec!r} (chọn {', '.join(EC_LEVELS)})")
+    levels = ("H", "Q", "M", "L")
+    for level in (levels[:levels.index(ec)] if max_version > 0 else ()):
+        try:
+            version, segments = fit_segments(data, level)
+        except ValueError:  # quá dài cho mức này
+            continue
+        if version <= max_version:
+            return encode_segments(segments, version, level, border)
+    version, segments = fit_segments(data, ec)
+    return encode_segments(segments, version, ec, border)
+
+
+def render_png(m: QrMatrix, box_size: int = QR_BOX) -> Tuple[bytes, Tuple[int, int]]:
+    """PNG 1-bit (bytes) + kích thước pixel; giống hệt ảnh make_image của qrcode cùng box_size."""
+    from PIL import Image
+
+    n = m.size
+    img = Image.new("1", (n, n), 1)
+    px = img.load()
+    for x, y, w in m.runs():
+        for i in range(x, x + w):
+            px[i, y] = 0
+    img = img.resize((n * box_size, n * box_size), Image.NEAREST)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue(), img.size
+
+
+def print_scale(m: QrMatrix, width_pt: float, dpi: int) -> int:
+    """Số pixel / module nguyên lớn nhất (>= 1) để QR không rộng quá width_pt ở `dpi` (module trùng lưới chấm in)."""
+    return max(1, int(width_pt / 72 * dpi / m.size))
+
+
+def render_png_print(m: QrMatrix, width_pt: float, dpi: int,
+                     level: int = PNG_LEVEL) -> Tuple[bytes, Tuple[int, int]]:
+    """
+    PNG 1-bit đúng DPI máy in: ma trận nhân lên bằng numpy (repeat) với số pixel / module nguyên,
+    ghi thẳng PNG (IHDR 1-bit xám + pHYs theo dpi + IDAT zlib `level`), không qua PIL.
+    Cạnh thực tế = size * scale / dpi inch (<= width_pt, hụt dưới 1 pixel / module).
+    """
+    import numpy as np
+
+    scale = print_scale(m, width_pt, dpi)
+    dark = np.pad(np.array(m.rows, dtype=bool), m.border)
+    bits = np.repeat(np.repeat(~dark, scale, axis=0), scale, axis=1)  # 1 = trắng
+    side = bits.shape[1]
+    rows = np.packbits(bits, axis=1)
+    raw = np.hstack([np.zeros((side, 1), dtype=np.uint8), rows])  # filter 0 đầu mỗi dòng
+    ppm = round(dpi / 0.0254)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    png = (b"\x89PNG\r\n\x1a\n"
+           + chunk(b"IHDR", struct.pack(">IIBBBBB", side, side, 1, 0, 0, 0, 0))
+           + chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1))
+           + chunk(b"IDAT", zlib.compress(raw.tobytes(), level))
+           + chunk(b"IEND", b""))
+    return png, (side, side)
+
+
+def png_idat(png: bytes) -> bytes:
+    """Dữ liệu zlib (các chunk IDAT nối lại) của 1 file PNG."""
+    out, pos = [], 8
+    while pos < len(png):
+        n, tag = struct.unpack(">I4s", png[pos:pos + 8])
+        if tag == b"IDAT":
+            out.append(png[pos + 8:pos + 8 + n])
+        pos += n + 12
+    return b"".join(out)
+
+
+def render_svg(m: QrMatrix, module_mm: float = MODULE_MM) -> bytes:
+    """SVG vector: 1 path gộp các đoạn module đen theo hàng (đơn vị viewBox = 1 module)."""
+    d = "".join(f"M{x} {y}h{w}v1h-{w}z" for x, y, w in m.runs())
+    side = m.size * module_mm
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{side:g}mm" height="{side:g}mm" '
+            f'viewBox="0 0 {m.size} {m.size}" shape-rendering="crispEdges">'
+            f'<path d="{d}" fill="#000"/></svg>\n').encode("ascii")
+
+
+def pdf_ops(m: QrMatrix) -> bytes:
+    """Toán tử PDF vẽ các đoạn module đen (1 path, 1 lệnh fill) trong hệ toạ độ module, gốc trên-trái."""
+    rects = " ".join(f"{x} {y} {w} 1 re" for x, y, w in m.runs())
+    return f"0 g {rects} f".encode("ascii")
+
+
+def render_pdf(m: QrMatrix, module_mm: float = MODULE_MM) -> bytes:
+    """PDF 1 trang đúng cỡ QR (cả quiet zone), module là hình chữ nhật vector."""
+    import fitz
+
+    u = module_mm * 72 / 25.4
+    side = m.size * u
+    doc = fitz.open()
+    try:
+        page = doc.new_page(width=side, height=side)
+        # lật trục y: 1 đơn vị = 1 module, gốc ở góc trên-trái như ma trận
+        xref = doc.get_new_xref()
+        doc.update_object(xref, "<<>>")
+        doc.update_stream(xref, b"q %g 0 0 %g 0 %g cm " % (u, -u, side) + pdf_ops(m) + b" Q")
+        doc.xref_set_key(page.xref, "Contents", f"{xref} 0 R")
+        return doc.tobytes(deflate=True, garbage=1)
+    finally:
+        doc.close()
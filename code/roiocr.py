@@ -0,0 +1,256 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Optional, Tuple
+import re
+import time
+
+from pdfsession import PdfSession
+from ocr import DEFAULT_LADDER, DpiLadder, ocr_image, ocr_image_conf, tsv_lines
+from fields import _M_CODE_RE, QR_FIELDS, _is_stop, _norm, _norm_cmp, pick_fnw_nps
+from template import ROW_LABELS, Box, TemplateStore, learn_template
+from preflight import DEFAULT_ENGINE, plan_page
+from progress import CancelToken, Cancelled, check
+
+if TYPE_CHECKING:
+    import fitz  # PyMuPDF
+
+# ======================
+# OCR theo vùng (ROI) của phiếu asfr102: chỉ render + OCR các ô giá trị (vài chục px cao)
+# thay vì cả trang 300 DPI (logo, chân trang ký duyệt, chữ song ngữ…).
+# Mỗi vùng có psm + whitelist riêng; dùng cho trang scan hoặc để bù trường lớp text thiếu.
+# ======================
+
+OCR_MODES = ("page", "roi")   # page: OCR cả trang như cũ; roi: chỉ vùng giá trị
+PAD_Y = 1.5                   # nới vùng theo chiều dọc (pt); chiều ngang không nới: sát nhãn / ô bên cạnh
+
+CODE_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-"
+
+
+@dataclass(frozen=True)
+class RoiSpec:
+    """Cách OCR 1 vùng: page segmentation mode, whitelist ký tự, ngôn ngữ."""
+    psm: int
+    whitelist: str = ""
+    lang: str = "eng"
+
+    def config(self) -> str:
+        cfg = f"--oem 1 --psm {self.psm}"
+        return f"{cfg} -c tessedit_char_whitelist={self.whitelist}" if self.whitelist else cfg
+
+
+ROI_SPECS: Dict[str, RoiSpec] = {
+    "ms":   RoiSpec(7, CODE_CHARS),                        # 1 dòng: PP105-2507180001
+    "desc": RoiSpec(6, lang="vie+eng"),                    # khối nhiều dòng, lấy dòng FNW/NPS
+    "sl":   RoiSpec(7, "0123456789.,ABCDEFGHIJKLMNOPQRSTUVWXYZ"),  # 25.000 PCS
+    "ngay": RoiSpec(7, "0123456789/"),                     # 2025/10/15
+    "ddh":  RoiSpec(7, CODE_CHARS),                        # SV011-2507170003
+}
+
+# Dạng hợp lệ của từng giá trị: lệch dạng (vd parser lấy nhầm dòng kế bên khi ô giá trị
+# là ảnh) thì coi như thiếu
+FIELD_PATTERNS = {
+    "ms":   re.compile(r"[A-Z0-9]+-[0-9]+"),
+    "sl":   re.compile(r"[0-9][0-9.,]*( [A-Z]+)?"),
+    "ngay": re.compile(r"[0-9]{4}/[0-9]{1,2}/[0-9]{1,2}"),
+    "ddh":  re.compile(r"[A-Z0-9]+-[0-9]+"),
+}
+
+# Vùng giá trị đo trên phiếu mẫu (A4 595x841 pt), mép trái lùi qua nhãn dài nhất (~122 pt);
+# trang khác cỡ thì co giãn theo tỉ lệ
+DEFAULT_SIZE = (595.0, 841.0)
+DEFAULT_VALUES: Dict[str, Box] = {
+    "ms":   (123.0, 79.1, 218.3, 91.1),
+    "desc": (0.0, 109.1, 595.0, 139.1),
+    "sl":   (123.0, 139.1, 379.5, 151.1),
+    "ngay": (457.0, 163.1, 595.0, 175.1),   # giá trị sát nhãn; ":" bị whitelist loại
+    "ddh":  (123.0, 151.1, 215.8, 163.1),
+}
+
+# Các hàng dưới khối NVL trôi xuống theo số dòng mô tả → dò lại hàng "Số lượng sản xuất:"
+TAIL = ("sl", "ddh", "ngay")
+ANCHOR_LABEL = ROW_LABELS["sl"]
+ANCHOR_SPEC = RoiSpec(6, lang="vie+eng")
+ANCHOR_X = (36.0, 124.0)      # cột nhãn bên trái
+ANCHOR_SPAN = 180.0           # dò tối đa bấy nhiêu pt dưới đầu khối NVL
+INK_TOP = 2.0                 # đỉnh nét chữ thấp hơn đỉnh hộp dòng ~2 pt
+
+
+def value_regions(page: fitz.Page, store: Optional[TemplateStore] = None) -> Tuple[Dict[str, Box], str]:
+    """
+    Vùng giá trị từng trường + nguồn: "page" (học từ lớp text của chính trang, chính xác),
+    "store" (vùng đã học từ phiếu khác cùng cỡ trang), "default" (phiếu mẫu).
+    """
+    learned = learn_template(page)
+    if learned is not None:
+        return {k: tuple(v["value"]) for k, v in learned.items()}, "page"
+    rects = store.get(page) if store is not None else None
+    if rects:
+        return {k: tuple(v["value"]) for k, v in rects.items()}, "store"
+    sx, sy = page.rect.width / DEFAULT_SIZE[0], page.rect.height / DEFAULT_SIZE[1]
+    return {k: (x0 * sx, y0 * sy, x1 * sx, y1 * sy) for k, (x0, y0, x1, y1) in DEFAULT_VALUES.items()}, "default"
+
+
+def _clip(page: fitz.Page, box: Box, pad_y: float = PAD_Y) -> fitz.Rect:
+    import fitz
+    x0, y0, x1, y1 = box
+    return fitz.Rect(x0, y0 - pad_y, x1, y1 + pad_y) & page.rect
+
+
+def _render(page: fitz.Page, rect: fitz.Rect, dpi: int) -> fitz.Pixmap:
+    import fitz
+    return page.get_pixmap(dpi=dpi, clip=rect, colorspace=fitz.csGRAY, alpha=False)
+
+
+def _ocr_clip(page: fitz.Page, rect: fitz.Rect, spec: RoiSpec, dpi: int) -> Tuple[str, float, float, float]:
+    """Render đúng vùng `rect` (grayscale) rồi OCR. Trả về (text, conf, giây render, giây OCR)."""
+    t0 = time.perf_counter()
+    pix = _render(page, rect, dpi)
+    t1 = time.perf_counter()
+    text, conf = ocr_image_conf(pix, lang=spec.lang, config=spec.config())
+    return text, conf, t1 - t0, time.perf_counter() - t1
+
+
+def _find_row(tsv: str, label: str) -> Optional[int]:
+    """Đỉnh (pixel) của dòng đầu tiên bắt đầu bằng `label` trong output TSV của tesseract."""
+    want = " ".join(_norm_cmp(label).split()[:2])  # "so luong": đủ phân biệt, chịu được OCR sai đuôi nhãn
+    for words in tsv_lines(tsv).values():
+        if _norm_cmp(" ".join(w for _, _, w in words)).startswith(want):
+            return min(top for top, _, _ in words)
+    return None
+
+
+def _anchor_shift(page: fitz.Page, boxes: Dict[str, Box], ladder: DpiLadder) -> Optional[float]:
+    """
+    Độ lệch dọc (pt) của các hàng dưới khối NVL so với `boxes`, dò bằng OCR cột nhãn
+    (bậc DPI thấp trước, không thấy nhãn mới lên bậc).
+    """
+    import fitz
+    top = boxes["desc"][1]
+    rect = fitz.Rect(ANCHOR_X[0], top, ANCHOR_X[1], top + ANCHOR_SPAN) & page.rect
+    for dpi in ladder.steps:
+        tsv = ocr_image(_render(page, rect, dpi), lang=ANCHOR_SPEC.lang, config=f"{ANCHOR_SPEC.config()} tsv")
+        px = _find_row(tsv, ANCHOR_LABEL)
+        if px is not None:
+            return rect.y0 + px * 72.0 / dpi - INK_TOP - boxes["sl"][1]
+    return None
+
+
+def _value(key: str, text: str) -> str:
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    if key == "desc":
+        # vùng mẫu / đã dời có thể lẹm hàng nhãn NVL + dòng mã "… M" phía trên khối
+        while lines and (_is_stop(_norm_cmp(lines[0])) or _M_CODE_RE.search(lines[0])):
+            lines.pop(0)
+        value, _ = pick_fnw_nps(lines)
+    else:
+        value = " ".join(lines)
+        wl = ROI_SPECS[key].whitelist
+        if wl:  # tesseract cũ / pool tesserocr bỏ qua whitelist → lọc lại ở đây
+            value = "".join(ch for ch in value if ch in wl or ch.isspace())
+        m = FIELD_PATTERNS[key].search(_norm(value)) if key in FIELD_PATTERNS else None
+        if m:  # bỏ nét lẹm từ ô bên cạnh (vd chữ 'T' của "Tài khoản")
+            value = m.group(0)
+    return _norm(value)
+
+
+def ocr_fields(session: PdfSession, page_index: int = 0, keys: Optional[Iterable[str]] = None,
+               store: Optional[TemplateStore] = None, dpi: DpiLadder = DEFAULT_LADDER,
+               log: Callable[[str], None] = print, cancel: Optional[CancelToken] = None) -> Dict[str, str]:
+    """
+    OCR chỉ các vùng giá trị asfr102 của trang `page_index` (mỗi vùng psm + whitelist riêng).
+    `keys`: chỉ đọc các trường này (mặc định mọi trường QR). Vùng lấy từ lớp text của trang,
+    từ `store`, hoặc phiếu mẫu; 2 nguồn sau dò lại hàng dưới khối NVL trước khi OCR.
+    Mỗi vùng đi theo thang `dpi`: giá trị sai dạng hoặc conf thấp mới render lại vùng đó ở bậc kế.
+    Trả về {key: giá trị} ('' nếu không đọc được); lỗi tesseract raise như ocr_image.
+    """
+    wanted = [k for k, _ in QR_FIELDS if keys is None or k in keys]
+    page = session.doc[page_index]
+    boxes, source = value_regions(page, store)
+    log(f"    roi p{page_index + 1}: {len(wanted)} region(s) from {source} layout")
+
+    if source != "page" and any(k in TAIL or k == "desc" for k in wanted):
+        check(cancel)
+        dy = _anchor_shift(page, boxes, dpi)
+        if dy is None:
+            log(f"    roi: '{ANCHOR_LABEL}' not found, using {source} rows")
+        elif abs(dy) >= 1.0:
+            log(f"    roi: rows below NVL shifted {dy:+.1f} pt")
+            x0, y0, x1, y1 = boxes["desc"]
+            boxes["desc"] = (x0, y0, x1, y1 + dy)
+            for k in TAIL:
+                x0, y0, x1, y1 = boxes[k]
+                boxes[k] = (x0, y0 + dy, x1, y1 + dy)
+
+    out: Dict[str, str] = {}
+    for key in wanted:
+        rect = _clip(page, boxes[key])
+        best = None  # (đạt?, conf, giá trị, dpi)
+        spent = 0.0
+        for step in dpi.steps:
+            check(cancel)
+            text, conf, t_raster, t_ocr = _ocr_clip(page, rect, ROI_SPECS[key], step)
+            spent += t_raster + t_ocr
+            value = _value(key, text)
+            cand = (_valid(key, value) and conf >= dpi.min_conf, conf, value, step)
+            if best is None or cand[:2] > best[:2]:
+                best = cand
+            if best[0]:
+                break
+        out[key] = best[2]
+        log(f"    roi {key}: {out[key]!r} ({best[3]} dpi, conf {best[1]:.0f}, {spent * 1000:.0f} ms)")
+    return out
+
+
+def _valid(key: str, value: Optional[str]) -> bool:
+    return bool(value) and (key not in FIELD_PATTERNS or FIELD_PATTERNS[key].fullmatch(value) is not None)
+
+
+def _missing(fields: Dict[str, str]) -> list:
+    """Trường rỗng hoặc sai dạng FIELD_PATTERNS."""
+    return [k for k, _ in QR_FIELDS if not _valid(k, fields.get(k))]
+
+
+def scan_fields(session: PdfSession, page_index: int = 0, store: Optional[TemplateStore] = None,
+                engine: str = DEFAULT_ENGINE, dpi: DpiLadder = DEFAULT_LADDER, log: Callable[[str], None] = print,
+                cancel: Optional[CancelToken] = None) -> Optional[Dict[str, str]]:
+    """
+    Chế độ OCR "roi": trang mà pre-flight cho OCR trước (scan) → OCR vùng giá trị thay vì cả trang.
+    None: trang đọc được bằng lớp text, OCR lỗi hoặc thiếu trường → pipeline trích/OCR cả trang như cũ.
+    """
+    plan = plan_page(session, page_index, engine=engine)
+    if not plan.engines or plan.engines[0] != "ocr":
+        return None
+    log(f"    roi: {plan.reason} -> OCR value regions only")
+    try:
+        fields = ocr_fields(session, page_index, store=store, dpi=dpi, log=log, cancel=cancel)
+    except Cancelled:
+        raise
+    except Exception as e:
+        log(f"    roi failed ({e}), full-page OCR")
+        return None
+    missing = _missing(fields)
+    if missing:
+        log(f"    roi: missing {', '.join(missing)}, full-page OCR")
+        return None
+    return fields
+
+
+def backfill_fields(session: PdfSession, fields: Dict[str, str], page_index: int = 0,
+                    store: Optional[TemplateStore] = None, dpi: DpiLadder = DEFAULT_LADDER, log: Callable[[str], None] = print,
+                    cancel: Optional[CancelToken] = None) -> Dict[str, str]:
+    """
+    PDF có lớp text nhưng thiếu trường / trường sai dạng (giá trị là ảnh, glyph không map Unicode…):
+    OCR đúng vùng của các trường đó. Trả về dict mới, `fields` giữ nguyên; OCR lỗi thì trả `fields`.
+    """
+    missing = _missing(fields)
+    if not missing:
+        return fields
+    log(f"    backfill: {', '.join(missing)} missing or malformed in text, ROI OCR")
+    try:
+        got = ocr_fields(session, page_index, keys=missing, store=store, dpi=dpi, log=log, cancel=cancel)
+    except Cancelled:
+        raise
+    except Exception as e:
+        log(f"    backfill failed: {e}")
+        return fields
+    return {**fields, **{k: v for k, v in got.items() if _valid(k, v)}}
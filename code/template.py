@@ -0,0 +1,189 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Union
+import json
+import os
+
+from pdfsession import PdfSession
+from fields import QR_FIELDS, STOP_LABELS, _norm, _norm_cmp, pick_fnw_nps
+
+if TYPE_CHECKING:
+    import fitz  # PyMuPDF
+
+# ======================
+# Template asfr102: đọc giá trị theo toạ độ
+# ======================
+
+TEMPLATE_NAME = "asfr102"
+
+# Trường nằm cùng hàng, bên phải nhãn
+ROW_LABELS = {
+    "ms":   "MS đơn công lệnh:",
+    "sl":   "Số lượng sản xuất:",
+    "ngay": "Ngày Hoàn tất:",
+    "ddh":  "Mã đơn đặt hàng:",
+}
+# Mô tả hàng: các dòng bên dưới nhãn NVL, tới nhãn kế tiếp
+DESC_LABEL = "NVL sản xuất:"
+
+# flags=0: lấy cả chữ bị clip (mặc định PyMuPDF cắt mô tả dài, vd "... ASME B1")
+WORD_FLAGS = 0
+
+Box = Tuple[float, float, float, float]
+Line = Tuple["fitz.Rect", str]
+
+
+def _lines(words: List[tuple], rect: Optional[fitz.Rect] = None) -> List[Line]:
+    """Gom word (PyMuPDF) thành dòng theo (block, line); chỉ lấy word có tâm nằm trong `rect`."""
+    import fitz
+    groups: Dict[Tuple[int, int], List[tuple]] = {}
+    for w in words:
+        if rect is not None:
+            cx, cy = (w[0] + w[2]) / 2, (w[1] + w[3]) / 2
+            if not (rect.x0 <= cx <= rect.x1 and rect.y0 <= cy <= rect.y1):
+                continue
+        groups.setdefault((w[5], w[6]), []).append(w)
+    lines = []
+    for ws in groups.values():
+        ws.sort(key=lambda w: w[0])
+        r = fitz.Rect(ws[0][:4])
+        for w in ws[1:]:
+            r |= w[:4]
+        lines.append((r, " ".join(w[4] for w in ws)))
+    lines.sort(key=lambda t: (round(t[0].y0), t[0].x0))  # trên→dưới, trái→phải
+    return lines
+
+
+def _find_label(lines: List[Line], label: str) -> Optional[fitz.Rect]:
+    want = _norm_cmp(label)
+    return next((r for r, s in lines if _norm_cmp(s) == want), None)
+
+
+def _same_row(a: fitz.Rect, b: fitz.Rect) -> bool:
+    cy = (b.y0 + b.y1) / 2
+    return a.y0 <= cy <= a.y1
+
+
+def learn_template(page: fitz.Page) -> Optional[Dict[str, Dict[str, Box]]]:
+    """
+    Học vùng nhãn/giá trị từ 1 trang mẫu (đọc word cả trang đúng 1 lần).
+    Trả về {field: {"label": rect, "value": rect}} hoặc None nếu không đúng template.
+    """
+    lines = _lines(page.get_text("words", flags=WORD_FLAGS))
+    rects: Dict[str, Dict[str, Box]] = {}
+
+    for key, label in ROW_LABELS.items():
+        lab = _find_label(lines, label)
+        if lab is None:
+            return None
+        row = sorted((r for r, _ in lines if r.x0 >= lab.x1 - 1 and _same_row(lab, r)), key=lambda r: r.x0)
+        if not row:
+            return None
+        # vùng giá trị: từ sau nhãn tới trước ô kế tiếp trên cùng hàng (giá trị dài hơn vẫn lọt)
+        x1 = row[1].x0 - 1 if len(row) > 1 else page.rect.x1
+        rects[key] = {"label": tuple(lab), "value": (lab.x1 + 1, lab.y0, x1, lab.y1)}
+
+    nvl = _find_label(lines, DESC_LABEL)
+    if nvl is None:
+        return None
+    stops = [_norm_cmp(s) for s in STOP_LABELS]
+    below = [r for r, s in lines if r.y0 >= nvl.y1 - 1 and any(_norm_cmp(s).startswith(x) for x in stops)]
+    if not below:
+        return None
+    y1 = min(r.y0 for r in below)
+    rects["desc"] = {"label": tuple(nvl), "value": (page.rect.x0, nvl.y1, page.rect.x1, y1)}
+    return rects
+
+
+def read_template(page: fitz.Page, rects: Dict[str, Dict[str, Box]]) -> Optional[Dict[str, str]]:
+    """
+    Đọc giá trị bằng vài lần get_text(clip=...) nhỏ. Nhãn phải còn đúng chỗ,
+    thiếu trường nào → None (để pipeline quay về trích text thường).
+    """
+    import fitz
+
+    fields: Dict[str, str] = {}
+    for key, _ in QR_FIELDS:
+        label = DESC_LABEL if key == "desc" else ROW_LABELS[key]
+        lab, val = fitz.Rect(rects[key]["label"]), fitz.Rect(rects[key]["value"])
+        words = page.get_text("words", clip=lab | val, flags=WORD_FLAGS)
+        if _norm_cmp(" ".join(s for _, s in _lines(words, lab))) != _norm_cmp(label):
+            return None
+        value_lines = [s for _, s in _lines(words, val)]
+        if key == "desc":
+            value, _ = pick_fnw_nps(value_lines)
+        else:
+            value = " ".join(value_lines)
+        fields[key] = _norm(value)
+        if not fields[key]:
+            return None
+    return fields
+
+
+def template_text(fields: Dict[str, str]) -> str:
+    """Dạng "nhãn / giá trị" để ghi ra a.txt (debug) khi dùng template."""
+    labels = {**ROW_LABELS, "desc": DESC_LABEL}
+    return "\n".join(f"{labels[key]}\n{fields[key]}" for key, _ in QR_FIELDS)
+
+
+class TemplateStore:
+    """
+    Vùng đã học cho từng template (theo kích thước trang), lưu ra JSON để
+    lần chạy sau khỏi học lại. path=None: chỉ giữ trong bộ nhớ.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self.path = Path(path) if path else None
+        self._rects: Optional[Dict[str, dict]] = None
+
+    def _load(self) -> Dict[str, dict]:
+        if self._rects is None:
+            self._rects = {}
+            if self.path is not None and self.path.exists():
+                try:
+                    data = json.loads(self.path.read_text(encoding="utf-8"))
+                    # JSON trả list → đổi về tuple như learn_template, để so sánh `learned == rects` đúng
+                    self._rects = {name: {key: {part: tuple(box) for part, box in boxes.items()}
+                                          for key, boxes in rects.items()}
+                                   for name, rects in data.items()}
+                except (OSError, ValueError, AttributeError, TypeError):
+                    self._rects = {}
+        return self._rects
+
+    @staticmethod
+    def key(page: fitz.Page) -> str:
+        return f"{TEMPLATE_NAME}:{page.rect.width:.0f}x{page.rect.height:.0f}"
+
+    def get(self, page: fitz.Page) -> Optional[Dict[str, Dict[str, Box]]]:
+        return self._load().get(self.key(page))
+
+    def put(self, page: fitz.Page, rects: Dict[str, Dict[str, Box]]) -> None:
+        self._load()[self.key(page)] = rects
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(self._rects, indent=1), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+def extract_fields_template(session: PdfSession, store: TemplateStore, page_index: int = 0,
+                            log: Callable[[str], None] = print) -> Optional[Dict[str, str]]:
+    """
+    Đọc trường QR theo toạ độ (không phân tích layout cả trang).
+    Lần đầu gặp template thì học vùng từ chính trang này; nhãn lệch chỗ → học lại 1 lần.
+    None: không khớp template.
+    """
+    page = session.doc[page_index]
+    rects = store.get(page)
+    fields = read_template(page, rects) if rects else None
+    if fields is None:
+        learned = learn_template(page)
+        if learned is None or learned == rects:
+            return None
+        fields = read_template(page, learned)
+        if fields is None:
+            return None
+        store.put(page, learned)
+        log(f"    template: learned {TEMPLATE_NAME} regions")
+    log(f"    template: read {len(QR_FIELDS)} clip regions")
+    return fields
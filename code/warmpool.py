@@ -0,0 +1,266 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable, List, Optional
+import atexit
+import itertools
+import multiprocessing
+import queue
+import signal
+import time
+
+from batch import JobResult, preload_libraries
+from pdfsession import PdfSession
+from ocr import DEFAULT_LADDER, DpiLadder, shared_pool
+from pipeline import Artifacts, run_pipeline
+from qrrender import PNG_LEVEL
+from preflight import DEFAULT_ENGINE
+from template import TemplateStore
+from extractcache import ExtractionCache
+from progress import CancelToken, Cancelled, ProgressFn
+
+# ======================
+# Pool process "ấm" cho GUI: spawn sẵn, import sẵn thư viện, nhận job qua Pipe,
+# log + sự kiện tiến độ gửi ngược về cửa sổ trong lúc chạy, lệnh huỷ gửi xuôi qua cùng Pipe
+# ======================
+
+# Chu kỳ (giây) run() thức dậy khi chờ worker: chuyển lệnh huỷ + gọi `idle` (flush UI)
+POLL_INTERVAL = 0.05
+
+@dataclass
+class PipelineJob:
+    """1 lần chạy pipeline cho 1 file (picklable để gửi sang worker)."""
+    pdf: Path
+    out_pdf: Path
+    page_index: Optional[int] = 0
+    use_ocr: bool = True
+    raster: str = "fitz"
+    text_engine: str = DEFAULT_ENGINE
+    ocr_mode: str = "page"
+    ocr_backfill: bool = False
+    ocr_dpi: DpiLadder = DEFAULT_LADDER
+    ocr_workers: int = 0
+    qr_fraction: float = 4.0
+    qr_stamp: str = "image"
+    qr_dpi: int = 0
+    qr_png_level: int = PNG_LEVEL
+    qr_payload: str = "full"
+    qr_max_version: int = 0
+    max1d: int = 80
+    template: bool = False  # True: thử đọc trường theo toạ độ template (templates của worker) trước
+    artifacts: Optional[Artifacts] = None
+
+
+def run_job(job: PipelineJob, cache: Optional[ExtractionCache] = None, templates: Optional[TemplateStore] = None,
+            log: Callable[[str], None] = print, progress: Optional[ProgressFn] = None,
+            cancel: Optional[CancelToken] = None) -> JobResult:
+    """Chạy 1 job trong process hiện tại (worker, hoặc GUI khi không có pool)."""
+    t0 = time.perf_counter()
+    try:
+        with PdfSession(job.pdf) as session:
+            pool = partial(shared_pool, job.ocr_workers) if job.ocr_workers > 0 and job.use_ocr else None
+            result = run_pipeline(session, page_index=job.page_index, use_ocr=job.use_ocr, raster=job.raster,
+                                  pool=pool, cache=cache, templates=templates if job.template else None,
+                                  qr_fraction=job.qr_fraction,
+                                  max1d=job.max1d, artifacts=job.artifacts, log=log, progress=progress,
+                                  cancel=cancel, text_engine=job.text_engine,
+                                  ocr_mode=job.ocr_mode, ocr_backfill=job.ocr_backfill, ocr_dpi=job.ocr_dpi,
+                                  qr_stamp=job.qr_stamp, qr_dpi=job.qr_dpi, qr_png_level=job.qr_png_level,
+                                  qr_payload=job.qr_payload, qr_max_version=job.qr_max_version)
+        job.out_pdf.parent.mkdir(parents=True, exist_ok=True)
+        job.out_pdf.write_bytes(result.pdf)
+        log(f"    PDF with QR -> {job.out_pdf}")
+        if cache is not None:
+            log(f"    {cache.stats()}")
+        return JobResult(str(job.pdf), True, time.perf_counter() - t0, out=str(job.out_pdf),
+                         payload=result.payload, timings=result.timings, cpu_timings=result.cpu_timings,
+                         ocr=result.ocr, steps=result.steps)
+    except Cancelled as e:
+        log("    (cancelled)")
+        return JobResult(str(job.pdf), False, time.perf_counter() - t0, error=str(e), cancelled=True)
+    except Exception as e:
+        return JobResult(str(job.pdf), False, time.perf_counter() - t0, error=str(e))
+
+
+class _Inbox:
+    """Trong worker: đọc lệnh GUI gửi tới giữa job (("cancel", job_id) / None) mỗi lần pipeline kiểm tra huỷ."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cancelled = set()
+        self.stop = False  # GUI đã gửi None / đóng pipe → huỷ job đang chạy rồi thoát
+
+    def is_cancelled(self, job_id: int) -> bool:
+        try:
+            while not self.stop and self.conn.poll():
+                msg = self.conn.recv()
+                if msg is None:
+                    self.stop = True
+                elif msg[0] == "cancel":
+                    self.cancelled.add(msg[1])
+        except (EOFError, OSError):
+            self.stop = True
+        return self.stop or job_id in self.cancelled
+
+
+def _serve(conn, cache_dir: Optional[Path], templates_path: Optional[Path]) -> None:
+    """
+    Vòng lặp worker: nhận ("job", job_id, job), gửi ("log", s) / ("event", ProgressEvent) rồi ("done", JobResult).
+    ("cancel", job_id) tới giữa job → job dừng ở điểm kiểm tra kế tiếp; None/EOF → thoát.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C ở console GUI không giết worker giữa job
+    preload_libraries()
+    cache = ExtractionCache(cache_dir) if cache_dir is not None else None
+    templates = TemplateStore(templates_path) if templates_path is not None else None
+    inbox = _Inbox(conn)
+    while not inbox.stop:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return  # GUI đã đóng (kể cả bị kill) → pipe đứt
+        if msg is None:
+            return
+        if msg[0] != "job":
+            continue  # lệnh huỷ tới sau khi job đã xong
+        _, job_id, job = msg
+        inbox.cancelled.clear()
+        cancel = CancelToken(probe=lambda: inbox.is_cancelled(job_id))
+        try:
+            result = run_job(job, cache, templates, log=lambda s: conn.send(("log", s)),
+                             progress=lambda ev: conn.send(("event", ev)), cancel=cancel)
+            conn.send(("done", result))
+        except OSError:
+            return  # GUI đóng giữa job
+
+
+class _Worker:
+    def __init__(self, ctx, cache_dir: Optional[Path], templates_path: Optional[Path]):
+        self.conn, child = ctx.Pipe(duplex=True)
+        # daemon=False: worker còn tự mở pool OCR (process con) khi ocr_workers > 0
+        self.proc = ctx.Process(target=_serve, args=(child, cache_dir, templates_path), daemon=False)
+        self.proc.start()
+        child.close()
+
+    def request_stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self.request_stop()
+        self.proc.join(timeout)
+        if self.proc.is_alive():
+            self.proc.terminate()
+            self.proc.join(timeout)
+        self.conn.close()
+
+
+class WarmPool:
+    """
+    `workers` process spawn 1 lần (ngay khi mở app), import sẵn fitz/pdfminer/qrcode/barcode,
+    giữ cache/template mở suốt phiên. run() gửi job cho worker rảnh và chặn tới khi xong —
+    gọi từ QThread; CPU (pdfminer…) chạy ở process khác nên UI không bị GIL giữ.
+    `cancel` bật → báo worker, job dừng ở điểm kiểm tra kế tiếp (JobResult.cancelled).
+    Worker chết giữa job → job báo lỗi, worker được spawn lại.
+    """
+
+    def __init__(self, workers: int = 2, cache_dir: Optional[Path] = None, templates_path: Optional[Path] = None):
+        self.workers = max(1, workers)
+        self.cache_dir = cache_dir
+        self.templates_path = templates_path
+        self._ctx = multiprocessing.get_context("spawn")
+        self._all: List[_Worker] = []
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._ids = itertools.count(1)
+
+    def start(self) -> "WarmPool":
+        if not self._all:
+            # Worker không phải daemon → phải tự đóng trước khi multiprocessing join lúc thoát
+            atexit.register(self.close)
+        while len(self._all) < self.workers:
+            self._add()
+        return self
+
+    def resize(self, workers: int) -> None:
+        """Đổi số worker lúc đang chạy: thêm ngay; bớt thì dừng worker rảnh, worker bận dừng khi xong job."""
+        self.workers = max(1, workers)
+        if not self._all:
+            return
+        self.start()
+        while len(self._all) > self.workers:
+            try:
+                w = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._all.remove(w)
+            w.stop()
+
+    def _add(self, idle: bool = True) -> _Worker:
+        w = _Worker(self._ctx, self.cache_dir, self.templates_path)
+        self._all.append(w)
+        if idle:
+            self._idle.put(w)
+        return w
+
+    def _replace(self, w: _Worker, idle: bool) -> _Worker:
+        self._all.remove(w)
+        w.stop(timeout=0.5)
+        return self._add(idle)
+
+    def run(self, job: PipelineJob, log: Callable[[str], None] = print, progress: Optional[ProgressFn] = None,
+            cancel: Optional[CancelToken] = None, idle: Optional[Callable[[], None]] = None) -> JobResult:
+        """`idle` được gọi mỗi POLL_INTERVAL khi worker chưa gửi gì (vd flush log dồn lên UI)."""
+        self.start()
+        w = self._idle.get()
+        if not w.proc.is_alive():
+            w = self._replace(w, idle=False)  # chết lúc đang rảnh → thay trước khi giao job
+        job_id, cancel_sent = next(self._ids), False
+        try:
+            w.conn.send(("job", job_id, job))
+            while True:
+                if cancel is not None and not cancel_sent and cancel.cancelled:
+                    w.conn.send(("cancel", job_id))
+                    cancel_sent = True
+                if not w.conn.poll(POLL_INTERVAL):
+                    if idle is not None:
+                        idle()
+                    continue
+                kind, value = w.conn.recv()
+                if kind == "log":
+                    log(value)
+                elif kind == "event":
+                    if progress is not None:
+                        progress(value)
+                elif kind == "done":
+                    if len(self._all) > self.workers:  # pool vừa được thu nhỏ
+                        self._all.remove(w)
+                        w.stop()
+                    else:
+                        self._idle.put(w)
+                    return value
+        except (EOFError, OSError) as e:
+            # Worker chết giữa job (crash thư viện native, bị kill…) → thay worker mới cho job sau
+            if w in self._all:  # (không thay nếu pool đã close)
+                self._replace(w, idle=True)
+            return JobResult(str(job.pdf), False, 0.0, error=f"worker process lỗi (exit {w.proc.exitcode}): {e!r}")
+
+    def close(self, wait: bool = True) -> None:
+        """wait=False (đóng cửa sổ): chỉ báo worker thoát, không chặn UI chờ interpreter con dọn dẹp."""
+        for w in self._all:
+            w.request_stop()  # báo tất cả trước rồi mới chờ (job đang chạy dừng ở điểm kiểm tra kế tiếp)
+        for w in self._all:
+            if wait:
+                w.stop()
+            else:
+                w.conn.close()
+        self._all.clear()
+        self._idle = queue.Queue()
+        atexit.unregister(self.close)
+
+    def __enter__(self) -> "WarmPool":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
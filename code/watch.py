@@ -0,0 +1,218 @@
+from __future__ import annotations
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from batch import BatchOptions, JobResult, _init_pool_worker, _init_worker, _run_job, preload_libraries
+
+# ======================
+# Watch-folder: tự chèn QR cho PDF mới trong thư mục drop (ERP export)
+# ======================
+
+# (size, mtime_ns) — file coi là "ghi xong" khi giá trị này đứng yên đủ `settle` giây
+FileSig = Tuple[int, int]
+
+
+def _warm() -> int:
+    # Task rỗng: chờ mọi worker chạy xong initializer (_init_pool_worker → preload_libraries) trước khi nhận file
+    return os.getpid()
+
+
+def _can_open(path: str) -> bool:
+    # Windows: file đang được copy thường bị khoá độc quyền → chưa mở được
+    try:
+        with open(path, "rb"):
+            return True
+    except OSError:
+        return False
+
+
+class FolderWatcher:
+    """
+    Theo dõi `src_dir` (không đệ quy), đợi file ghi xong rồi đẩy vào hàng đợi có giới hạn
+    chạy pipeline trên các worker giữ sẵn thư viện trong bộ nhớ.
+      - watchdog (nếu cài) báo sự kiện tức thì; quét os.scandir mỗi `poll` giây vẫn chạy
+        song song để bắt sự kiện bị mất (ổ mạng SMB).
+      - File cần xử lý khi chưa có PDF kết quả hoặc kết quả cũ hơn file nguồn
+        → khởi động lại không chạy lại file đã xong.
+      - workers=1: chạy trong process này; >1: pool process spawn 1 lần, dùng suốt phiên.
+    """
+
+    def __init__(self, src_dir: Path, opts: BatchOptions, workers: int = 1, queue_size: int = 0,
+                 settle: float = 2.0, poll: float = 5.0, use_watchdog: bool = True,
+                 log: Callable[[str], None] = print):
+        self.src_dir = Path(src_dir)
+        self.opts = opts
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.queue_size = queue_size or 2 * self.workers
+        self.settle = settle
+        self.poll = poll
+        self.use_watchdog = use_watchdog
+        self.log = log
+        if self.src_dir.resolve() == Path(opts.outpdf).resolve():
+            raise ValueError("Thư mục output trùng thư mục theo dõi (file kết quả sẽ bị xử lý lại)")
+
+        self._events: "queue.SimpleQueue[str]" = queue.SimpleQueue()
+        self._seen: Dict[str, Tuple[FileSig, float]] = {}    # path → (sig, lúc sig đổi lần cuối)
+        self._done: Dict[str, FileSig] = {}                   # path → sig đã xử lý (ok hoặc lỗi)
+        self._inflight: Dict[Future, Tuple[str, FileSig]] = {}
+        self._backlog: Set[str] = set()                       # đã ổn định nhưng hàng đợi đang đầy
+        self.processed = 0
+        self.failed = 0
+
+    # ---- phát hiện file ----
+    def _start_observer(self):
+        if not self.use_watchdog:
+            return None
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            self.log("    watchdog chưa cài → chỉ quét định kỳ")
+            return None
+
+        events = self._events
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.is_directory:
+                    events.put(getattr(event, "dest_path", "") or event.src_path)
+
+        obs = Observer()
+        obs.schedule(_Handler(), str(self.src_dir), recursive=False)
+        obs.start()
+        return obs
+
+    def _touch(self, path: str, sig: FileSig, now: float) -> None:
+        old = self._seen.get(path)
+        if old is None or old[0] != sig:
+            self._seen[path] = (sig, now)
+
+    def _scan(self, now: float) -> None:
+        """1 lượt os.scandir (stat lấy từ entry, không mở file)."""
+        present = set()
+        with os.scandir(self.src_dir) as it:
+            for entry in it:
+                if not entry.name.lower().endswith(".pdf") or not entry.is_file():
+                    continue
+                st = entry.stat()
+                present.add(entry.path)
+                self._touch(entry.path, (st.st_size, st.st_mtime_ns), now)
+        for path in list(self._seen):
+            if path not in present:
+                self._seen.pop(path, None)
+                self._backlog.discard(path)
+
+    def _drain_events(self, now: float) -> None:
+        while True:
+            try:
+                path = self._events.get_nowait()
+            except queue.Empty:
+                return
+            if not path.lower().endswith(".pdf") or Path(path).parent.resolve() != self.src_dir.resolve():
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._seen.pop(path, None)
+                continue
+            self._touch(path, (st.st_size, st.st_mtime_ns), now)
+
+    def _out_path(self, path: str) -> Path:
+        return Path(self.opts.outpdf) / f"{Path(path).stem}.pdf"
+
+    def _needs_work(self, path: str, sig: FileSig) -> bool:
+        if self._done.get(path) == sig:
+            return False
+        try:
+            return self._out_path(path).stat().st_mtime_ns < sig[1]
+        except OSError:
+            return True
+
+    def _ready(self, now: float):
+        busy = {p for p, _ in self._inflight.values()}
+        for path, (sig, since) in sorted(self._seen.items(), key=lambda kv: kv[1][1]):
+            if path in busy or now - since < self.settle or sig[0] == 0:
+                continue
+            if self._needs_work(path, sig) and _can_open(path):
+                yield path, sig
+
+    # ---- xử lý ----
+    def _finish(self, path: str, sig: FileSig, r: JobResult) -> None:
+        self._done[path] = sig
+        self._backlog.discard(path)
+        if r.ok:
+            self.processed += 1
+            ocr = "".join(f" | OCR p{p['page']} {p['dpi']} dpi conf {p['conf']:.0f}" for p in r.ocr)
+            self.log(f"[ok]   {Path(path).name} ({r.secs:.2f} s) -> {r.out}{ocr}")
+        else:
+            self.failed += 1
+            self.log(f"[FAIL] {Path(path).name}: {r.error}")
+
+    def _submit_ready(self, ex: Optional[ProcessPoolExecutor], now: float) -> None:
+        for path, sig in self._ready(now):
+            if len(self._inflight) >= self.queue_size:
+                if path not in self._backlog:
+                    self._backlog.add(path)
+                    self.log(f"    queue full ({self.queue_size}), {Path(path).name} waits")
+                break
+            stem = Path(path).stem
+            if ex is None:
+                self._finish(path, sig, _run_job(path, stem))
+            else:
+                self._inflight[ex.submit(_run_job, path, stem)] = (path, sig)
+
+    def _collect(self) -> None:
+        for fut in [f for f in self._inflight if f.done()]:
+            path, sig = self._inflight.pop(fut)
+            try:
+                r = fut.result()
+            except Exception as e:  # worker chết (BrokenProcessPool…)
+                r = JobResult(path, False, 0.0, error=f"{type(e).__name__}: {e}")
+            self._finish(path, sig, r)
+
+    def run(self, stop: Optional[threading.Event] = None) -> None:
+        """Chạy tới khi `stop` được set (hoặc Ctrl+C)."""
+        stop = stop or threading.Event()
+        Path(self.opts.outpdf).mkdir(parents=True, exist_ok=True)
+        ex = None
+        if self.workers > 1:
+            ctx = multiprocessing.get_context("spawn")
+            ex = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx,
+                                     initializer=_init_pool_worker, initargs=(self.opts,))
+            for f in [ex.submit(_warm) for _ in range(self.workers)]:
+                f.result()
+        else:
+            _init_worker(self.opts)
+            preload_libraries()  # daemon chạy tại chỗ: file đầu tiên cũng không tốn import
+        obs = self._start_observer()
+        mode = "watchdog + " if obs is not None else ""
+        self.log(f"[WATCH] {self.src_dir} ({mode}scandir mỗi {self.poll:g} s, settle {self.settle:g} s, "
+                 f"workers={self.workers}, queue={self.queue_size}) -> {self.opts.outpdf}")
+
+        next_scan = 0.0
+        try:
+            while not stop.is_set():
+                now = time.monotonic()
+                self._drain_events(now)
+                if now >= next_scan:
+                    self._scan(now)
+                    next_scan = now + self.poll
+                self._collect()
+                self._submit_ready(ex, now)
+                stop.wait(0.2)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if obs is not None:
+                obs.stop()
+                obs.join()
+            if ex is not None:
+                ex.shutdown(wait=True)
+                self._collect()
+            self.log(f"[WATCH] stopped: {self.processed} ok, {self.failed} failed")
@@ -6,22 +6,9 @@ import re
 import unicodedata
 import sys
 
-# --- PDF text extractors ---
-import fitz  # PyMuPDF
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LAParams, LTTextContainer, LTTextLine
-from pdf2image import convert_from_path
-import pytesseract
-
-# --- QR & 1D barcode ---
-import qrcode
-from qrcode.constants import ERROR_CORRECT_Q
-import qrcode.image.svg as qrcode_svg
-from barcode import Code128
-from barcode.writer import ImageWriter
-
-# --- Images ---
-from PIL import Image
+# PDF text extractors (fitz, pdfminer, pdf2image, pytesseract), QR/1D barcode
+# (qrcode, barcode) và PIL được import trong hàm của từng bước: --help hay PDF
+# có text layer không phải nạp OCR.
 
 
 # =========================
@@ -35,6 +22,9 @@ def extract_pdfminer_topdown_ltr(pdf_path: str, page_index: Optional[int] = None
       x0 tăng dần               => từ trái sang phải
     Nếu page_index=None: đọc toàn bộ trang.
     """
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LAParams, LTTextContainer, LTTextLine
+
     laparams = LAParams(char_margin=2.0, line_margin=0.5, word_margin=0.1, boxes_flow=0.5)
 
     page_numbers = [page_index] if page_index is not None else None
@@ -59,6 +49,8 @@ def extract_pdfminer_topdown_ltr(pdf_path: str, page_index: Optional[int] = None
 
 
 def extract_pymupdf_sorted(pdf_path: str, page_index: Optional[int] = None) -> str:
+    import fitz  # PyMuPDF
+
     try:
         txt_parts: List[str] = []
         with fitz.open(pdf_path) as doc:
@@ -79,6 +71,9 @@ def extract_pymupdf_sorted(pdf_path: str, page_index: Optional[int] = None) -> s
 
 
 def extract_ocr(pdf_path: str, lang: str = "vie+eng", dpi: int = 300, page_index: Optional[int] = None) -> str:
+    from pdf2image import convert_from_path
+    import pytesseract
+
     kwargs = {"dpi": dpi}
     if page_index is not None:
         # pdf2image dùng chỉ số trang bắt đầu từ 1
@@ -277,6 +272,10 @@ def read_text(path: Path) -> str:
 
 
 def make_qr(data: str, out_png: Path, out_svg: Path) -> None:
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_Q
+    import qrcode.image.svg as qrcode_svg
+
     # Tạo QR linh hoạt kích thước, EC mức Q (ổn cho in tem)
     qr = qrcode.QRCode(
         version=None,  # auto-size
@@ -327,6 +326,9 @@ def split_for_1d(payload: str, maxlen: int = 80, sep: str = " | ") -> List[str]:
 
 
 def make_code128(payload: str, out_base: Path, maxlen: int = 80) -> None:
+    from barcode import Code128
+    from barcode.writer import ImageWriter
+
     chunks = split_for_1d(payload, maxlen=maxlen)
     out_base.parent.mkdir(parents=True, exist_ok=True)
 
@@ -359,6 +361,9 @@ def make_code128(payload: str, out_base: Path, maxlen: int = 80) -> None:
 
 def embed_qr_into_pdf(pdf_path: Path, qr_png: Path, output_pdf: Path, page_index: int = 0, width_fraction: float = 4.0) -> None:
     """Chèn ảnh QR vào giữa trang `page_index`. width_fraction=4.0 -> QR rộng ~1/4 chiều rộng trang."""
+    import fitz  # PyMuPDF
+    from PIL import Image
+
     doc = fitz.open(str(pdf_path))
     try:
         page = doc[page_index]
@@ -5,7 +5,7 @@ block_cipher = None
 
 a = Analysis(
     ['a.py'],      # file entry chính
-    pathex=[],
+    pathex=['code'],   # module pipeline dùng chung (pdfsession, ...)
     binaries=[],
     datas=[
         ('themes/*.qss', 'themes'),   # copy thư mục themes